@@ -0,0 +1,148 @@
+"""
+Benchmark local document retrieval.
+
+Compares the vectorized top-k search of ``sgptAgent.local_index`` with the previous
+per-chunk Python loop on random embeddings, for single and batched queries:
+
+    python scripts/benchmark_local_index.py --sizes 10000 100000 1000000 --dim 384
+
+With ``--ann`` it instead measures recall@k of the approximate searchers in
+``sgptAgent.ann_index`` against exact search, with their build time and latency.
+Embeddings are drawn around random topic centres, as real document embeddings cluster:
+
+    python scripts/benchmark_local_index.py --ann --sizes 100000 --nprobe 4 16 64 --ef 32 64 256
+
+With ``--precision`` it compares the memory of float32, float16 and int8 matrices with
+their recall@k and latency, with and without float32 rescoring of the top candidates:
+
+    python scripts/benchmark_local_index.py --precision --sizes 100000 --rescore 20 50
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sgptAgent.ann_index import available_backends, make_searcher  # noqa: E402
+from sgptAgent.local_index import normalize_rows, top_k  # noqa: E402
+from sgptAgent.quantization import PRECISIONS, QuantizedMatrix, quantize  # noqa: E402
+
+
+def loop_top_k(embeddings, query, k):
+    """The original retrieval: cosine similarity per chunk in Python, then a full sort."""
+    scored = []
+    for i, embedding in enumerate(embeddings):
+        norm = np.linalg.norm(embedding) * np.linalg.norm(query)
+        scored.append((np.dot(query, embedding) / norm if norm else 0.0, i))
+    scored.sort(reverse=True)
+    return [i for _, i in scored[:k]]
+
+
+def timed(func, repeat, *args):
+    """Mean seconds per ``func(*args)`` call."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - started) / repeat
+
+
+def clustered(rng, size, dim, topics=1000, spread=2.0):
+    """Unit vectors scattered around ``topics`` centres; larger ``spread`` makes topics overlap more."""
+    centres = rng.standard_normal((topics, dim), dtype=np.float32)
+    labels = rng.integers(0, topics, size)
+    return normalize_rows(centres[labels] + spread * rng.standard_normal((size, dim), dtype=np.float32))
+
+
+def benchmark_ann(args):
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>10} {'backend':>8} {'setting':>12} {'build s':>8} {'ms/query':>9} {f'recall@{args.k}':>10}")
+    for size in args.sizes:
+        data = clustered(rng, size + args.batch, args.dim, spread=args.spread)
+        matrix, queries = data[:size], data[size:]
+        exact_ms = timed(top_k, 1, matrix, queries, args.k) / args.batch * 1000
+        expected = top_k(matrix, queries, args.k)[0]
+        print(f"{size:>10} {'exact':>8} {'':>12} {'':>8} {exact_ms:>9.3f} {1.0:>10.3f}")
+        for backend in available_backends():
+            settings = [("ef", ef) for ef in args.ef] if backend == "hnsw" else [("nprobe", n) for n in args.nprobe]
+            searcher = make_searcher(backend)
+            started = time.perf_counter()
+            searcher.build(matrix)
+            build = time.perf_counter() - started
+            for name, value in settings:
+                setattr(searcher, name, value)
+                ms = timed(searcher.search, 1, matrix, queries, args.k) / args.batch * 1000
+                found = searcher.search(matrix, queries, args.k)[0]
+                recall = np.mean([len(set(f) & set(e)) / args.k for f, e in zip(found, expected, strict=True)])
+                print(f"{size:>10} {backend:>8} {f'{name}={value}':>12} {build:>8.1f} {ms:>9.3f} {recall:>10.3f}")
+
+
+def quantized_search(matrix, stored, queries, k, rescore):
+    found, _ = top_k(stored, queries, max(k, rescore))
+    if not rescore:
+        return found
+    # Re-rank the candidates by their float32 rows, as LocalDocumentIndex does
+    scores = np.einsum("qcd,qd->qc", matrix[found], queries)
+    return np.take_along_axis(found, np.argsort(-scores, axis=1)[:, :k], axis=1)
+
+
+def benchmark_precision(args):
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>10} {'precision':>9} {'rescore':>8} {'MB':>9} {'ms/query':>9} {f'recall@{args.k}':>10}")
+    for size in args.sizes:
+        data = clustered(rng, size + args.batch, args.dim, spread=args.spread)
+        matrix, queries = data[:size], data[size:]
+        expected = top_k(matrix, queries, args.k)[0]
+        for precision in PRECISIONS:
+            stored = QuantizedMatrix(*quantize(matrix, precision))
+            for rescore in [0] + (args.rescore if precision != "float32" else []):
+                search_args = (matrix, stored, queries, args.k, rescore)
+                ms = timed(quantized_search, 1, *search_args) / args.batch * 1000
+                found = quantized_search(*search_args)
+                recall = np.mean([len(set(f) & set(e)) / args.k for f, e in zip(found, expected, strict=True)])
+                print(f"{size:>10} {precision:>9} {rescore or '-':>8} {stored.nbytes / 2**20:>9.1f} {ms:>9.3f} {recall:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--loop-limit", type=int, default=100_000, help="largest size to time the Python loop on")
+    parser.add_argument("--ann", action="store_true", help="measure ANN recall@k and latency instead")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64], help="IVF buckets scanned per query")
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 256], help="HNSW search breadth")
+    parser.add_argument("--spread", type=float, default=1.5, help="topic overlap of the synthetic embeddings")
+    parser.add_argument("--precision", action="store_true", help="measure memory and recall@k of quantized storage instead")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[20, 50], help="candidates re-ranked in float32")
+    args = parser.parse_args()
+    if args.ann:
+        benchmark_ann(args)
+        return
+    if args.precision:
+        benchmark_precision(args)
+        return
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>10} {'loop ms':>10} {'top-k ms':>10} {'batch ms/query':>15}")
+    for size in args.sizes:
+        matrix = normalize_rows(rng.standard_normal((size, args.dim), dtype=np.float32))
+        queries = normalize_rows(rng.standard_normal((args.batch, args.dim), dtype=np.float32))
+        single = timed(top_k, 5, matrix, queries[0], args.k)
+        batched = timed(top_k, 2, matrix, queries, args.k) / args.batch
+        loop = "-"
+        if size <= args.loop_limit:
+            rows = list(matrix)
+            expected = loop_top_k(rows, queries[0], args.k)
+            assert list(top_k(matrix, queries[0], args.k)[0][0]) == expected
+            loop = f"{timed(loop_top_k, 1, rows, queries[0], args.k) * 1000:.1f}"
+        print(f"{size:>10} {loop:>10} {single * 1000:>10.2f} {batched * 1000:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
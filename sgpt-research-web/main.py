@@ -11,7 +11,10 @@ import asyncio
 from urllib.parse import unquote
 
 from sgptAgent.agent import ResearchAgent
+from sgptAgent.cancellation import CancellationToken, ResearchCancelled
+from sgptAgent.checkpoint import is_valid_run_id
 from sgptAgent.config import cfg
+from sgptAgent.doc_watcher import get_document_watcher, start_document_watcher
 from sgptAgent.research_automation import (
     ResearchAutomation, execute_research_command_with_approval,
     get_safe_research_suggestions
@@ -35,6 +38,7 @@ DOCUMENTS_DIR.mkdir(exist_ok=True)
 # In-memory storage for research tasks and their progress
 # In a real-world app, this would be a database (Redis, PostgreSQL, etc.)
 research_tasks = {}
+research_cancel_tokens = {}  # Kept apart from research_tasks, which is returned as JSON
 
 # Automation system storage
 automation_tasks = {}
@@ -57,6 +61,18 @@ async def startup_event():
         print(f"⚠️ Failed to initialize automation system: {e}")
         automation_system = None
 
+    # Keep each project's local document index up to date in the background
+    try:
+        start_document_watcher(str(DOCUMENTS_DIR))
+    except Exception as e:
+        print(f"⚠️ Failed to start the document watcher: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    watcher = get_document_watcher()
+    if watcher:
+        watcher.stop()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     relative_docs_dir = os.path.relpath(DOCUMENTS_DIR, Path(__file__).resolve().parent.parent)
@@ -99,6 +115,14 @@ async def get_projects():
     projects = [d.name for d in DOCUMENTS_DIR.iterdir() if d.is_dir()]
     return {"projects": sorted(projects)}
 
+@app.get("/api/index/status")
+async def get_index_status():
+    """Background indexing state of every project's local documents."""
+    watcher = get_document_watcher()
+    if not watcher:
+        return {"enabled": False, "mode": None, "projects": {}}
+    return {"enabled": True, "mode": watcher.mode, "projects": watcher.status()}
+
 @app.post("/api/research")
 async def start_research(request: Request, background_tasks: BackgroundTasks):
     data = await request.json()
@@ -106,6 +130,9 @@ async def start_research(request: Request, background_tasks: BackgroundTasks):
     query = data.get("query")
     if not query:
         raise HTTPException(status_code=400, detail="Research query is required.")
+    for field in ("resume", "rerender"):
+        if data.get(field) and not is_valid_run_id(data[field]):
+            raise HTTPException(status_code=400, detail=f"Invalid run id for '{field}'.")
 
     task_id = str(uuid.uuid4())
     
@@ -118,6 +145,7 @@ async def start_research(request: Request, background_tasks: BackgroundTasks):
         "error": None,
         "start_time": datetime.datetime.now().isoformat()
     }
+    research_cancel_tokens[task_id] = CancellationToken()
 
     background_tasks.add_task(run_research_task, task_id, data)
     
@@ -173,10 +201,15 @@ async def run_research_task(task_id: str, data: dict):
             local_docs_path=data.get("local_docs_path"),
             domain=data.get("domain"),
             research_depth=data.get("research_depth", "balanced"),
+            time_budget=data.get("time_budget"),  # Optional wall-clock budget in seconds
+            resume=data.get("resume"),  # Run id of an interrupted run to continue from its checkpoints
+            rerender=data.get("rerender"),  # Run id of a finished run to rebuild with new presentation options
+            cancel_token=research_cancel_tokens.get(task_id),
             progress_callback=progress_callback
         )
         
         task["report_path"] = report_path
+        task["run_id"] = agent.last_run_id
         task["total_results_found"] = total_results_found
         task["successful_queries"] = successful_queries
         task["total_queries"] = total_queries
@@ -189,35 +222,46 @@ async def run_research_task(task_id: str, data: dict):
         task["status"] = "completed"
         task["progress"] = 100
 
+    except ResearchCancelled as e:
+        task["status"] = "cancelled"
+        task["progress"] = 0
+        task["error"] = str(e)
+        task["abandoned"] = e.abandoned
+        task["run_id"] = agent.last_run_id  # Can be passed back as "resume"
+        task["log"].append({"timestamp": datetime.datetime.now().isoformat(), "log": str(e)})
     except Exception as e:
         import traceback
         task["status"] = "failed"
         task["error"] = str(e)
         task["log"].append({"timestamp": datetime.datetime.now().isoformat(), "log": f"Error: {str(e)}"})
         task["log"].append({"timestamp": datetime.datetime.now().isoformat(), "log": traceback.format_exc()})
+    finally:
+        research_cancel_tokens.pop(task_id, None)
 
 @app.post("/api/research/cancel/{task_id}")
 async def cancel_research(task_id: str):
     """Cancel a running research task."""
-    if task_id not in tasks:
+    if task_id not in research_tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = tasks[task_id]
+    task = research_tasks[task_id]
     
     if task["status"] in ["completed", "failed", "cancelled"]:
         return {"message": "Task already finished", "status": task["status"]}
     
-    # Mark task as cancelled
-    task["status"] = "cancelled"
-    task["progress"] = 0
+    # Abort the run's in-flight work; run_research_task marks the task cancelled once it has stopped
+    token = research_cancel_tokens.get(task_id)
+    if token:
+        token.cancel()
+    task["status"] = "cancelling"
     task["log"].append({
         "timestamp": datetime.datetime.now().isoformat(), 
-        "desc": "🛑 Research cancelled",
-        "substep": "Research was cancelled by the user.",
+        "desc": "🛑 Cancelling research",
+        "substep": "Stopping searches, page fetches and LLM calls...",
         "log": "Research cancelled by user request"
     })
     
-    return {"message": "Research cancelled successfully", "status": "cancelled"}
+    return {"message": "Research cancellation requested", "status": "cancelling"}
 
 @app.get("/api/reports")
 async def get_reports(path: str = '.'):
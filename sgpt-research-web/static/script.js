@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const structuredDataPromptInput = document.getElementById('structured-data-prompt-input');
     const projectNameSelect = document.getElementById('project-name-select');
     const newProjectRow = document.getElementById('new-project-row');
+    const indexStatus = document.getElementById('index-status');
     const newProjectNameInput = document.getElementById('new-project-name-input');
     const modelSelect = document.getElementById('model-select');
     const domainSelect = document.getElementById('domain-select');
@@ -94,12 +95,48 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Background indexing state of the selected project's documents (or of all projects)
+    const fetchIndexStatus = async () => {
+        try {
+            const response = await fetch('/api/index/status');
+            const data = await response.json();
+            if (!data.enabled) {
+                indexStatus.textContent = 'Background indexing is off';
+                return;
+            }
+            const project = projectNameSelect.value;
+            const state = data.projects[project];
+            if (project && project !== '__new__') {
+                if (!state) {
+                    indexStatus.textContent = 'Not indexed yet';
+                } else if (state.state === 'indexing') {
+                    indexStatus.textContent = `⏳ Indexing (${state.percent}%): ${state.message}`;
+                } else if (state.state === 'pending') {
+                    indexStatus.textContent = '🕒 Changes detected, indexing shortly';
+                } else if (state.state === 'error') {
+                    indexStatus.textContent = `⚠️ Indexing failed: ${state.message}`;
+                } else {
+                    indexStatus.textContent = `✅ ${state.files} files, ${state.chunks} chunks (updated ${state.last_indexed})`;
+                }
+                return;
+            }
+            const states = Object.values(data.projects);
+            const busy = states.filter(s => s.state === 'indexing' || s.state === 'pending').length;
+            indexStatus.textContent = busy
+                ? `⏳ Indexing ${busy} of ${states.length} projects`
+                : `✅ ${states.length} projects indexed (${data.mode})`;
+        } catch (error) {
+            indexStatus.textContent = 'Index status unavailable';
+        }
+    };
+
     projectNameSelect.addEventListener('change', () => {
         if (projectNameSelect.value === '__new__') {
             newProjectRow.style.display = 'flex';
         } else {
             newProjectRow.style.display = 'none';
         }
+        fetchIndexStatus();
     });
 
     // Clear fields
@@ -249,8 +286,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
-    function handleResearchCancellation() {
-        outputBox.value = 'Research was cancelled by the user.';
+    function handleResearchCancellation(summary) {
+        outputBox.value = summary ? `Research was cancelled by the user.\n\n${summary}` : 'Research was cancelled by the user.';
         progressLabel.textContent = '🛑 Research cancelled';
         progressSubstep.textContent = 'You can start a new research query.';
         progressBarFill.style.width = '0%';
@@ -404,7 +441,7 @@ document.addEventListener('DOMContentLoaded', () => {
             } else if (data.status === 'cancelled') {
                 clearInterval(progressInterval);
                 progressInterval = null;
-                handleResearchCancellation();
+                handleResearchCancellation(data.error);
             }
         } catch (error) {
             console.error('Error polling research status:', error);
@@ -552,6 +589,8 @@ document.addEventListener('DOMContentLoaded', () => {
     fetchModels();
     fetchProjects();
     fetchReports();
+    fetchIndexStatus();
+    setInterval(fetchIndexStatus, 5000);
     
     // Initialize automation listeners
     initializeAutomationListeners();
@@ -2,11 +2,13 @@ import sys
 import os
 import importlib.util
 import datetime
+import hashlib
+import math
+import re
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeElapsedColumn
 from rich.console import Console
 from pathlib import Path
-import glob
-import PyPDF2
+from typing import Iterator
 
 class _SuppressStdoutStderr:
     def __enter__(self):
@@ -25,12 +27,52 @@ with _SuppressStdoutStderr():
     from sgptAgent.config import cfg
     from sgptAgent.web_search import search_web_with_fallback, fetch_url_text
     from sgptAgent.query_enhancement import enhance_search_query, score_search_results, query_enhancer
+    from sgptAgent.cancellation import CancellationToken
+    from sgptAgent.llm_scheduler import max_llm_concurrency
+    from sgptAgent.run_metrics import RunMetrics
+    from sgptAgent.summary_cache import SummaryCache, get_summary_cache
+    from sgptAgent.text_ranking import estimate_tokens, rank_passages, select_passages, split_passages
+    from sgptAgent.topic_clustering import cluster_by_topic
+    from sgptAgent.context_packer import pack_context
+    from sgptAgent.chunking import Chunk, chunk_stream
+    from sgptAgent.stream_filter import clean_reasoning, strip_fake_citations
 
 from dotenv import load_dotenv
 load_dotenv()
 
+# Lines that are list items: "-", "*", "•" or "1." style markers
+_BULLET_RE = re.compile(r'\s*(?:[-*•]|\d\.)')
+
+SUMMARY_PROMPT_TEMPLATE = "{context}Create a comprehensive summary of the following content. Focus on extracting specific facts, data, examples, and actionable insights. Your summary should be detailed and thorough, covering:\n\n1. Main points and key findings\n2. Specific data, statistics, numbers, and examples\n3. Important context and background information\n4. Business insights, trends, or market information\n5. Any conclusions, recommendations, or implications\n\nAim for 4-6 detailed paragraphs that capture the full scope and depth of the information. Include specific details and avoid generic statements:\n\n{content}"
+# Changing the summary prompt changes its version, which invalidates cached summaries.
+SUMMARY_PROMPT_VERSION = hashlib.sha256(SUMMARY_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:16]
+
+MAP_PROMPT_TEMPLATE = "{context}The following is one section of a longer document. Extract the specific facts, figures, names, dates and conclusions it contains that relate to: {goal}\n\nBe concise: one dense paragraph or a short bullet list. Do not add information that is not in the section.\n\nSection {index} of {total}:\n{content}"
+MAP_REDUCE_PROMPT_VERSION = hashlib.sha256((SUMMARY_PROMPT_TEMPLATE + MAP_PROMPT_TEMPLATE).encode("utf-8")).hexdigest()[:16]
+MAP_SUMMARY_TOKENS = 400  # num_predict for each map summary; bounds the reduce prompt
+
+BATCH_PROMPT_TEMPLATE = """{context}Summarize each of the following short source documents separately. Focus on specific facts, figures, names, dates and conclusions, especially those related to: {goal}
+
+Return ONLY a JSON object that maps each document id to its summary (one or two detailed paragraphs). Do not merge documents and do not add commentary. Example format:
+{{"S1": "Summary of document S1...", "S2": "Summary of document S2..."}}
+
+Documents:
+
+{documents}"""
+BATCH_PROMPT_VERSION = hashlib.sha256(BATCH_PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:16]
+BATCH_SUMMARY_TOKENS_PER_DOC = 350  # num_predict allowance per packed document
+MAX_DOCS_PER_BATCH = 8
+
+PARTIAL_SYNTHESIS_PROMPT_TEMPLATE = "{context}You are a research analyst. The following material ({kind}) covers one theme of a larger research project on: {goal}\n\nWrite a dense partial analysis of this material: the key findings, specific facts, figures, names and dates, and any points where the sources disagree. Do not add information that is not in the material.\n\n{content}"
+PARTIAL_SYNTHESIS_MAX_LEVELS = 4  # merge levels before the remaining partials are trimmed to the budget
+DEFAULT_MAX_TOKENS = 6144  # num_predict for summaries and reports when the caller does not set one
+
+
+class SynthesisFailed(Exception):
+    """Synthesis produced no analysis; the message is shown in its place."""
+
 class ResearchAgent:
-    def __init__(self, model=None, temperature=0.3, max_tokens=6144, system_prompt="", ctx_window=8192, **kwargs):
+    def __init__(self, model=None, temperature=0.3, max_tokens=DEFAULT_MAX_TOKENS, system_prompt="", ctx_window=8192, **kwargs):
         self.model = model or cfg.get("DEFAULT_MODEL")
         self.embedding_model = cfg.get("EMBEDDING_MODEL")
         # Remove 'ollama/' prefix if present
@@ -39,24 +81,23 @@ class ResearchAgent:
         self.llm = OllamaClient()
         self.memory = []  # Simple in-memory history for now
         self.temperature = temperature
-        self.max_tokens = max_tokens
+        self.max_tokens = max_tokens or DEFAULT_MAX_TOKENS  # the web API passes None when the client omits it
         self.system_prompt = system_prompt
         self.ctx_window = ctx_window
-        self.local_document_index = [] # Stores chunks of local documents
-
-    def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> list:
-        """Splits text into overlapping chunks."""
-        chunks = []
-        if not text:
-            return chunks
-        words = text.split()
-        if len(words) <= chunk_size:
-            return [" ".join(words)]
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append(chunk)
-        return chunks
+        self.local_document_index = None  # LocalDocumentIndex of the local documents, set by index_local_documents
+        self.metrics = RunMetrics()  # Replaced with a shared instance by the Orchestrator for each run
+        self.time_budget = None  # Optional TimeBudget, set by the Orchestrator for time-boxed runs
+        self.checkpoint = None  # RunCheckpoint of the current run, set by the Orchestrator
+        self.cancel_token = CancellationToken()  # Replaced with the run's token by the Orchestrator
+        self.summary_cache = get_summary_cache()
+
+    def _chunk_text(self, text) -> Iterator[Chunk]:
+        """
+        Splits text (a string, or an iterable of pieces such as file blocks or PDF pages) into
+        sentence-aligned chunks bounded by estimated tokens, with character offsets.
+        """
+        pieces = [text] if isinstance(text, str) else text
+        return chunk_stream(pieces, int(cfg.get("CHUNK_TOKENS")), int(cfg.get("CHUNK_OVERLAP_TOKENS")))
 
     def _get_embedding(self, text: str) -> list:
         """Helper to get embeddings for a text chunk using Ollama."""
@@ -84,42 +125,69 @@ class ResearchAgent:
             emit("Local documents path not found.", log=f"Path not found: {local_docs_path}")
             return
 
-        emit("Indexing local documents...", substep="Indexing", log=f"Indexing documents from {local_docs_path}")
-        
-        supported_extensions = ['.txt', '.md', '.pdf'] # Add more as needed
-        
-        for ext in supported_extensions:
-            for file_path in glob.glob(os.path.join(local_docs_path, '**', f'*{ext}'), recursive=True):
-                try:
-                    content = ""
-                    if ext == '.txt' or ext == '.md':
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                    elif ext == '.pdf':
-                        try:
-                            with open(file_path, 'rb') as f:
-                                reader = PyPDF2.PdfReader(f)
-                                for page in reader.pages:
-                                    content += page.extract_text() or ""
-                        except Exception as e:
-                            emit(f"Error reading PDF {file_path}: {e}", log=f"PDF read error: {e}")
-                            continue
-
-                    if content:
-                        chunks = self._chunk_text(content)
-                        for i, chunk in enumerate(chunks):
-                            embedding = self._get_embedding(chunk)
-                            self.local_document_index.append({
-                                "source": file_path,
-                                "chunk_id": i,
-                                "content": chunk,
-                                "embedding": embedding
-                            })
-                        emit(f"Indexed {len(chunks)} chunks from {file_path}", log=f"Indexed {file_path}")
-                except Exception as e:
-                    emit(f"Error indexing {file_path}: {e}", log=f"Error indexing {file_path}: {e}")
-        
-        emit(f"Finished indexing. Total chunks: {len(self.local_document_index)}", bar='', substep="Indexing", log="Local document indexing complete.")
+        from sgptAgent.ingestion import IngestionPipeline, find_documents
+        from sgptAgent.local_index import index_lock
+        # One sync per folder at a time (the background watcher may be syncing it too)
+        with index_lock(local_docs_path):
+            emit("Indexing local documents...", substep="Indexing", log=f"Indexing documents from {local_docs_path}")
+            index = self._open_local_index(local_docs_path)
+            file_paths = find_documents(local_docs_path)
+            pipeline = IngestionPipeline(
+                index,
+                embed_batch=lambda texts: self.llm.embed_batch(self.embedding_model, texts),
+                chunker=self._chunk_text,
+                emit=emit,
+                workers=int(cfg.get("INGEST_WORKERS")),
+                batch_size=int(cfg.get("EMBED_BATCH_SIZE")),
+                dedup_similarity=float(cfg.get("NEAR_DUPLICATE_SIMILARITY")),
+            )
+            # Prune first: files whose duplicate chunks pointed at a deleted file are then re-indexed by this sync
+            removed = index.prune(file_paths)
+            stats = pipeline.run(file_paths)
+
+            try:
+                index.save()
+            except OSError as e:
+                emit(f"Could not save the local index: {e}", log=f"Index save error: {e}")
+            self.local_document_index = index
+            emit(f"Finished indexing. Total chunks: {len(index)}", bar='', substep="Indexing",
+                 log=f"Local document indexing complete ({stats['files']} indexed, {stats['unchanged']} unchanged, "
+                     f"{stats['failed']} failed, {removed} removed files, {stats['duplicate_chunks']} duplicate chunks skipped).")
+
+    def open_local_documents(self, local_docs_path: str, progress_callback=None):
+        """
+        Search the saved index of ``local_docs_path`` at once, read-only, then sync the folder and search the
+        synced index; the sync is left to the background watcher when it watches the folder or is syncing it.
+        """
+        from sgptAgent.doc_watcher import get_document_watcher
+        from sgptAgent.local_index import index_lock
+        self.local_document_index = self._open_local_index(local_docs_path, read_only=True)
+        watcher = get_document_watcher()
+        if index_lock(local_docs_path).locked() or (
+                watcher and os.path.dirname(os.path.abspath(local_docs_path)) == watcher.root):
+            print(f"[LOCAL INDEX] {local_docs_path} is kept up to date in the background, "
+                  f"searching its {len(self.local_document_index)} saved chunks")
+            return
+        self.index_local_documents(local_docs_path, progress_callback=progress_callback)
+        # A read-only copy stays searchable if another process syncs the folder later
+        self.local_document_index = self._open_local_index(local_docs_path, read_only=True)
+
+    def _open_local_index(self, local_docs_path: str, read_only: bool = False):
+        from sgptAgent.local_index import LocalDocumentIndex
+        return LocalDocumentIndex(
+            local_docs_path, self.embedding_model,
+            chunking={"tokens": int(cfg.get("CHUNK_TOKENS")), "overlap": int(cfg.get("CHUNK_OVERLAP_TOKENS"))},
+            retrieval=str(cfg.get("LOCAL_INDEX_RETRIEVAL")),
+            candidates=int(cfg.get("LOCAL_INDEX_CANDIDATES")),
+            precision=str(cfg.get("LOCAL_INDEX_PRECISION")),
+            rescore=int(cfg.get("LOCAL_INDEX_RESCORE")),
+            ann_backend=str(cfg.get("LOCAL_INDEX_ANN_BACKEND")),
+            ann_min_rows=int(cfg.get("LOCAL_INDEX_ANN_MIN_CHUNKS")),
+            read_only=read_only,
+            nlist=int(cfg.get("LOCAL_INDEX_IVF_LISTS")),
+            nprobe=int(cfg.get("LOCAL_INDEX_IVF_PROBES")),
+            ef=int(cfg.get("LOCAL_INDEX_HNSW_EF")),
+        )
 
     async def plan(self, goal: str, audience: str = "", tone: str = "", improvement: str = "", **kwargs) -> list:
         """Use the LLM to break down the research goal into steps, with context."""
@@ -260,10 +328,28 @@ class ResearchAgent:
         print(f"[DOMAIN DEBUG] No specific domain detected, using original query")
         return query
 
-    async def fetch_and_summarize_url(self, url: str, snippet: str = "", audience: str = "", tone: str = "", improvement: str = "") -> str:
+    async def fetch_page_text(self, url: str) -> str:
+        """Fetch the full extracted text of a page, or an empty string if extraction failed."""
+        with self.cancel_token.track("page_fetches"):
+            content = await fetch_url_text(url, max_chars=int(cfg.get("PAGE_TEXT_MAX_CHARS")))
+        if not content or content.startswith("[Error fetching"):
+            return ""
+        return content
+
+    async def fetch_and_summarize_url(self, url: str, snippet: str = "", audience: str = "", tone: str = "", improvement: str = "", goal: str = "", research_depth: str = "balanced") -> str:
         """Fetch content from URL and summarize it."""
         try:
-            content = await fetch_url_text(url)
+            content = await self.fetch_page_text(url)
+            return await self.summarize_page_content(url, content, snippet, audience, tone, improvement, goal, research_depth)
+        except Exception as e:
+            return f"Error processing {url}: {str(e)}. Snippet: {snippet}"
+
+    async def summarize_page_content(self, url: str, content: str, snippet: str = "", audience: str = "", tone: str = "", improvement: str = "", goal: str = "", research_depth: str = "balanced") -> str:
+        """
+        Summarize already-fetched page text, sending only the passages most relevant to the goal.
+        Long documents are summarized map-reduce style in the research depths listed in MAP_REDUCE_DEPTHS.
+        """
+        try:
             if not content or len(content.strip()) < 100:
                 return f"Unable to fetch meaningful content from {url}. Snippet: {snippet}"
             
@@ -275,12 +361,243 @@ class ResearchAgent:
             if improvement:
                 context += f"Special instructions: {improvement}. "
             
-            prompt = f"{context}Create a comprehensive summary of the following content. Focus on extracting specific facts, data, examples, and actionable insights. Your summary should be detailed and thorough, covering:\n\n1. Main points and key findings\n2. Specific data, statistics, numbers, and examples\n3. Important context and background information\n4. Business insights, trends, or market information\n5. Any conclusions, recommendations, or implications\n\nAim for 4-6 detailed paragraphs that capture the full scope and depth of the information. Include specific details and avoid generic statements:\n\n{content[:8000]}"
-            summary = await self.llm.chat(self.model, prompt, temperature=self.temperature, max_tokens=self.max_tokens)
+            token_budget = int(cfg.get("SUMMARY_INPUT_TOKENS"))
+            map_reduce_depths = [depth.strip() for depth in cfg.get("MAP_REDUCE_DEPTHS").split(",")]
+            use_map_reduce = research_depth in map_reduce_depths and estimate_tokens(content) > 2 * token_budget
+
+            excerpt = None
+            key_context = context
+            if use_map_reduce:
+                chunks = self._select_map_chunks(content, goal or snippet)
+                cache_text, prompt_version = "\n\n".join(chunks), MAP_REDUCE_PROMPT_VERSION
+                # The map prompt asks for facts related to the goal, so its summary is only valid for that goal
+                key_context = f"{context}Goal: {goal or snippet}"
+            else:
+                # Rank passages against the goal so deep sections survive and boilerplate is dropped
+                excerpt = select_passages(content, goal or snippet, token_budget)
+                if len(excerpt) < len(content):
+                    self.metrics.incr("summary.pages_prefiltered")
+                    print(f"[PREFILTER] {url[:60]}: kept {len(excerpt)} of {len(content)} chars")
+                cache_text, prompt_version = excerpt, SUMMARY_PROMPT_VERSION
+
+            # Unchanged pages summarized with the same prompt, context and model are served from disk
+            cache_key = SummaryCache.make_key(cache_text, prompt_version, key_context, self.model)
+            cached_summary = self.summary_cache.get(cache_key)
+            if cached_summary is not None:
+                self.metrics.incr("summary_cache.hits")
+                print(f"[SUMMARY CACHE] Hit for {url[:60]}")
+                return cached_summary
+            self.metrics.incr("summary_cache.misses")
+
+            summary = None
+            if use_map_reduce:
+                summary = await self._map_reduce_summarize(chunks, context, goal or snippet, url)
+            if summary is None:
+                if excerpt is None:
+                    excerpt = select_passages(content, goal or snippet, token_budget)
+                prompt = SUMMARY_PROMPT_TEMPLATE.format(context=context, content=excerpt)
+                self.metrics.incr("summary.prompt_tokens", estimate_tokens(prompt))
+                summary = await self.llm.chat(self.model, prompt, temperature=self.temperature, max_tokens=self.max_tokens)
+            # Never cache transport errors reported by the Ollama client
+            if summary and summary.strip() and not summary.startswith("[Ollama"):
+                self.summary_cache.set(cache_key, summary)
             return summary
         except Exception as e:
             return f"Error processing {url}: {str(e)}. Snippet: {snippet}"
 
+    def _select_map_chunks(self, content: str, goal: str) -> list:
+        """
+        Split a long document into map chunks and keep as many as the map-reduce token budget allows.
+        When the document is over budget, the chunks most relevant to the goal are kept, in document order.
+        """
+        chunk_tokens = int(cfg.get("MAP_REDUCE_CHUNK_TOKENS"))
+        # Each chunk costs its own prompt plus a map summary that becomes reduce input
+        max_chunks = max(2, int(cfg.get("MAP_REDUCE_TOKEN_BUDGET")) // (chunk_tokens + MAP_SUMMARY_TOKENS))
+        chunks = split_passages(content, target_chars=chunk_tokens * 4)
+        if len(chunks) > max_chunks:
+            print(f"[MAP-REDUCE] Document has {len(chunks)} chunks, keeping the {max_chunks} most relevant")
+            chunks = [chunks[i] for i in sorted(rank_passages(chunks, goal)[:max_chunks])]
+        return chunks
+
+    async def _map_reduce_summarize(self, chunks: list, context: str, goal: str, url: str = ""):
+        """
+        Summarize each chunk concurrently (bounded by the global LLM limiter), then merge the
+        partial summaries with the standard summary prompt. Returns None if every map call failed.
+        """
+        import asyncio
+        self.metrics.incr("map_reduce.documents")
+        self.metrics.incr("map_reduce.map_calls", len(chunks))
+        print(f"[MAP-REDUCE] Summarizing {url[:60]} in {len(chunks)} chunks")
+
+        async def summarize_chunk(index, chunk):
+            prompt = MAP_PROMPT_TEMPLATE.format(context=context, goal=goal, index=index + 1, total=len(chunks), content=chunk)
+            self.metrics.incr("map_reduce.prompt_tokens", estimate_tokens(prompt))
+            return await self.llm.chat(self.model, prompt, temperature=self.temperature, max_tokens=MAP_SUMMARY_TOKENS)
+
+        with self.metrics.timer("map_reduce.map"):
+            partials = await asyncio.gather(*(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks)), return_exceptions=True)
+
+        notes = [f"Section {i + 1} notes:\n{partial.strip()}" for i, partial in enumerate(partials)
+                 if isinstance(partial, str) and partial.strip() and not partial.startswith("[Ollama")]
+        if not notes:
+            print(f"[MAP-REDUCE] All map summaries failed for {url[:60]}, falling back to single-pass summary")
+            return None
+
+        prompt = SUMMARY_PROMPT_TEMPLATE.format(context=context, content="\n\n".join(notes))
+        self.metrics.incr("map_reduce.prompt_tokens", estimate_tokens(prompt))
+        with self.metrics.timer("map_reduce.reduce"):
+            return await self.llm.chat(self.model, prompt, temperature=self.temperature, max_tokens=self.max_tokens)
+
+    async def _hierarchical_reduce(self, texts: list, goal: str, context: str, token_budget: int) -> str:
+        """
+        Condense ``texts`` into source material that fits ``token_budget`` tokens: texts are grouped by
+        topic into groups that fit the budget, each group is synthesized concurrently into a partial
+        analysis, and the partials are grouped and merged again until they fit.
+        """
+        import asyncio
+        # Partials must be well below the budget, or merging them would never converge
+        partial_tokens = max(128, min(int(cfg.get("PARTIAL_SYNTHESIS_TOKENS")), token_budget // 3))
+        # Every prompt must fit the budget, including a single text that is larger than it
+        texts = [select_passages(text, goal, token_budget) for text in texts if text and text.strip()]
+        kind = "source summaries"
+
+        for level in range(1, PARTIAL_SYNTHESIS_MAX_LEVELS + 1):
+            if estimate_tokens("\n\n".join(texts)) <= token_budget:
+                break
+            groups = cluster_by_topic(texts, token_budget)
+            print(f"[SYNTHESIS DEBUG] Level {level}: synthesizing {len(texts)} texts in {len(groups)} topic groups")
+            self.metrics.incr("synthesis.levels")
+            self.metrics.incr("synthesis.groups", len(groups))
+            timeout = 120 * math.ceil(len(groups) / max_llm_concurrency())
+            if self.time_budget:
+                timeout = self.time_budget.cap(timeout, "report", floor=15.0) * 0.5
+
+            async def synthesize_group(group):
+                content = "\n\n".join(texts[i] for i in group)
+                if len(group) == 1:
+                    # Nothing to merge; only shorten it
+                    return select_passages(content, goal, partial_tokens)
+                prompt = PARTIAL_SYNTHESIS_PROMPT_TEMPLATE.format(context=context, kind=kind, goal=goal, content=content)
+                try:
+                    partial = await asyncio.wait_for(
+                        self.llm.chat(self.model, prompt, temperature=self.temperature, max_tokens=partial_tokens),
+                        timeout=timeout)
+                    partial = self.clean_llm_response(partial, bullets_only=False)
+                except asyncio.TimeoutError:
+                    partial = ""
+                if not partial.strip() or partial.startswith("[Ollama"):
+                    # Keep the group's most relevant passages rather than losing it
+                    self.metrics.incr("synthesis.partials_failed")
+                    return select_passages(content, goal, partial_tokens)
+                return select_passages(partial.strip(), goal, partial_tokens)
+
+            with self.metrics.timer("synthesis.hierarchical"):
+                texts = await asyncio.gather(*(synthesize_group(group) for group in groups))
+            kind = "partial analyses of source summaries"
+
+        # Only packs anything with a very small budget, when merging stopped before the partials fit
+        return "\n\n".join(pack_context(texts, goal, token_budget))
+
+    async def summarize_short_documents(self, documents: list, goal: str = "", audience: str = "", tone: str = "", improvement: str = "") -> dict:
+        """
+        Summarize several short documents with as few LLM calls as possible.
+
+        ``documents`` is a list of dicts with ``id``, ``url``, ``title`` and ``content``. Documents are
+        packed into prompts of up to BATCH_SUMMARY_TOKEN_BUDGET tokens that ask for a JSON object keyed
+        by document id. Returns {id: summary} for every document that was summarized (or cached);
+        callers should summarize any missing ids individually.
+        """
+        import asyncio
+        context = ""
+        if audience:
+            context += f"Intended audience: {audience}. "
+        if tone:
+            context += f"Preferred tone/style: {tone}. "
+        if improvement:
+            context += f"Special instructions: {improvement}. "
+
+        summaries, pending = {}, []
+        # The batch prompt focuses on the goal, so it is part of the key
+        key_context = f"{context}Goal: {goal}"
+        for doc in documents:
+            cache_key = SummaryCache.make_key(doc["content"], BATCH_PROMPT_VERSION, key_context, self.model)
+            cached_summary = self.summary_cache.get(cache_key)
+            if cached_summary is not None:
+                self.metrics.incr("summary_cache.hits")
+                summaries[doc["id"]] = cached_summary
+            else:
+                self.metrics.incr("summary_cache.misses")
+                pending.append((doc, cache_key))
+
+        # Greedy packing in arrival order up to the token budget
+        token_budget = int(cfg.get("BATCH_SUMMARY_TOKEN_BUDGET"))
+        base_tokens = estimate_tokens(BATCH_PROMPT_TEMPLATE) + estimate_tokens(context + goal)
+        groups, current, used = [], [], base_tokens
+        for doc, cache_key in pending:
+            cost = estimate_tokens(doc["content"]) + 30
+            if current and (used + cost > token_budget or len(current) >= MAX_DOCS_PER_BATCH):
+                groups.append(current)
+                current, used = [], base_tokens
+            current.append((doc, cache_key))
+            used += cost
+        if current:
+            groups.append(current)
+
+        async def summarize_group(group):
+            # A group of one gains nothing from packing; leave it to the full single-document prompt
+            if len(group) < 2:
+                return {}
+            sections = [f"[S{i + 1}] Title: {doc.get('title', '')}\nURL: {doc.get('url', '')}\n{doc['content'].strip()}"
+                        for i, (doc, _) in enumerate(group)]
+            prompt = BATCH_PROMPT_TEMPLATE.format(context=context, goal=goal, documents="\n\n".join(sections))
+            self.metrics.incr("batch_summary.calls")
+            self.metrics.incr("batch_summary.documents", len(group))
+            self.metrics.incr("batch_summary.prompt_tokens", estimate_tokens(prompt))
+            with self.metrics.timer("batch_summary"):
+                response = await self.llm.chat(self.model, prompt, temperature=self.temperature,
+                                               max_tokens=min(self.max_tokens, BATCH_SUMMARY_TOKENS_PER_DOC * len(group)))
+            parsed = self._parse_batch_summaries(response, [f"S{i + 1}" for i in range(len(group))])
+            unpacked = {}
+            for i, (doc, cache_key) in enumerate(group):
+                summary = parsed.get(f"S{i + 1}")
+                if summary and len(summary.strip()) > 50:
+                    self.summary_cache.set(cache_key, summary)
+                    unpacked[doc["id"]] = summary
+            if len(unpacked) < len(group):
+                print(f"[BATCH SUMMARY] {len(group) - len(unpacked)} of {len(group)} packed documents missing from response")
+            return unpacked
+
+        group_results = await asyncio.gather(*(summarize_group(group) for group in groups), return_exceptions=True)
+        for result in group_results:
+            if isinstance(result, Exception):
+                print(f"[BATCH SUMMARY] Packed summarization failed: {result}")
+                continue
+            summaries.update(result)
+        return summaries
+
+    def _parse_batch_summaries(self, response: str, ids: list) -> dict:
+        """Unpack a JSON object of per-document summaries, tolerating reasoning tags and loose formatting."""
+        import json
+        import re
+        response = clean_reasoning(response or '', strip_monologue=None, strip_citations=False)
+        start, end = response.find('{'), response.rfind('}')
+        if start != -1 and end > start:
+            try:
+                data = json.loads(response[start:end + 1], strict=False)
+                if isinstance(data, dict):
+                    return {str(key).strip('[] '): str(value) for key, value in data.items() if str(key).strip('[] ') in ids}
+            except ValueError:
+                pass
+        # Fall back to pulling out "S<n>": "..." pairs from malformed JSON
+        parsed = {}
+        for key, value in re.findall(r'"\[?(S\d+)\]?"\s*:\s*"((?:[^"\\]|\\.)*)"', response, flags=re.DOTALL):
+            if key in ids:
+                try:
+                    parsed[key] = json.loads(f'"{value}"', strict=False)
+                except ValueError:
+                    parsed[key] = value
+        return parsed
+
     def _is_semantically_similar(self, text: str, goal: str, threshold: float = 0.5) -> bool:
         """Helper to check for semantic similarity."""
         sim_path = os.path.join(os.path.dirname(__file__), 'semantic_similarity.py')
@@ -337,13 +654,13 @@ class ResearchAgent:
         # Fast fail for empty data to prevent hanging
         if not summaries:
             print("[SYNTHESIS] No summaries provided - returning early")
-            return "No relevant information found to synthesize."
+            raise SynthesisFailed("No relevant information found to synthesize.")
         
         # Fast fail for very short summaries that indicate data collection failure
         total_content_length = sum(len(str(summary)) for summary in summaries)
         if total_content_length < 100:
             print(f"[SYNTHESIS] Insufficient content ({total_content_length} chars) - likely data collection failure")
-            return "Insufficient data collected for meaningful analysis. Please try again or check your internet connection."
+            raise SynthesisFailed("Insufficient data collected for meaningful analysis. Please try again or check your internet connection.")
 
         # Validate content relevance before synthesis
         # Adjust validation strictness based on research depth
@@ -364,11 +681,12 @@ class ResearchAgent:
             relevant_summaries = summaries
             print("Using all summaries as fallback for synthesis")
         
-        # Limit the number of summaries to avoid exceeding the context window
-        if len(relevant_summaries) > 50:
-            print(f"INFO: Limiting summaries for synthesis from {len(relevant_summaries)} to 50.")
-            relevant_summaries = relevant_summaries[:50]
-
+        # Hierarchical synthesis condenses every summary by topic instead of dropping what does not fit
+        hierarchical = kwargs.get('hierarchical_synthesis')
+        if hierarchical is None:
+            hierarchical = research_depth in [depth.strip() for depth in cfg.get("HIERARCHICAL_SYNTHESIS_DEPTHS").split(",")]
+        synthesis_budget = int(cfg.get("SYNTHESIS_TOKEN_BUDGET"))
+        
         context = ""
         if audience:
             context += f"Intended audience: {audience}. "
@@ -388,26 +706,17 @@ class ResearchAgent:
             print(f"First summary preview: {relevant_summaries[0][:200]}...")
         print(f"========================\n")
         
-        # Handle content length for deep research mode
-        max_content_length = 12000  # Conservative limit for model context
-        if len(combined_summaries) > max_content_length:
-            print(f"[SYNTHESIS DEBUG] Content too long ({len(combined_summaries)} chars), truncating to {max_content_length} chars")
-            # Prioritize the most relevant summaries by taking from the beginning
-            # (since validate_content_relevance already sorted by relevance)
-            truncated_summaries = []
-            current_length = 0
-            for summary in relevant_summaries:
-                if current_length + len(summary) <= max_content_length:
-                    truncated_summaries.append(summary)
-                    current_length += len(summary)
-                else:
-                    # Add partial summary if there's room
-                    remaining_space = max_content_length - current_length
-                    if remaining_space > 200:  # Only add if meaningful content can fit
-                        truncated_summaries.append(summary[:remaining_space] + "...")
-                    break
-            combined_summaries = "\n\n".join(truncated_summaries)
-            print(f"[SYNTHESIS DEBUG] Truncated to {len(combined_summaries)} chars using {len(truncated_summaries)} summaries")
+        if hierarchical and estimate_tokens(combined_summaries) > synthesis_budget:
+            combined_summaries = await self._hierarchical_reduce(relevant_summaries, goal, context, synthesis_budget)
+            print(f"[SYNTHESIS DEBUG] Hierarchical synthesis condensed {len(relevant_summaries)} summaries to {len(combined_summaries)} chars")
+        
+        # Otherwise pack the most relevant, least redundant summaries (or their best sentences) into the budget
+        if not hierarchical and estimate_tokens(combined_summaries) > synthesis_budget:
+            print(f"[SYNTHESIS DEBUG] Content too long ({estimate_tokens(combined_summaries)} tokens), packing to {synthesis_budget} tokens")
+            packed_summaries = pack_context(relevant_summaries, goal, synthesis_budget)
+            combined_summaries = "\n\n".join(packed_summaries)
+            self.metrics.incr("synthesis.summaries_packed", len(packed_summaries))
+            print(f"[SYNTHESIS DEBUG] Packed {len(combined_summaries)} chars from {len(packed_summaries)} of {len(relevant_summaries)} summaries")
         
         # Use a more focused prompt for better synthesis quality
         research_depth = kwargs.get('research_depth', 'balanced')
@@ -474,25 +783,27 @@ Instructions:
                 'max_tokens': self.max_tokens,
                 'system_prompt': 'You are a professional research analyst. Provide comprehensive, factual analysis based on the provided information. Do not refuse to analyze any legitimate research topics.',
                 'top_p': 0.9,
-                'repeat_penalty': 1.1
+                'repeat_penalty': 1.1,
+                # Strip reasoning tags, monologue and fake citations while the synthesis streams in
+                'filter_reasoning': True,
             }
             
-            print(f"[SYNTHESIS DEBUG] About to call LLM with timeout=300s")
             # Add timeout to prevent infinite hanging
+            synthesis_timeout = 300  # 5 minute timeout for synthesis
+            if self.time_budget:
+                # Leave part of the report window for claim reasoning and writing the report
+                synthesis_timeout = self.time_budget.cap(300, "report", floor=15.0) * 0.7
+            print(f"[SYNTHESIS DEBUG] About to call LLM with timeout={synthesis_timeout:.0f}s")
             import asyncio
             try:
                 synthesis = await asyncio.wait_for(
                     self.llm.chat(synthesis_model, prompt, **llm_params),
-                    timeout=300  # 5 minute timeout for synthesis
+                    timeout=synthesis_timeout
                 )
                 print(f"[SYNTHESIS DEBUG] LLM call completed, response length: {len(synthesis)}")
-                
-                # Clean reasoning artifacts from synthesis output
-                synthesis = self.clean_llm_response(synthesis)
-                print(f"[SYNTHESIS DEBUG] After cleaning artifacts, response length: {len(synthesis)}")
             except asyncio.TimeoutError:
-                print("[SYNTHESIS] LLM synthesis timed out after 5 minutes")
-                return "Analysis timed out. The research query may be too complex or the model is overloaded. Please try again with a simpler query or different research depth setting."
+                print(f"[SYNTHESIS] LLM synthesis timed out after {synthesis_timeout:.0f}s")
+                raise SynthesisFailed("Analysis timed out. The research query may be too complex or the model is overloaded. Please try again with a simpler query or different research depth setting.")
             
             # Debug: Check for refusal patterns
             refusal_patterns = [
@@ -522,19 +833,23 @@ Provide a comprehensive analysis covering:
 Write in a professional, analytical tone."""
                 
                 print("Retrying with simplified prompt...")
+                retry_timeout = self.time_budget.cap(180, "report", floor=15.0) * 0.7 if self.time_budget else 180
                 try:
                     synthesis = await asyncio.wait_for(
-                        self.llm.chat(self.model, simple_prompt, temperature=self.temperature, max_tokens=self.max_tokens),
-                        timeout=180  # 3 minute timeout for retry synthesis
+                        self.llm.chat(self.model, simple_prompt, temperature=self.temperature, max_tokens=self.max_tokens,
+                                      filter_reasoning=True),
+                        timeout=retry_timeout  # 3 minute timeout for retry synthesis
                     )
                 except asyncio.TimeoutError:
                     print("[SYNTHESIS] Retry synthesis also timed out")
-                    return "Analysis failed due to timeout. Please try a simpler query or check if the model is responding properly."
+                    raise SynthesisFailed("Analysis failed due to timeout. Please try a simpler query or check if the model is responding properly.")
             
             # Validate and clean up any hallucinated source references
             validated_synthesis = self.validate_and_clean_sources(synthesis, combined_summaries)
             return validated_synthesis
             
+        except SynthesisFailed:
+            raise
         except Exception as e:
             print(f"\n=== SYNTHESIS ERROR ===")
             print(f"Error: {str(e)}")
@@ -542,8 +857,8 @@ Write in a professional, analytical tone."""
             print(f"Prompt length: {len(prompt)} characters")
             print(f"========================\n")
             
-            # Return a basic analysis as fallback
-            return f"""# Analysis of {goal}
+            # Report a basic analysis as fallback
+            raise SynthesisFailed(f"""# Analysis of {goal}
 
 Based on the available research data, this analysis covers the key findings from {len(relevant_summaries)} sources.
 
@@ -555,40 +870,12 @@ The research gathered information from multiple authoritative sources covering v
 
 Detailed analysis was requested but encountered technical issues during generation. The source material contains relevant information that should be reviewed directly.
 
-*Note: This is a fallback response due to synthesis processing issues. Please check the source material directly for detailed information.*"""
+*Note: This is a fallback response due to synthesis processing issues. Please check the source material directly for detailed information.*""") from e
 
 
     def validate_and_clean_sources(self, synthesis: str, source_material: str) -> str:
         """Validate source references in synthesis and remove/flag hallucinated citations."""
-        import re
-        
-        # Common patterns for fake source references that LLMs generate
-        fake_source_patterns = [
-            r'\(Source: \[.*?\]\)',  # (Source: [Something])
-            r'\[.*? Source\]',       # [Print Shop Source], [Mimaki Source], etc.
-            r'\(.*? Source\)',       # (Print Shop Source)
-            r'Source: .*?(?=\.|\n)',  # Source: Something
-            r'According to \[.*?\]',  # According to [Source]
-            r'\[Source \d+\]',       # [Source 1], [Source 2]
-            r'\(Ref: .*?\)',         # (Ref: Something)
-            r'\[Ref \d+\]'          # [Ref 1], [Ref 2]
-        ]
-        
-        cleaned_synthesis = synthesis
-        removed_references = []
-        
-        # Remove fake source references
-        for pattern in fake_source_patterns:
-            matches = re.findall(pattern, cleaned_synthesis, re.IGNORECASE)
-            if matches:
-                removed_references.extend(matches)
-                cleaned_synthesis = re.sub(pattern, '', cleaned_synthesis, flags=re.IGNORECASE)
-        
-        # Clean up extra whitespace and punctuation left by removed references
-        cleaned_synthesis = re.sub(r'\s+', ' ', cleaned_synthesis)  # Multiple spaces to single
-        cleaned_synthesis = re.sub(r'\s+\.', '.', cleaned_synthesis)  # Space before period
-        cleaned_synthesis = re.sub(r'\s+,', ',', cleaned_synthesis)   # Space before comma
-        cleaned_synthesis = re.sub(r'\.\s*\.', '.', cleaned_synthesis) # Double periods
+        cleaned_synthesis, removed_references = strip_fake_citations(synthesis)
         
         # Log what was removed for debugging
         if removed_references:
@@ -604,35 +891,26 @@ Detailed analysis was requested but encountered technical issues during generati
 
     def retrieve_local_documents(self, query: str, top_k: int = 3) -> list:
         """Retrieves top_k most relevant local document chunks based on semantic similarity."""
-        if not self.local_document_index:
-            return []
+        return self.retrieve_local_documents_batch([query], top_k)[0]
 
-        query_embedding = self._get_embedding(query)
+    def retrieve_local_documents_batch(self, queries: list, top_k: int = 3) -> list:
+        """Top_k chunk contents for each query (vector similarity fused with BM25 keyword matches)."""
+        return [[hit["content"] for hit in hits] for hits in self.search_local_documents(queries, top_k)]
 
-        # Cosine similarity calculation
-        def cosine_similarity(v1, v2):
-            import numpy as np
-            dot_product = np.dot(v1, v2)
-            norm_v1 = np.linalg.norm(v1)
-            norm_v2 = np.linalg.norm(v2)
-            if norm_v1 == 0 or norm_v2 == 0:
-                return 0.0
-            return dot_product / (norm_v1 * norm_v2)
-
-        scored_chunks = []
-        for chunk_info in self.local_document_index:
-            if "embedding" in chunk_info:
-                score = cosine_similarity(query_embedding, chunk_info["embedding"])
-                scored_chunks.append((score, chunk_info))
-
-        # Sort by score in descending order and get top_k
-        scored_chunks.sort(key=lambda x: x[0], reverse=True)
-
-        relevant_chunks = []
-        for score, chunk_info in scored_chunks[:top_k]:
-            relevant_chunks.append(chunk_info["content"])
-
-        return relevant_chunks
+    def search_local_documents(self, queries: list, top_k: int = 3) -> list:
+        """Top_k chunk hits (source, chunk_id, content, offsets, score, similarity) for each query."""
+        if not self.local_document_index:
+            return [[] for _ in queries]
+        embeddings = [self._get_embedding(query) for query in queries]
+        # Queries whose embedding failed get no results
+        embedded = [i for i, embedding in enumerate(embeddings) if embedding]
+        results = [[] for _ in queries]
+        if embedded:
+            hits = self.local_document_index.search([embeddings[i] for i in embedded], top_k,
+                                                    query_texts=[queries[i] for i in embedded])
+            for i, query_hits in zip(embedded, hits):
+                results[i] = query_hits
+        return results
 
     async def critique_and_find_gaps(self, synthesis: str, goal: str) -> tuple:
         """Critique the synthesis and identify specific data gaps for targeted searches."""
@@ -748,6 +1026,7 @@ Make each gap a specific search query that could find the missing information.""
         """Write a formatted research report to the project directory."""
         if not filename:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            # The prefix keeps reports out of the project's local document index (ingestion.REPORT_PREFIX)
             filename = f"research_report_{timestamp}.md"
 
         save_dir = documents_base_dir
@@ -793,6 +1072,9 @@ This research utilized advanced web search techniques with domain-specific targe
 - Content Filtering: Relevance-scored and domain-validated
 - Source Quality: Prioritized authoritative and expert sources
 
+**Run Statistics:**
+{self.metrics.as_markdown()}
+
 """
         if structured_data:
             report_content += f"""## Structured Data
@@ -833,48 +1115,27 @@ All sources included in this research have been evaluated for authority, relevan
     async def run(self, goal: str, **kwargs):
         from sgptAgent.orchestrator import Orchestrator
         orchestrator = Orchestrator(**self.__dict__)
-        return await orchestrator.run(goal, **kwargs)
-
-    def clean_llm_response(self, response: str) -> str:
-        """Clean LLM response by removing thinking tags and explanatory text."""
-        import re
-        
-        # Remove thinking tags and their content (including <think> tags)
-        response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL)
-        response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
-        
-        # Remove common explanatory patterns that reasoning models produce
-        explanatory_patterns = [
-            r'Okay.*?(?=\n-|\n\*|\n\d+\.|$)',  # Catches "Okay, let's see. The user wants..."
-            r'I need to.*?(?=\n-|\n\*|\n\d+\.|$)',
-            r'Let me.*?(?=\n-|\n\*|\n\d+\.|$)',
-            r'First.*?(?=\n-|\n\*|\n\d+\.|$)',
-            r'The user.*?(?=\n-|\n\*|\n\d+\.|$)',
-            r'To answer.*?(?=\n-|\n\*|\n\d+\.|$)',
-            r'Here are.*?(?=\n-|\n\*|\n\d+\.|$)',
-            r'Based on.*?(?=\n-|\n\*|\n\d+\.|$)',
-        ]
-        
-        for pattern in explanatory_patterns:
-            response = re.sub(pattern, '', response, flags=re.DOTALL | re.IGNORECASE)
-        
-        # If response still doesn't contain bullet points, extract only lines that start with bullets
-        lines = response.split('\n')
-        bullet_lines = []
-        for line in lines:
-            stripped = line.strip()
-            if stripped and any(stripped.startswith(marker) for marker in ['-', '*', '•', '1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.']):
-                bullet_lines.append(line)
-        
+        try:
+            return await orchestrator.run(goal, **kwargs)
+        finally:
+            # Run id of the checkpoint, for resume=... or rerender=... in a later call
+            checkpoint = getattr(orchestrator, "checkpoint", None)
+            self.last_run_id = checkpoint.run_id if checkpoint else None
+
+    def clean_llm_response(self, response: str, bullets_only: bool = True) -> str:
+        """
+        Clean LLM response by removing thinking tags and explanatory text.
+
+        With ``bullets_only`` (lists such as generated queries) monologue lines are dropped anywhere and,
+        if the response contains bullet lines, only those are kept. Otherwise (prose such as a synthesis)
+        only the monologue preamble is dropped and paragraphs are preserved.
+        """
+        if not bullets_only:
+            return clean_reasoning(response or "", strip_monologue="preamble").strip()
+        lines = [line for line in clean_reasoning(response or "", strip_monologue="all").split('\n') if line.strip()]
+        bullet_lines = [line for line in lines if _BULLET_RE.match(line)]
         # If we found bullet points, use only those
-        if bullet_lines:
-            response = '\n'.join(bullet_lines)
-        
-        # Clean up extra whitespace
-        response = re.sub(r'\n\s*\n', '\n', response)
-        response = response.strip()
-        
-        return response
+        return '\n'.join(bullet_lines or lines).strip()
     
     def simplify_search_query(self, query: str) -> str:
         """Simplify complex search queries."""
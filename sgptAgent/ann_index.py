@@ -0,0 +1,259 @@
+"""
+Approximate nearest-neighbour search for large local document indexes.
+
+A searcher answers the same question as ``local_index.top_k`` (best rows by inner
+product with normalized queries) without scoring every row:
+
+- ``ivf``: an inverted-file index in numpy. Rows are bucketed by their nearest of
+  ``nlist`` k-means centroids and a query scores only the rows of its ``nprobe``
+  closest buckets, so only that fraction of a memory-mapped matrix is read.
+- ``faiss``: faiss ``IndexIVFFlat`` with the same ``nlist``/``nprobe`` knobs.
+- ``hnsw``: an hnswlib graph; ``ef`` trades latency for recall.
+
+faiss and hnswlib are optional; ``"auto"`` picks faiss, then hnswlib, then the numpy
+IVF. Raising ``nprobe`` or ``ef`` raises recall and latency. Searchers can take new rows
+without retraining and are saved next to the index they serve.
+"""
+
+import importlib.util
+import math
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+BACKENDS = ("ivf", "faiss", "hnsw")
+TRAIN_ROWS_PER_LIST = 64  # k-means sample size per centroid
+ASSIGN_BLOCK_ROWS = 16384  # rows scored against the centroids at once
+
+
+def available_backends() -> list:
+    """ANN backends usable in this environment."""
+    modules = {"faiss": "faiss", "hnsw": "hnswlib"}
+    return [name for name in BACKENDS if name not in modules or importlib.util.find_spec(modules[name])]
+
+
+def default_nlist(rows: int) -> int:
+    """Common IVF sizing: about 4 * sqrt(rows) buckets."""
+    return max(1, min(rows, int(4 * math.sqrt(rows))))
+
+
+def _blocks(matrix: np.ndarray, start: int = 0):
+    for block_start in range(start, matrix.shape[0], ASSIGN_BLOCK_ROWS):
+        yield block_start, np.asarray(matrix[block_start:block_start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+
+
+def _sample(matrix: np.ndarray, count: int, seed: int = 0) -> np.ndarray:
+    rows = matrix.shape[0]
+    if rows <= count:
+        return np.asarray(matrix, dtype=np.float32)
+    picks = np.sort(np.random.default_rng(seed).choice(rows, count, replace=False))
+    return np.asarray(matrix[picks], dtype=np.float32)
+
+
+def _mask_hits(indices, scores, k: int, mask: Optional[np.ndarray]):
+    """Drop padding (-1) and dead rows from over-fetched results and cut them to ``k`` per query."""
+    out_indices = np.full((indices.shape[0], k), -1, dtype=np.int64)
+    out_scores = np.full((indices.shape[0], k), -np.inf, dtype=np.float32)
+    for q in range(indices.shape[0]):
+        keep = indices[q] >= 0
+        if mask is not None:
+            keep &= mask[np.maximum(indices[q], 0)]
+        found = indices[q][keep][:k]
+        out_indices[q, :len(found)] = found
+        out_scores[q, :len(found)] = scores[q][keep][:k]
+    return out_indices, out_scores
+
+
+class IVFSearcher:
+    """Inverted-file index implemented with numpy."""
+
+    kind = "ivf"
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, iterations: int = 10):
+        """
+        :param nlist: Number of buckets; 0 sizes it from the number of rows.
+        :param nprobe: Buckets scanned per query.
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.trained_rows = 0
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._order = None
+        self._offsets = None
+
+    @property
+    def rows(self) -> int:
+        return len(self.assignments)
+
+    def build(self, matrix: np.ndarray) -> None:
+        """Train the centroids with spherical k-means on a sample and bucket every row."""
+        nlist = min(self.nlist or default_nlist(matrix.shape[0]), matrix.shape[0])
+        sample = _sample(matrix, nlist * TRAIN_ROWS_PER_LIST)
+        rng = np.random.default_rng(0)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(self.iterations):
+            labels = np.concatenate([np.argmax(block @ centroids.T, axis=1) for _, block in _blocks(sample)])
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty buckets keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_rows = matrix.shape[0]
+        self.add(matrix)
+
+    def add(self, matrix: np.ndarray) -> None:
+        """Bucket the rows of ``matrix`` that were appended since the last build or add."""
+        labels = [np.argmax(block @ self.centroids.T, axis=1).astype(np.int32)
+                  for _, block in _blocks(matrix, self.rows)]
+        self.assignments = np.concatenate([self.assignments] + labels)
+        self._order = None
+
+    def _buckets(self):
+        if self._order is None:
+            self._order = np.argsort(self.assignments, kind="stable")
+            counts = np.bincount(self.assignments, minlength=len(self.centroids))
+            self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._order, self._offsets
+
+    def search(self, matrix: np.ndarray, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        order, offsets = self._buckets()
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, query in enumerate(queries):
+            candidates = np.concatenate([order[offsets[b]:offsets[b + 1]] for b in probes[q]])
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if not len(candidates):
+                continue
+            # Sorted row numbers keep reads from a memory-mapped matrix sequential
+            candidates.sort()
+            candidate_scores = np.asarray(matrix[candidates], dtype=np.float32) @ query
+            found = min(k, len(candidates))
+            best = np.argpartition(-candidate_scores, found - 1)[:found]
+            best = best[np.argsort(-candidate_scores[best])]
+            indices[q, :found] = candidates[best]
+            scores[q, :found] = candidate_scores[best]
+        return indices, scores
+
+    def save(self, path: Path) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments)
+
+    def load(self, path: Path, dim: int) -> None:
+        with np.load(path) as data:
+            self.centroids = data["centroids"]
+            self.assignments = data["assignments"]
+        self._order = None
+
+
+class FaissSearcher:
+    """faiss IndexIVFFlat over inner product."""
+
+    kind = "faiss"
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8):
+        import faiss
+        self.faiss = faiss
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.trained_rows = 0
+        self.index = None
+
+    @property
+    def rows(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def build(self, matrix: np.ndarray) -> None:
+        dim = matrix.shape[1]
+        nlist = min(self.nlist or default_nlist(matrix.shape[0]), matrix.shape[0])
+        quantizer = self.faiss.IndexFlatIP(dim)
+        self.index = self.faiss.IndexIVFFlat(quantizer, dim, nlist, self.faiss.METRIC_INNER_PRODUCT)
+        self.index.train(_sample(matrix, nlist * TRAIN_ROWS_PER_LIST))
+        self.trained_rows = matrix.shape[0]
+        self.add(matrix)
+
+    def add(self, matrix: np.ndarray) -> None:
+        # faiss numbers vectors in insertion order, which matches the row numbers
+        for _, block in _blocks(matrix, self.rows):
+            self.index.add(np.ascontiguousarray(block))
+
+    def search(self, matrix: np.ndarray, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        self.index.nprobe = self.nprobe
+        fetch = k if mask is None or mask.all() else min(self.rows, 2 * k + 16)
+        scores, indices = self.index.search(np.ascontiguousarray(queries), fetch)
+        return _mask_hits(indices, scores, k, mask)
+
+    def save(self, path: Path) -> None:
+        self.faiss.write_index(self.index, str(path))
+
+    def load(self, path: Path, dim: int) -> None:
+        self.index = self.faiss.read_index(str(path))
+
+
+class HNSWSearcher:
+    """hnswlib graph over inner product."""
+
+    kind = "hnsw"
+
+    def __init__(self, ef: int = 64, m: int = 16, ef_construction: int = 200):
+        import hnswlib
+        self.hnswlib = hnswlib
+        self.ef = ef
+        self.m = m
+        self.ef_construction = ef_construction
+        self.trained_rows = 0
+        self.index = None
+
+    @property
+    def rows(self) -> int:
+        return self.index.get_current_count() if self.index is not None else 0
+
+    def build(self, matrix: np.ndarray) -> None:
+        self.index = self.hnswlib.Index(space="ip", dim=matrix.shape[1])
+        self.index.init_index(max_elements=matrix.shape[0], ef_construction=self.ef_construction, M=self.m)
+        self.trained_rows = matrix.shape[0]
+        self.add(matrix)
+
+    def add(self, matrix: np.ndarray) -> None:
+        if matrix.shape[0] > self.index.get_max_elements():
+            self.index.resize_index(matrix.shape[0])
+        for start, block in _blocks(matrix, self.rows):
+            self.index.add_items(block, np.arange(start, start + len(block)))
+
+    def search(self, matrix: np.ndarray, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        fetch = k if mask is None or mask.all() else 2 * k + 16
+        fetch = min(fetch, self.rows)
+        self.index.set_ef(max(self.ef, fetch))
+        labels, distances = self.index.knn_query(queries, k=fetch)
+        # hnswlib reports inner-product distance as 1 - similarity
+        return _mask_hits(labels.astype(np.int64), 1.0 - distances, k, mask)
+
+    def save(self, path: Path) -> None:
+        self.index.save_index(str(path))
+
+    def load(self, path: Path, dim: int) -> None:
+        self.index = self.hnswlib.Index(space="ip", dim=dim)
+        self.index.load_index(str(path))
+
+
+def make_searcher(backend: str = "auto", nlist: int = 0, nprobe: int = 8, ef: int = 64):
+    """Searcher for ``backend`` ("ivf", "faiss", "hnsw" or "auto")."""
+    if backend == "auto":
+        available = available_backends()
+        backend = "faiss" if "faiss" in available else "hnsw" if "hnsw" in available else "ivf"
+    if backend == "faiss":
+        return FaissSearcher(nlist=nlist, nprobe=nprobe)
+    if backend == "hnsw":
+        return HNSWSearcher(ef=ef)
+    if backend == "ivf":
+        return IVFSearcher(nlist=nlist, nprobe=nprobe)
+    raise ValueError(f"Unknown ANN backend '{backend}'; expected one of auto, {', '.join(BACKENDS)}")
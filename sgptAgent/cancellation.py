@@ -0,0 +1,140 @@
+"""
+Cooperative cancellation for research runs.
+
+The caller (web task, GUI worker) creates a ``CancellationToken`` and passes it as
+``ResearchAgent.run(..., cancel_token=token)``. The Orchestrator binds it to the run's
+event loop and registers the task running the research stages. ``cancel()`` may be
+called from any thread: it cancels that task on its loop, which propagates
+``asyncio.CancelledError`` through pending gathers, closes streaming Ollama requests
+(the server stops generating once the client disconnects) and closes Playwright
+browsers on the way out. Work that was running or still queued is counted so the
+caller can report what was abandoned; the Orchestrator then raises ``ResearchCancelled``.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+# Human-readable labels for the kinds of work that are counted
+WORK_LABELS = {
+    "llm_calls": "LLM calls",
+    "page_fetches": "page fetches",
+    "searches": "searches",
+    "queries": "queued queries",
+    "sources": "unfinished sources",
+    "claims": "claims",
+}
+
+_current_token: contextvars.ContextVar = contextvars.ContextVar("sgpt_cancel_token", default=None)
+
+
+def current_token() -> Optional["CancellationToken"]:
+    """Token of the research run executing in the current asyncio context, if any."""
+    return _current_token.get()
+
+
+def tracked(kind: str):
+    """Count a unit of work against the current run's token (no-op outside a run)."""
+    token = _current_token.get()
+    return token.track(kind) if token else contextlib.nullcontext()
+
+
+def describe_work(counts: Dict[str, int]) -> str:
+    parts = [f"{count} {WORK_LABELS.get(kind, kind)}" for kind, count in counts.items() if count]
+    return ", ".join(parts) if parts else "no pending work"
+
+
+class ResearchCancelled(Exception):
+    """Raised by ``Orchestrator.run`` when its cancellation token fired."""
+
+    def __init__(self, stage: Optional[str] = None, abandoned: Optional[Dict[str, int]] = None):
+        self.stage = stage
+        self.abandoned = dict(abandoned or {})
+        during = f" during {stage}" if stage else ""
+        super().__init__(f"Research cancelled{during}; abandoned {describe_work(self.abandoned)}")
+
+
+class CancellationToken:
+    """Thread-safe cancellation flag that cancels the asyncio tasks registered with it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()
+        self.in_flight: Counter = Counter()
+        self.pending: Dict[str, int] = {}
+        self.abandoned: Dict[str, int] = {}
+        self.stage: Optional[str] = None
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def bind(self, loop: asyncio.AbstractEventLoop = None):
+        """Attach the token to the running loop and make it current; returns a handle for ``unbind``."""
+        self._loop = loop or asyncio.get_running_loop()
+        return _current_token.set(self)
+
+    def unbind(self, handle) -> None:
+        _current_token.reset(handle)
+
+    def register(self, task: asyncio.Task) -> None:
+        """Cancel ``task`` when the token fires (immediately if it already has)."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.cancelled:
+            task.cancel()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise asyncio.CancelledError(self.reason)
+
+    @contextlib.contextmanager
+    def track(self, kind: str):
+        """Count a unit of work while it runs; refuses to start new work after cancellation."""
+        self.raise_if_cancelled()
+        self.in_flight[kind] += 1
+        try:
+            yield
+        finally:
+            self.in_flight[kind] -= 1
+
+    def set_pending(self, kind: str, count: int) -> None:
+        """Record how much work of ``kind`` is queued but not started yet."""
+        self.pending[kind] = max(0, count)
+
+    def cancel(self, reason: str = "cancelled by user") -> None:
+        """Request cancellation; safe to call from any thread and more than once."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.reason = reason
+            self._event.set()
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._snapshot()
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._cancel_tasks()
+        else:
+            loop.call_soon_threadsafe(self._cancel_tasks)
+
+    def _snapshot(self) -> None:
+        abandoned = Counter(self.pending)
+        abandoned.update(+self.in_flight)
+        self.abandoned = {kind: count for kind, count in abandoned.items() if count}
+
+    def _cancel_tasks(self) -> None:
+        # Runs on the token's loop, so the counts are consistent with the tasks being cancelled
+        self._snapshot()
+        for task in list(self._tasks):
+            task.cancel()
@@ -0,0 +1,210 @@
+"""
+Stage-level checkpoints for research runs.
+
+Each run gets a directory ``<project dir>/.checkpoints/<run_id>/`` holding the
+plan and append-only JSON Lines files for search results, fetched page text and
+per-source summaries. Records are appended (and flushed) as soon as they are
+produced, so a run that is killed mid-way can be resumed with
+``Orchestrator.run(goal, resume=run_id)`` and only the missing work is redone.
+
+Once collection finishes, the collected sources are saved as a whole, and report
+stage outputs are stored with the fingerprint of their inputs. This lets
+``Orchestrator.run(goal, rerender=run_id)`` rebuild a report with new presentation
+options and re-run only the stages whose fingerprint changed. Fetched page text is
+only needed until then, so ``pages.jsonl`` is deleted once the collection is saved,
+and ``prune_checkpoints`` removes the directories of old runs.
+"""
+
+import datetime
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CHECKPOINT_DIRNAME = ".checkpoints"
+RUN_ID_RE = re.compile(r"\d{8}_\d{6}_[0-9a-f]{6}")  # the format of new_run_id()
+
+
+def new_run_id() -> str:
+    return f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def is_valid_run_id(run_id) -> bool:
+    """Whether ``run_id`` names a run directory; ids come from requests, so anything else (paths) is rejected."""
+    return isinstance(run_id, str) and RUN_ID_RE.fullmatch(run_id) is not None
+
+
+def checkpoint_root(documents_base_dir: str = None, project_name: str = None) -> Path:
+    """Directory holding all checkpoints of a project (mirrors where reports are written)."""
+    base_dir = documents_base_dir or os.getcwd()
+    project_dir = os.path.join(base_dir, project_name) if project_name else base_dir
+    return Path(project_dir) / CHECKPOINT_DIRNAME
+
+
+def prune_checkpoints(root: Path, keep: int = 0, max_age_days: float = 0, exclude: str = None) -> int:
+    """
+    Delete run directories under ``root`` beyond the ``keep`` most recently used or unused for more than
+    ``max_age_days`` (0 disables either limit); the ``exclude`` run is never deleted. Returns the number removed.
+    """
+    runs = []
+    try:
+        entries = list(Path(root).iterdir())
+    except OSError:
+        return 0
+    for path in entries:
+        if not path.is_dir() or path.name == exclude or not is_valid_run_id(path.name):
+            continue
+        try:
+            last_used = max([path.stat().st_mtime] + [file.stat().st_mtime for file in path.iterdir()])
+        except OSError:
+            continue
+        runs.append((last_used, path))
+    runs.sort(reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    # The excluded (current) run counts towards ``keep``
+    stale = [path for i, (last_used, path) in enumerate(runs)
+             if (keep and i + (1 if exclude else 0) >= keep) or (max_age_days and last_used < cutoff)]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+    if stale:
+        print(f"[CHECKPOINT] Removed {len(stale)} old run checkpoints from {root}")
+    return len(stale)
+
+
+class RunCheckpoint:
+    """Append-friendly checkpoint store for a single research run."""
+
+    def __init__(self, root: Path, run_id: str = None):
+        self.run_id = run_id or new_run_id()
+        if not is_valid_run_id(self.run_id):
+            raise ValueError(f"Invalid run id '{self.run_id}'")
+        self.path = Path(root) / self.run_id
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.meta: Dict = {}
+        self.queries: List[str] = []
+        self.searches: Dict[str, list] = {}
+        self.pages: Dict[str, str] = {}
+        self.results: Dict[str, dict] = {}
+        self.collected: Optional[dict] = None
+        self.stages: Dict[str, dict] = {}
+        self._load()
+
+    @classmethod
+    def exists(cls, root: Path, run_id: str) -> bool:
+        return is_valid_run_id(run_id) and (Path(root) / run_id).is_dir()
+
+    # Loading
+
+    def _read_jsonl(self, name: str) -> list:
+        file = self.path / name
+        if not file.exists():
+            return []
+        records = []
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A run killed mid-write leaves a truncated last line; everything before it is valid
+                    continue
+        return records
+
+    def _load(self) -> None:
+        meta_file = self.path / "meta.json"
+        if meta_file.exists():
+            try:
+                self.meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            except ValueError:
+                self.meta = {}
+        plan_file = self.path / "plan.json"
+        if plan_file.exists():
+            try:
+                self.queries = json.loads(plan_file.read_text(encoding="utf-8")).get("queries", [])
+            except ValueError:
+                self.queries = []
+        for record in self._read_jsonl("search.jsonl"):
+            self.searches[record["query"]] = record["results"]
+        for record in self._read_jsonl("pages.jsonl"):
+            self.pages[record["url"]] = record["text"]
+        for record in self._read_jsonl("summaries.jsonl"):
+            self.results[record["href"]] = record
+        collected_file = self.path / "collected.json"
+        if collected_file.exists():
+            try:
+                self.collected = json.loads(collected_file.read_text(encoding="utf-8"))
+            except ValueError:
+                self.collected = None
+        for record in self._read_jsonl("stages.jsonl"):
+            # Later records of a stage replace earlier ones
+            self.stages[record["name"]] = record
+
+    # Writing
+
+    def _write_json(self, name: str, data: dict) -> None:
+        tmp_file = self.path / f"{name}.tmp"
+        tmp_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_file, self.path / name)
+
+    def _append(self, name: str, record: dict) -> None:
+        with open(self.path / name, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def save_meta(self, goal: str, options: dict) -> None:
+        """Record the goal and JSON-serializable run options (kept from the first attempt on resume)."""
+        if self.meta:
+            return
+        serializable = {key: value for key, value in options.items()
+                        if isinstance(value, (str, int, float, bool, type(None)))}
+        self.meta = {"run_id": self.run_id, "goal": goal, "options": serializable,
+                     "created": datetime.datetime.now().isoformat()}
+        self._write_json("meta.json", self.meta)
+
+    def save_plan(self, plan: str, queries: List[str]) -> None:
+        self.queries = list(queries)
+        self._write_json("plan.json", {"plan": plan, "queries": self.queries})
+
+    def record_search(self, query: str, results: list) -> None:
+        self.searches[query] = results
+        self._append("search.jsonl", {"query": query, "results": results})
+
+    def record_page(self, url: str, text: str) -> None:
+        self.pages[url] = text
+        self._append("pages.jsonl", {"url": url, "text": text})
+
+    def record_result(self, result: dict) -> None:
+        self.results[result["href"]] = result
+        self._append("summaries.jsonl", result)
+
+    def get_result(self, url: str) -> Optional[dict]:
+        return self.results.get(url)
+
+    def save_collected(self, results: list, total_results_found: int, successful_queries: int, total_queries: int) -> None:
+        """Record the complete output of data collection, in report order; fetched page text is then dropped."""
+        self.collected = {"results": results, "total_results_found": total_results_found,
+                          "successful_queries": successful_queries, "total_queries": total_queries}
+        self._write_json("collected.json", self.collected)
+        # Resuming and re-rendering start from collected.json now, so the page text is never read again
+        self.pages = {}
+        try:
+            (self.path / "pages.jsonl").unlink()
+        except OSError:
+            pass
+
+    # Report stage cache (used by StageGraph)
+
+    def get_stage(self, name: str, fingerprint: str):
+        """Return (True, output) if ``name`` was computed from inputs with this fingerprint, else (False, None)."""
+        record = self.stages.get(name)
+        if record and record["fingerprint"] == fingerprint:
+            return True, record["output"]
+        return False, None
+
+    def record_stage(self, name: str, fingerprint: str, output) -> None:
+        record = {"name": name, "fingerprint": fingerprint, "output": output}
+        self.stages[name] = record
+        self._append("stages.jsonl", record)
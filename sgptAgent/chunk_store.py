@@ -0,0 +1,161 @@
+"""
+Append-only store of the chunk records of a local document index.
+
+Each row's record ``[source, chunk_id, content, start, end]`` is one line of
+``chunks.jsonl``. ``chunks.idx`` holds the byte offset at which each row's line ends
+(uint64) and ``simhash.u64`` each row's SimHash fingerprint (0 for a chunk too short
+to fingerprint). Indexing a file appends to all three, so saving the index rewrites
+only its small metadata table, and searching reads and parses only the hits' lines.
+The offsets and fingerprints, 16 bytes a row, are all that is kept in memory.
+
+Like the embedding matrix, the files may hold rows the metadata does not describe yet
+(appended by a sync that never saved); ``load`` ignores them and, unless read-only,
+truncates them. The records file stays open, so a reader keeps seeing the rows it
+loaded when a concurrent sync compacts (replaces) the files.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+NO_FINGERPRINT = 0
+READ_BLOCK_ROWS = 4096  # rows read at once when streaming records
+
+
+class ChunkStore:
+    """Chunk records and fingerprints of a local index, stored next to its matrix."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.records_file = self.path / "chunks.jsonl"
+        self.ends_file = self.path / "chunks.idx"
+        self.fingerprints_file = self.path / "simhash.u64"
+        self._ends = np.zeros(0, dtype=np.uint64)
+        self.fingerprints = np.zeros(0, dtype=np.uint64)
+        self._reader = None
+        self._lock = threading.Lock()  # seek and read must not interleave
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def load(self, rows: int, repair: bool = True) -> bool:
+        """
+        Read the offsets and fingerprints of the first ``rows`` rows; False if the files hold fewer.
+        With ``repair``, rows beyond them are truncated away.
+        """
+        self.close()
+        self._ends = np.zeros(0, dtype=np.uint64)
+        self.fingerprints = np.zeros(0, dtype=np.uint64)
+        if rows:
+            try:
+                ends = np.fromfile(self.ends_file, dtype=np.uint64, count=rows)
+                fingerprints = np.fromfile(self.fingerprints_file, dtype=np.uint64, count=rows)
+                size = self.records_file.stat().st_size
+            except (OSError, ValueError):
+                return False
+            if len(ends) < rows or len(fingerprints) < rows or size < int(ends[-1]):
+                return False
+            self._ends, self.fingerprints = ends, fingerprints
+        if repair:
+            for file, expected in ((self.records_file, self._offset(rows)), (self.ends_file, rows * 8),
+                                   (self.fingerprints_file, rows * 8)):
+                try:
+                    if file.stat().st_size > expected:
+                        os.truncate(file, expected)
+                except OSError:
+                    pass
+        if rows:
+            # Opened now: these rows stay readable if a concurrent sync replaces the file
+            try:
+                self._reader = open(self.records_file, "rb")
+            except OSError:
+                return False
+        return True
+
+    def reset(self) -> None:
+        """Delete every record."""
+        self.close()
+        self._ends = np.zeros(0, dtype=np.uint64)
+        self.fingerprints = np.zeros(0, dtype=np.uint64)
+        for file in (self.records_file, self.ends_file, self.fingerprints_file):
+            try:
+                file.unlink()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            if self._reader:
+                self._reader.close()
+                self._reader = None
+
+    def append(self, records: List[list], fingerprints: List[Optional[int]]) -> None:
+        """Append one record (and SimHash fingerprint, None if there is none) per new row."""
+        if not records:
+            return
+        lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records]
+        ends = self._offset(len(self)) + np.cumsum([len(line) for line in lines], dtype=np.uint64)
+        values = np.array([NO_FINGERPRINT if fp is None else fp for fp in fingerprints], dtype=np.uint64)
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.records_file, "ab") as f:
+            f.write(b"".join(lines))
+        with open(self.ends_file, "ab") as f:
+            f.write(ends.tobytes())
+        with open(self.fingerprints_file, "ab") as f:
+            f.write(values.tobytes())
+        self._ends = np.concatenate([self._ends, ends])
+        self.fingerprints = np.concatenate([self.fingerprints, values])
+
+    def fingerprint(self, row: int) -> Optional[int]:
+        value = int(self.fingerprints[row])
+        return None if value == NO_FINGERPRINT else value
+
+    def get(self, rows) -> List[list]:
+        """Records of ``rows``, in order."""
+        return [json.loads(self._read(row, row + 1)) for row in rows]
+
+    def iter_records(self, start: int = 0) -> Iterator[list]:
+        """Records from row ``start`` to the end, read in blocks."""
+        for block in range(start, len(self), READ_BLOCK_ROWS):
+            data = self._read(block, min(block + READ_BLOCK_ROWS, len(self)))
+            for line in data.splitlines():
+                yield json.loads(line)
+
+    def compact(self, ranges) -> None:
+        """Keep only the rows of ``ranges`` ((start, count) pairs), renumbered in that order."""
+        ends, fingerprints, size = [], [], 0
+        tmp_file = self.records_file.with_name(f"{self.records_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            for start, count in ranges:
+                if not count:
+                    continue
+                begin = self._offset(start)
+                data = self._read(start, start + count)
+                f.write(data)
+                ends.append(self._ends[start:start + count] - np.uint64(begin) + np.uint64(size))
+                fingerprints.append(self.fingerprints[start:start + count])
+                size += len(data)
+        self.close()
+        self._ends = np.concatenate(ends) if ends else np.zeros(0, dtype=np.uint64)
+        self.fingerprints = np.concatenate(fingerprints) if fingerprints else np.zeros(0, dtype=np.uint64)
+        for file, values in ((self.ends_file, self._ends), (self.fingerprints_file, self.fingerprints)):
+            values_tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+            values.tofile(values_tmp)
+            os.replace(values_tmp, file)
+        os.replace(tmp_file, self.records_file)
+
+    def _offset(self, row: int) -> int:
+        """Byte offset at which ``row`` starts."""
+        return int(self._ends[row - 1]) if row else 0
+
+    def _read(self, start: int, stop: int) -> bytes:
+        begin = self._offset(start)
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.records_file, "rb")
+            self._reader.seek(begin)
+            return self._reader.read(int(self._ends[stop - 1]) - begin)
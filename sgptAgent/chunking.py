@@ -0,0 +1,123 @@
+"""
+Streaming, sentence-aware chunking of documents.
+
+Text arrives as an iterable of pieces (blocks of a file, pages of a PDF) and only the
+unfinished tail of the current sentence is buffered, so a document is never held or
+copied whole. Pieces are split into segments at sentence ends, line breaks and blank
+lines; segments are packed into chunks bounded by estimated tokens. A heading always
+starts a new chunk, and consecutive chunks of the same section share up to
+``overlap_tokens`` of whole sentences. Every chunk records the character offsets of its
+text in the concatenation of the pieces, so it can be cited back to its position.
+"""
+
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+from sgptAgent.text_ranking import estimate_tokens
+
+# Segment boundaries: after terminal punctuation followed by whitespace, or at a line break
+# (but not after a lone digit, so "1. Introduction" stays one segment)
+_BOUNDARY_RE = re.compile(r"(?:(?<=[^\d\s][.!?])|(?<=\d\d[.!?]))[\"')\]]*\s+|\n")
+_HEADING_RE = re.compile(r"#{1,6}\s|(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-Z][^.!?]{0,80}$|[A-Z][A-Z0-9 ,:&'-]{2,80}$")
+_SPACE_RE = re.compile(r"\s+")
+
+FILE_BLOCK_CHARS = 1 << 16
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int  # character offset of the chunk's first segment
+    end: int  # character offset just past its last segment
+
+
+def iter_file(path: str, block_chars: int = FILE_BLOCK_CHARS) -> Iterator[str]:
+    """Read a text file in blocks."""
+    with open(path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_chars), ""):
+            yield block
+
+
+def iter_segments(pieces: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+    """Yield (segment text, start offset, end offset) for the sentences and lines in ``pieces``."""
+    buffer = ""
+    offset = 0  # stream offset of buffer[0]
+    for piece in pieces:
+        buffer += piece
+        position = 0
+        for boundary in _BOUNDARY_RE.finditer(buffer):
+            yield from _segment(buffer, position, boundary.start(), offset)
+            position = boundary.end()
+        # The text after the last boundary may continue in the next piece
+        buffer = buffer[position:]
+        offset += position
+    yield from _segment(buffer, 0, len(buffer), offset)
+
+
+def _segment(buffer: str, start: int, end: int, offset: int):
+    text = buffer[start:end]
+    stripped = text.strip()
+    if stripped:
+        lead = len(text) - len(text.lstrip())
+        yield stripped, offset + start + lead, offset + start + lead + len(stripped)
+
+
+def is_heading(segment: str) -> bool:
+    """Markdown headings, numbered section titles and short all-caps lines."""
+    return bool(_HEADING_RE.match(segment)) and len(segment) <= 100
+
+
+def chunk_stream(pieces: Iterable[str], max_tokens: int = 512, overlap_tokens: int = 64) -> Iterator[Chunk]:
+    """Pack the segments of ``pieces`` into chunks of at most ``max_tokens`` estimated tokens."""
+    max_chars = max_tokens * 4
+    current: List[Tuple[str, int, int]] = []
+    tokens = 0
+    for text, start, end in iter_segments(pieces):
+        heading = is_heading(text)
+        parts = [(text, start, end)] if len(text) <= max_chars else list(_split_long(text, start, max_chars))
+        for part in parts:
+            part_tokens = estimate_tokens(part[0])
+            if current and (heading or tokens + part_tokens > max_tokens):
+                yield _make_chunk(current)
+                # Carry whole trailing sentences into the next chunk, unless a new section starts
+                current = [] if heading else _overlap(current, overlap_tokens, max_tokens - part_tokens)
+                tokens = sum(estimate_tokens(segment[0]) for segment in current)
+            current.append(part)
+            tokens += part_tokens
+            heading = False
+    if current:
+        yield _make_chunk(current)
+
+
+def chunk_text(text: str, max_tokens: int = 512, overlap_tokens: int = 64) -> List[Chunk]:
+    return list(chunk_stream([text], max_tokens, overlap_tokens))
+
+
+def _split_long(text: str, start: int, max_chars: int):
+    """Hard-wrap a run-on segment (tables, lists without punctuation) at whitespace."""
+    position = 0
+    while position < len(text):
+        cut = len(text) if len(text) - position <= max_chars else text.rfind(" ", position, position + max_chars)
+        if cut <= position:
+            cut = position + max_chars
+        part = text[position:cut].strip()
+        if part:
+            lead = len(text[position:cut]) - len(text[position:cut].lstrip())
+            yield part, start + position + lead, start + position + lead + len(part)
+        position = cut
+
+
+def _overlap(segments, overlap_tokens: int, room: int):
+    carried = []
+    tokens = 0
+    for segment in reversed(segments):
+        segment_tokens = estimate_tokens(segment[0])
+        if tokens + segment_tokens > min(overlap_tokens, room):
+            break
+        carried.insert(0, segment)
+        tokens += segment_tokens
+    return carried
+
+
+def _make_chunk(segments) -> Chunk:
+    text = _SPACE_RE.sub(" ", " ".join(segment[0] for segment in segments))
+    return Chunk(text, segments[0][1], segments[-1][2])
@@ -13,6 +13,8 @@ ROLE_STORAGE_PATH = SHELL_GPT_CONFIG_FOLDER / "roles"
 FUNCTIONS_PATH = SHELL_GPT_CONFIG_FOLDER / "functions"
 CHAT_CACHE_PATH = Path(gettempdir()) / "chat_cache"
 CACHE_PATH = Path(gettempdir()) / "cache"
+SUMMARY_CACHE_PATH = Path(gettempdir()) / "summary_cache"
+EMBEDDING_CACHE_PATH = Path(gettempdir()) / "embedding_cache"
 
 # TODO: Refactor ENV variables with SGPT_ prefix.
 DEFAULT_CONFIG = {
@@ -40,6 +42,48 @@ DEFAULT_CONFIG = {
     "SHELL_INTERACTION": os.getenv("SHELL_INTERACTION ", "true"),
     "OS_NAME": os.getenv("OS_NAME", "auto"),
     "SHELL_NAME": os.getenv("SHELL_NAME", "auto"),
+    "SUMMARY_CACHE_PATH": os.getenv("SUMMARY_CACHE_PATH", str(SUMMARY_CACHE_PATH)),
+    "SUMMARY_CACHE_LENGTH": int(os.getenv("SUMMARY_CACHE_LENGTH", "2000")),
+    "EMBEDDING_CACHE_PATH": os.getenv("EMBEDDING_CACHE_PATH", str(EMBEDDING_CACHE_PATH)),
+    "EMBEDDING_CACHE_LENGTH": int(os.getenv("EMBEDDING_CACHE_LENGTH", "100000")),  # entries kept on disk
+    "EMBEDDING_CACHE_MEMORY": int(os.getenv("EMBEDDING_CACHE_MEMORY", "4096")),  # entries kept in memory
+    "PAGE_TEXT_MAX_CHARS": int(os.getenv("PAGE_TEXT_MAX_CHARS", "200000")),
+    "SUMMARY_INPUT_TOKENS": int(os.getenv("SUMMARY_INPUT_TOKENS", "1500")),
+    "LLM_MAX_CONCURRENCY": int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    "MAP_REDUCE_DEPTHS": os.getenv("MAP_REDUCE_DEPTHS", "deep"),  # comma-separated research depths
+    "MAP_REDUCE_CHUNK_TOKENS": int(os.getenv("MAP_REDUCE_CHUNK_TOKENS", "1500")),
+    "MAP_REDUCE_TOKEN_BUDGET": int(os.getenv("MAP_REDUCE_TOKEN_BUDGET", "12000")),
+    "SHORT_DOC_TOKENS": int(os.getenv("SHORT_DOC_TOKENS", "600")),
+    "BATCH_SUMMARY_TOKEN_BUDGET": int(os.getenv("BATCH_SUMMARY_TOKEN_BUDGET", "3000")),
+    "NOVELTY_THRESHOLD": float(os.getenv("NOVELTY_THRESHOLD", "0.2")),  # 0 disables early stopping
+    "NOVELTY_MIN_SOURCES": int(os.getenv("NOVELTY_MIN_SOURCES", "6")),
+    "NOVELTY_WINDOW": int(os.getenv("NOVELTY_WINDOW", "5")),
+    "CHECKPOINT_KEEP_RUNS": os.getenv("CHECKPOINT_KEEP_RUNS", "20"),  # run checkpoints kept per project; 0 keeps all
+    "CHECKPOINT_MAX_AGE_DAYS": os.getenv("CHECKPOINT_MAX_AGE_DAYS", "30"),  # unused for longer are deleted; 0 disables
+    "MAX_REASONING_CLAIMS": int(os.getenv("MAX_REASONING_CLAIMS", "8")),
+    "CLAIM_EVIDENCE_TOKENS": int(os.getenv("CLAIM_EVIDENCE_TOKENS", "1200")),
+    "HIERARCHICAL_SYNTHESIS_DEPTHS": os.getenv("HIERARCHICAL_SYNTHESIS_DEPTHS", "deep"),  # comma-separated research depths
+    "SYNTHESIS_TOKEN_BUDGET": int(os.getenv("SYNTHESIS_TOKEN_BUDGET", "3000")),  # source material per synthesis prompt
+    "PARTIAL_SYNTHESIS_TOKENS": int(os.getenv("PARTIAL_SYNTHESIS_TOKENS", "800")),
+    "LOCAL_INDEX_RETRIEVAL": os.getenv("LOCAL_INDEX_RETRIEVAL", "hybrid"),  # vector, hybrid or prefilter
+    "LOCAL_INDEX_CANDIDATES": int(os.getenv("LOCAL_INDEX_CANDIDATES", "100")),  # per ranking before fusion
+    "LOCAL_INDEX_PRECISION": os.getenv("LOCAL_INDEX_PRECISION", "float32"),  # float32, float16 or int8
+    "LOCAL_INDEX_RESCORE": os.getenv("LOCAL_INDEX_RESCORE", "0"),  # float32 re-ranking of the top candidates; 0 disables
+    "LOCAL_INDEX_ANN_BACKEND": os.getenv("LOCAL_INDEX_ANN_BACKEND", "auto"),  # exact, auto, ivf, faiss or hnsw
+    "LOCAL_INDEX_ANN_MIN_CHUNKS": int(os.getenv("LOCAL_INDEX_ANN_MIN_CHUNKS", "50000")),  # exact search below this
+    "LOCAL_INDEX_IVF_LISTS": os.getenv("LOCAL_INDEX_IVF_LISTS", "0"),  # 0 sizes it from the chunk count
+    "LOCAL_INDEX_IVF_PROBES": int(os.getenv("LOCAL_INDEX_IVF_PROBES", "16")),
+    "LOCAL_INDEX_HNSW_EF": int(os.getenv("LOCAL_INDEX_HNSW_EF", "64")),
+    "CHUNK_TOKENS": int(os.getenv("CHUNK_TOKENS", "512")),  # local document chunk size
+    "CHUNK_OVERLAP_TOKENS": int(os.getenv("CHUNK_OVERLAP_TOKENS", "64")),
+    "INGEST_WORKERS": os.getenv("INGEST_WORKERS", "0"),  # document parser processes; 0 uses the CPU count
+    "EMBED_BATCH_SIZE": int(os.getenv("EMBED_BATCH_SIZE", "32")),
+    "NEAR_DUPLICATE_SIMILARITY": os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.9"),  # SimHash similarity; 0 keeps duplicates
+    "DOCUMENT_WATCHER": os.getenv("DOCUMENT_WATCHER", "true"),  # index project folders in the background
+    "DOCUMENT_WATCHER_DEBOUNCE": float(os.getenv("DOCUMENT_WATCHER_DEBOUNCE", "3")),  # seconds of quiet before a sync
+    "DOCUMENT_WATCHER_POLL_INTERVAL": float(os.getenv("DOCUMENT_WATCHER_POLL_INTERVAL", "10")),  # without watchdog
+    "LOCAL_DOCS_TOP_K": int(os.getenv("LOCAL_DOCS_TOP_K", "3")),  # local chunks retrieved per research query
+    "LOCAL_DOCS_SKIP_WEB_SIMILARITY": os.getenv("LOCAL_DOCS_SKIP_WEB_SIMILARITY", "0"),  # skip web search above this cosine; 0 disables
     # New features might add their own config variables here.
 }
 
@@ -0,0 +1,63 @@
+"""
+Relevance-maximizing context packing for synthesis prompts.
+
+Summaries are ordered by maximal marginal relevance (MMR): BM25 relevance to the
+research goal, penalized by TF-IDF similarity to summaries already chosen, so
+near-duplicate sources do not crowd out different ones. Summaries are packed in
+that order: whole if they fit the remaining token budget, otherwise as their most
+relevant sentences. Near-duplicates of packed summaries are skipped.
+"""
+
+from typing import List
+
+from sgptAgent.text_ranking import BM25, estimate_tokens, select_sentences, tokenize
+from sgptAgent.topic_clustering import cosine, tfidf_vectors
+
+MIN_FRAGMENT_TOKENS = 40  # smaller leftovers are not worth a partial summary
+DUPLICATE_SIMILARITY = 0.9  # TF-IDF cosine above which a summary adds nothing new
+
+
+def mmr_order(texts: List[str], query: str, relevance_weight: float = 0.7, vectors: List[dict] = None) -> List[int]:
+    """Indices of ``texts`` in MMR order; ``relevance_weight`` trades relevance (1.0) against diversity (0.0)."""
+    if not texts:
+        return []
+    query_tokens = tokenize(query)
+    scores = BM25(tokenize(text) for text in texts).scores(query_tokens) if query_tokens else [0.0] * len(texts)
+    top_score = max(scores)
+    # Without any lexical match every text is equally relevant and only diversity decides
+    relevance = [score / top_score for score in scores] if top_score > 0 else [1.0] * len(texts)
+    vectors = vectors or tfidf_vectors(texts)
+
+    order = []
+    redundancy = [0.0] * len(texts)
+    candidates = set(range(len(texts)))
+    while candidates:
+        best = max(candidates, key=lambda i: (relevance_weight * relevance[i] - (1 - relevance_weight) * redundancy[i], -i))
+        order.append(best)
+        candidates.remove(best)
+        for i in candidates:
+            redundancy[i] = max(redundancy[i], cosine(vectors[i], vectors[best]))
+    return order
+
+
+def pack_context(texts: List[str], query: str, token_budget: int, relevance_weight: float = 0.7) -> List[str]:
+    """
+    Fill ``token_budget`` tokens with whole texts or, where a text does not fit, its best sentences.
+    Returns the packed pieces in MMR order (most useful first).
+    """
+    texts = [text for text in texts if text and text.strip()]
+    vectors = tfidf_vectors(texts)
+    packed, used = [], 0
+    packed_ids = []
+    for i in mmr_order(texts, query, relevance_weight, vectors):
+        room = token_budget - used
+        if room < MIN_FRAGMENT_TOKENS:
+            break
+        if any(cosine(vectors[i], vectors[j]) >= DUPLICATE_SIMILARITY for j in packed_ids):
+            continue
+        piece = texts[i] if estimate_tokens(texts[i]) <= room else select_sentences(texts[i], query, room)
+        if piece:
+            packed.append(piece)
+            packed_ids.append(i)
+            used += estimate_tokens(piece)
+    return packed
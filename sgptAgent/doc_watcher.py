@@ -0,0 +1,225 @@
+"""
+Background indexing of project document folders.
+
+``DocumentWatcher`` watches the documents directory, in which every sub-folder is a
+project. It uses watchdog's native observer (inotify, FSEvents or ReadDirectoryChangesW)
+and, when watchdog is not installed or cannot start, polls the size and mtime of the
+supported files instead. Changes are debounced per project: a project is synced once no
+change has arrived for ``debounce`` seconds, so copying in a batch of PDFs triggers one
+sync. Syncs run on the watcher's own thread through ``ResearchAgent.index_local_documents``,
+which only parses and embeds new or changed files, so research never waits on indexing.
+``status()`` reports every project's state for the GUI and web UI.
+"""
+
+import datetime
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from sgptAgent.config import cfg
+from sgptAgent.ingestion import SUPPORTED_EXTENSIONS, find_documents, is_generated_report
+
+
+class DocumentWatcher:
+    """Keeps the local index of every project under ``root`` up to date."""
+
+    def __init__(self, root: str, debounce: float = 3.0, poll_interval: float = 10.0,
+                 indexer: Optional[Callable] = None):
+        """
+        :param root: Documents directory; each sub-folder is a project with its own index.
+        :param debounce: Seconds without changes before a project is synced.
+        :param poll_interval: Seconds between scans when watchdog is unavailable.
+        :param indexer: ``indexer(folder, progress_callback)``; defaults to ``ResearchAgent.index_local_documents``.
+        """
+        self.root = os.path.abspath(root)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._indexer = indexer
+        self._agent = None
+        self.mode = None  # "watchdog" or "polling" once started
+        self._pending: Dict[str, float] = {}  # project -> time of its latest change
+        self._projects: Dict[str, dict] = {}
+        self._signatures: Dict[str, frozenset] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    def start(self) -> None:
+        """Start watching and queue a sync of every existing project (files may have changed while stopped)."""
+        if self._thread:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            self._observer = self._start_observer()
+            self.mode = "watchdog"
+        except Exception as e:  # ImportError, or an observer that cannot start (e.g. inotify watch limit)
+            print(f"[WATCHER] Native file watching unavailable ({e}), polling every {self.poll_interval:.0f}s")
+            self._observer = None
+            self.mode = "polling"
+        for project in self._list_projects():
+            self._touch(project, at=0.0)
+        self._thread = threading.Thread(target=self._run, name="document-watcher", daemon=True)
+        self._thread.start()
+        print(f"[WATCHER] Watching {self.root} ({self.mode})")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def status(self) -> Dict[str, dict]:
+        """Per-project state ("pending", "indexing", "ready" or "error") with progress and totals."""
+        with self._lock:
+            return {project: dict(state) for project, state in sorted(self._projects.items())}
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ("opened", "closed_no_write"):
+                    return
+                if event.is_directory and event.event_type == "modified":
+                    return  # a child changed; that child reports its own event (or is the index itself)
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path:
+                        watcher._changed(os.fsdecode(path), event.is_directory)
+
+        observer = Observer()
+        observer.schedule(Handler(), self.root, recursive=True)
+        observer.start()
+        return observer
+
+    def _changed(self, path: str, is_directory: bool) -> None:
+        parts = Path(os.path.relpath(path, self.root)).parts
+        # Skip the root itself, hidden entries (including each project's .sgpt_index), unsupported files
+        # and the reports research runs write into the project
+        if not parts or parts[0] == ".." or any(part.startswith(".") for part in parts):
+            return
+        if not is_directory and (not path.lower().endswith(SUPPORTED_EXTENSIONS) or is_generated_report(path)):
+            return
+        self._touch(parts[0])
+
+    def _touch(self, project: str, at: Optional[float] = None) -> None:
+        with self._lock:
+            self._pending[project] = time.monotonic() if at is None else at
+            state = self._projects.setdefault(project, {"state": "pending", "files": 0, "chunks": 0,
+                                                        "percent": 0, "message": "", "last_indexed": None})
+            if state["state"] != "indexing":
+                state["state"] = "pending"
+
+    def _list_projects(self) -> list:
+        try:
+            return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir() and not entry.name.startswith("."))
+        except OSError:
+            return []
+
+    def _run(self) -> None:
+        last_poll = time.monotonic()
+        while not self._stop.wait(min(0.5, self.debounce)):
+            now = time.monotonic()
+            if self.mode == "polling" and now - last_poll >= self.poll_interval:
+                self._poll()
+                last_poll = now
+            with self._lock:
+                due = [project for project, changed in self._pending.items() if now - changed >= self.debounce]
+                for project in due:
+                    del self._pending[project]
+            for project in due:
+                if self._stop.is_set():
+                    return
+                self._sync(project)
+
+    def _poll(self) -> None:
+        """Queue projects whose supported files changed since the last scan."""
+        projects = self._list_projects()
+        for project in projects:
+            signature = frozenset(self._signature(os.path.join(self.root, project)))
+            if self._signatures.get(project) != signature:
+                self._signatures[project] = signature
+                self._touch(project)
+        for project in set(self._signatures) - set(projects):
+            del self._signatures[project]
+            self._touch(project)
+
+    @staticmethod
+    def _signature(folder: str):
+        for path in find_documents(folder):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield path, stat.st_mtime_ns, stat.st_size
+
+    def _sync(self, project: str) -> None:
+        folder = os.path.join(self.root, project)
+        if not os.path.isdir(folder):
+            with self._lock:
+                self._projects.pop(project, None)
+            return
+        if self.mode == "polling":
+            # The sync itself reflects this state, so the next poll does not queue it again
+            self._signatures[project] = frozenset(self._signature(folder))
+        self._update(project, state="indexing", percent=0, message="Indexing...")
+
+        def progress(desc, bar='', substep=None, percent=None, log=None):
+            self._update(project, message=desc, **({"percent": int(percent)} if percent is not None else {}))
+
+        try:
+            index = self._index(folder, progress)
+        except Exception as e:
+            print(f"[WATCHER] Indexing {project} failed: {e}")
+            self._update(project, state="error", message=str(e))
+            return
+        files = len(index.files) if index is not None else 0
+        chunks = len(index) if index is not None else 0
+        self._update(project, state="ready", percent=100, files=files, chunks=chunks,
+                     message=f"{files} files, {chunks} chunks indexed",
+                     last_indexed=datetime.datetime.now().isoformat(timespec="seconds"))
+
+    def _index(self, folder: str, progress):
+        if self._indexer:
+            return self._indexer(folder, progress)
+        if self._agent is None:
+            from sgptAgent.agent import ResearchAgent
+            self._agent = ResearchAgent()
+        self._agent.index_local_documents(folder, progress_callback=progress)
+        index, self._agent.local_document_index = self._agent.local_document_index, None
+        return index
+
+    def _update(self, project: str, **fields) -> None:
+        with self._lock:
+            state = self._projects.setdefault(project, {"state": "pending", "files": 0, "chunks": 0,
+                                                        "percent": 0, "message": "", "last_indexed": None})
+            if fields.get("state") in ("ready", "error") and project in self._pending:
+                fields["state"] = "pending"  # changed again while it was being indexed
+            state.update(fields)
+
+
+_document_watcher = None
+
+
+def start_document_watcher(root: str) -> Optional[DocumentWatcher]:
+    """Start the process-wide watcher over ``root`` unless DOCUMENT_WATCHER is disabled; returns it."""
+    global _document_watcher
+    if str(cfg.get("DOCUMENT_WATCHER")).lower() != "true":
+        return None
+    if _document_watcher is None:
+        _document_watcher = DocumentWatcher(root, debounce=float(cfg.get("DOCUMENT_WATCHER_DEBOUNCE")),
+                                            poll_interval=float(cfg.get("DOCUMENT_WATCHER_POLL_INTERVAL")))
+        _document_watcher.start()
+    return _document_watcher
+
+
+def get_document_watcher() -> Optional[DocumentWatcher]:
+    """The running watcher, if one was started."""
+    return _document_watcher
@@ -0,0 +1,138 @@
+"""
+Two-level cache for text embeddings.
+
+The same strings are embedded repeatedly: the research goal on every similarity check,
+unchanged chunks of an edited document, identical snippets across runs. Entries are keyed
+by a hash of the model name and the text. A bounded in-memory LRU serves repeats within a
+process and an on-disk store (one float32 file per entry) serves them across runs. Hit and
+miss counts are kept per level so runs can report the cache's effectiveness.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from sgptAgent.config import cfg
+
+
+class EmbeddingCache:
+    """Memory LRU in front of a file-backed store of embeddings."""
+
+    def __init__(self, cache_path: Path, length: int, memory_length: int) -> None:
+        """
+        :param cache_path: Directory where embeddings are stored, one file per entry.
+        :param length: Maximum number of embeddings to keep on disk.
+        :param memory_length: Maximum number of embeddings to keep in memory.
+        """
+        self.cache_path = Path(cache_path)
+        self.length = length
+        self.memory_length = memory_length
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self._memory: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()  # embeddings are requested from worker threads as well as the event loop
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return sha256(f"{model}\0{text}".encode("utf-8", errors="ignore")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[list]:
+        """Return the cached embedding of ``text`` under ``model`` or None on a miss."""
+        key = self.make_key(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return vector
+        try:
+            vector = np.fromfile(self.cache_path / key, dtype=np.float32).tolist()
+        except (OSError, ValueError):
+            vector = None
+        with self._lock:
+            if not vector:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, vector)
+        return vector
+
+    def set(self, model: str, text: str, vector: list) -> None:
+        """Store ``vector``; failed (empty) embeddings are not cached."""
+        if not vector:
+            return
+        key = self.make_key(model, text)
+        with self._lock:
+            self._remember(key, list(vector))
+        file = self.cache_path / key
+        tmp_file = file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            np.asarray(vector, dtype=np.float32).tofile(tmp_file)
+            os.replace(tmp_file, file)
+        except OSError as e:
+            print(f"[EMBEDDING CACHE] Could not write cache entry: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % 1000 == 0
+        # Pruning scans the directory, so only do it every few writes.
+        if prune:
+            self._delete_oldest_files()
+
+    def stats(self) -> Dict[str, int]:
+        """Cumulative hit and miss counts since the cache was created."""
+        with self._lock:
+            return dict(self.counters, hits=self.counters["memory_hits"] + self.counters["disk_hits"])
+
+    def _remember(self, key: str, vector: list) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_length:
+            self._memory.popitem(last=False)
+
+    def _delete_oldest_files(self) -> None:
+        files = []
+        for file in self.cache_path.glob("*"):
+            try:
+                files.append((file.stat().st_mtime, file))
+            except OSError:
+                continue  # Removed by a concurrent writer.
+        files.sort()
+        for _, file in files[:max(0, len(files) - self.length)]:
+            try:
+                file.unlink()
+            except OSError:
+                pass
+
+
+def cached_embeddings(cache: EmbeddingCache, model: str, texts: List[str], embed) -> List[list]:
+    """Embeddings of ``texts``, calling ``embed(missing texts)`` once for the texts not in ``cache``."""
+    vectors = [cache.get(model, text) for text in texts]
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+    if missing:
+        fresh = embed(missing)
+        if len(fresh) != len(missing):
+            fresh = [[] for _ in missing]
+        for text, vector in zip(missing, fresh):
+            cache.set(model, text, vector)
+        by_text = dict(zip(missing, fresh))
+        vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+    return vectors
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache configured from ``cfg``."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(Path(cfg.get("EMBEDDING_CACHE_PATH")), int(cfg.get("EMBEDDING_CACHE_LENGTH")),
+                                          int(cfg.get("EMBEDDING_CACHE_MEMORY")))
+    return _embedding_cache
@@ -31,6 +31,8 @@ APP_TITLE = "Shell GPT Research Agent GUI"
 
 # --- Import backend ---
 from sgptAgent.agent import ResearchAgent
+from sgptAgent.cancellation import CancellationToken, ResearchCancelled
+from sgptAgent.doc_watcher import start_document_watcher
 from sgptAgent.research_automation import (
     ResearchAutomation, execute_research_command_with_approval,
     get_safe_research_suggestions
@@ -195,6 +197,9 @@ class ResearchAgentGUI(QMainWindow):
         
         # Initialize automation system with approval callback
         self._setup_automation_system()
+
+        # Keep each project's local document index up to date in the background
+        self._setup_document_watcher()
     
     def _apply_modern_styling(self):
         """Apply modern light theme styling to the application."""
@@ -215,6 +220,46 @@ class ResearchAgentGUI(QMainWindow):
             print(f"⚠️ Failed to initialize automation system: {e}")
             self.automation_enabled = False
     
+    def _setup_document_watcher(self):
+        """Start background indexing of the project folders and show the selected project's index state"""
+        try:
+            self.document_watcher = start_document_watcher(str(DOCUMENTS_DIR))
+        except Exception as e:
+            print(f"⚠️ Failed to start the document watcher: {e}")
+            self.document_watcher = None
+        self.index_status_timer = QTimer()
+        self.index_status_timer.timeout.connect(self.update_index_status)
+        self.index_status_timer.start(2000)
+        self.project_name_combo.currentIndexChanged.connect(self.update_index_status)
+        self.update_index_status()
+
+    def update_index_status(self):
+        """Show the background indexing state of the selected project."""
+        if not self.document_watcher:
+            self.index_status_label.setText("Local index: background indexing is off")
+            return
+        statuses = self.document_watcher.status()
+        project = self.project_name_combo.currentData() or self.project_name_combo.currentText()
+        state = statuses.get(project) if project and project != "None" else None
+        if state is None:
+            busy = sum(1 for s in statuses.values() if s["state"] in ("indexing", "pending"))
+            text = (f"⏳ Indexing {busy} of {len(statuses)} projects" if busy
+                    else f"✅ {len(statuses)} projects indexed ({self.document_watcher.mode})")
+        elif state["state"] == "indexing":
+            text = f"⏳ Indexing ({state['percent']}%): {state['message']}"
+        elif state["state"] == "pending":
+            text = "🕒 Changes detected, indexing shortly"
+        elif state["state"] == "error":
+            text = f"⚠️ Indexing failed: {state['message']}"
+        else:
+            text = f"✅ {state['files']} files, {state['chunks']} chunks (updated {state['last_indexed']})"
+        self.index_status_label.setText(f"Local index: {text}")
+
+    def closeEvent(self, event):
+        if getattr(self, "document_watcher", None):
+            self.document_watcher.stop()
+        super().closeEvent(event)
+
     def _automation_approval_callback(self, command, security_level, reason):
         """Callback for requesting user approval for automation commands"""
         reply = QMessageBox.question(
@@ -295,8 +340,8 @@ class ResearchAgentGUI(QMainWindow):
         if fname:
             self.file_input.setText(fname)
 
-    def run_research(self, mode="research", url=None):
-        """Start the research process in a separate thread."""
+    def run_research(self, mode="research", url=None, rerender=None):
+        """Start the research process in a separate thread (rerender: run id whose sources are reused)."""
         # Get values from modern input components
         query = self.query_input.toPlainText().strip()
         audience = self.audience_input.text().strip()
@@ -365,7 +410,7 @@ class ResearchAgentGUI(QMainWindow):
         self.worker = ResearchWorker(
             query, audience, tone, improvement, project_name, model, num_results,
             temperature, max_tokens, system_prompt, ctx_window, citation_style, filename,
-            analyze_images, mode, url, domain, research_depth
+            analyze_images, mode, url, domain, research_depth, rerender=rerender
         )
         self.worker.progress.connect(self.update_progress)
         self.worker.finished.connect(self.research_finished)
@@ -453,6 +498,8 @@ class ResearchAgentGUI(QMainWindow):
         
         # Store the report path for display
         self.last_report_path = report_path
+        self.last_run_id = getattr(self.worker, 'run_id', None)
+        self.rerender_btn.setEnabled(bool(self.last_run_id))
         
         # Show file creation notification
         if report_path:
@@ -533,6 +580,7 @@ class ResearchAgentGUI(QMainWindow):
         self.run_btn.setEnabled(not is_researching)
         self.clear_btn.setEnabled(not is_researching)
         self.analyze_images_button.setEnabled(not is_researching)
+        self.rerender_btn.setEnabled(not is_researching and bool(getattr(self, 'last_run_id', None)))
         
         # Show/hide cancel button
         if is_researching:
@@ -986,6 +1034,10 @@ class ResearchAgentGUI(QMainWindow):
         self.project_name_combo.setEditable(True)
         self._populate_project_list()
         params_layout.addWidget(create_form_row("Project Name:", self.project_name_combo))
+        self.index_status_label = QLabel("Local index: checking...")
+        self.index_status_label.setFont(get_font('body_md'))
+        self.index_status_label.setStyleSheet(f"color: {COLORS['text_secondary']};")
+        params_layout.addWidget(self.index_status_label)
         
         # Mode and Vision Settings
         mode_layout = QHBoxLayout()
@@ -1254,6 +1306,12 @@ class ResearchAgentGUI(QMainWindow):
         self.analyze_images_button = IconButton("image", "Analyze Images", "secondary")
         self.analyze_images_button.clicked.connect(self.analyze_images_from_url)
         action_buttons.layout().addWidget(self.analyze_images_button)
+        # Rebuilds the last report with the current audience/tone/citation options from its collected sources
+        self.rerender_btn = IconButton("refresh", "Re-render Report", "secondary")
+        self.rerender_btn.setToolTip("Reuse the last run's sources and summaries; only stages whose inputs changed are re-run.")
+        self.rerender_btn.clicked.connect(lambda: self.run_research(rerender=self.last_run_id))
+        self.rerender_btn.setEnabled(False)
+        action_buttons.layout().addWidget(self.rerender_btn)
 
         layout.addWidget(action_buttons)
         
@@ -1688,7 +1746,7 @@ class ResearchWorker(QThread):
     cancelled = pyqtSignal()  # New signal for cancellation
 
     def __init__(self, query, audience, tone, improvement, project_name, model, num_results,
-                 temperature, max_tokens, system_prompt, ctx_window, citation_style, filename, analyze_images, mode, url, domain="General", research_depth="balanced"): 
+                 temperature, max_tokens, system_prompt, ctx_window, citation_style, filename, analyze_images, mode, url, domain="General", research_depth="balanced", rerender=None): 
         super().__init__()
         self.query = query
         self.audience = audience
@@ -1708,14 +1766,16 @@ class ResearchWorker(QThread):
         self.url = url
         self.domain = domain
         self.research_depth = research_depth
+        self.rerender = rerender
+        self.run_id = None
         self._is_cancelled = False  # Cancellation flag
+        self._cancel_token = CancellationToken()
     
     def cancel(self):
-        """Cancel the research operation"""
+        """Cancel the research operation; the thread stops once in-flight work has been aborted."""
         self._is_cancelled = True
         self.progress.emit("Cancelling research...", "", "Cancellation", 0, "Research cancelled by user.")
-        self.terminate()  # Force terminate the thread
-        self.cancelled.emit()
+        self._cancel_token.cancel()
 
     def run(self):
         import asyncio
@@ -1746,6 +1806,8 @@ class ResearchWorker(QThread):
                 url=self.url,
                 domain=self.domain,
                 research_depth=self.research_depth,
+                rerender=self.rerender,
+                cancel_token=self._cancel_token,
                 progress_callback=progress_callback
             ))
             
@@ -1753,6 +1815,7 @@ class ResearchWorker(QThread):
             
             # Store the report path for GUI notification
             self.report_path = report_path
+            self.run_id = agent.last_run_id
             
             # Read the result from the file that was created
             result = ""
@@ -1811,6 +1874,9 @@ This research encountered connectivity issues with web search providers. For bet
                     self.progress.emit("File creation failed", "", "Error", 100, f"Could not save fallback report: {save_error}")
             
             self.finished.emit(result, getattr(self, 'report_path', ''))
+        except ResearchCancelled as e:
+            self.progress.emit("Research cancelled", "", "Cancellation", 0, str(e))
+            self.cancelled.emit()
         except Exception as e:
             import traceback as tb
             self.progress.emit("Research failed", "", "Error", 0, f"Research error: {str(e)}")
@@ -0,0 +1,300 @@
+"""
+Parallel ingestion of local documents into a ``LocalDocumentIndex``.
+
+Files that changed since the last run are parsed in a process pool; large PDFs are
+split into page ranges that are extracted in parallel and streamed page by page, in order,
+into the chunker. As each file's chunks are produced they join a shared queue that is embedded
+in batches (one Ollama request per batch rather than per chunk). A file is written to
+the index as soon as all its chunks are embedded and the metadata is saved every few
+files, so an interrupted run keeps its progress. Progress reports include files/sec
+and chunks/sec.
+
+Before embedding, chunks that near-duplicate an indexed chunk of another file, or a chunk
+seen earlier in the run, are dropped (SimHash, see ``near_duplicates``), so re-saved or
+re-exported copies of a document are not embedded twice.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sgptAgent.chunking import iter_file
+from sgptAgent.near_duplicates import SimHashIndex, max_distance, simhash
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf")
+PDF_PAGES_PER_TASK = 16
+POOL_MIN_FILES = 4  # fewer text files are parsed in-process; starting workers costs more
+REPORT_PREFIX = "research_report"  # reports the agent writes into the project folder; never indexed
+
+
+def find_documents(folder: str, extensions=SUPPORTED_EXTENSIONS) -> List[str]:
+    """
+    Supported files under ``folder`` in one walk, skipping hidden directories (such as the index itself)
+    and generated research reports, which would otherwise be cited by the next run on the project.
+    """
+    found = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        found.extend(os.path.join(root, name) for name in sorted(files)
+                     if name.lower().endswith(extensions) and not is_generated_report(name))
+    return found
+
+
+def is_generated_report(path: str) -> bool:
+    return os.path.basename(path).lower().startswith(REPORT_PREFIX)
+
+
+def read_text_file(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def pdf_page_count(path: str) -> int:
+    import PyPDF2
+    with open(path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def read_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages ``start``..``stop - 1``, each ending in a line break; runs in a worker process."""
+    import PyPDF2
+    with open(path, "rb") as f:
+        pages = PyPDF2.PdfReader(f).pages
+        return [(pages[i].extract_text() or "") + "\n" for i in range(start, min(stop, len(pages)))]
+
+
+class EmbeddingBatcher:
+    """Embeds chunks from many files in fixed-size batches and reports each file once all its chunks are done."""
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[list]], batch_size: int,
+                 on_file_done: Callable[[str, list, List[list]], None]):
+        self.embed_batch = embed_batch
+        self.batch_size = max(1, batch_size)
+        self.on_file_done = on_file_done
+        self._queue = []  # (path, chunk number, text)
+        self._files: Dict[str, tuple] = {}  # path -> (chunks, vectors, embedded count)
+
+    def add(self, path: str, chunks: list) -> None:
+        """Queue a file's chunks (``chunking.Chunk`` objects)."""
+        if not chunks:
+            self.on_file_done(path, [], [])
+            return
+        self._files[path] = (chunks, [None] * len(chunks), 0)
+        self._queue.extend((path, i, chunk.text) for i, chunk in enumerate(chunks))
+        while len(self._queue) >= self.batch_size:
+            self._embed_next()
+
+    def flush(self) -> None:
+        while self._queue:
+            self._embed_next()
+
+    def _embed_next(self) -> None:
+        batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+        vectors = self.embed_batch([text for _, _, text in batch])
+        if len(vectors) != len(batch):
+            vectors = [[] for _ in batch]
+        for (path, i, _), vector in zip(batch, vectors):
+            chunks, file_vectors, done = self._files[path]
+            file_vectors[i] = vector
+            self._files[path] = (chunks, file_vectors, done + 1)
+            if done + 1 == len(chunks):
+                del self._files[path]
+                self.on_file_done(path, chunks, file_vectors)
+
+
+class IngestionPipeline:
+    """Parses, chunks and embeds changed files into ``index``."""
+
+    def __init__(self, index, embed_batch: Callable[[List[str]], List[list]], chunker: Callable[[Iterable[str]], Iterable],
+                 emit: Optional[Callable] = None, workers: int = 0, batch_size: int = 32, save_every: int = 25,
+                 dedup_similarity: float = 0.9):
+        """
+        :param index: LocalDocumentIndex to update.
+        :param embed_batch: Returns one embedding per text; an empty embedding marks a failure.
+        :param chunker: Turns an iterable of text pieces into ``chunking.Chunk`` objects.
+        :param emit: ``emit(desc, bar, substep=, percent=, log=)`` progress callback.
+        :param workers: Parser processes; 0 uses the CPU count.
+        :param dedup_similarity: SimHash similarity at or above which a chunk is dropped as a near-duplicate; 0 keeps all.
+        """
+        self.index = index
+        self.chunker = chunker
+        self.emit = emit or (lambda *args, **kwargs: None)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.save_every = save_every
+        self.batcher = EmbeddingBatcher(embed_batch, batch_size, self._file_embedded)
+        self.dedup_similarity = dedup_similarity
+        self.stats = {"files": 0, "unchanged": 0, "failed": 0, "chunks": 0, "duplicate_chunks": 0}
+        self._seen = None  # SimHashIndex of indexed rows and of chunks kept in this run
+        self._seen_epoch = None
+        self._kept: Dict[str, tuple] = {}  # path -> (fingerprints, files duplicated) until the file is embedded
+        self._done = set()  # paths indexed or found current
+        self._total = 0
+        self._started = 0.0
+
+    def run(self, paths: List[str]) -> dict:
+        """Ingest every file in ``paths`` that is not indexed in its current state; returns counts."""
+        self._ingest(paths)
+        # Re-indexing a file un-indexes the files whose duplicate chunks pointed at it; index them again
+        for _ in range(2):
+            again = [path for path in paths if path in self._done and self.index.relative(path) not in self.index.files]
+            if not again:
+                break
+            self._done.difference_update(again)
+            self._ingest(again)
+        return self.stats
+
+    def _ingest(self, paths: List[str]) -> None:
+        changed = []
+        for path in paths:
+            try:
+                if self.index.is_current(path):
+                    self.stats["unchanged"] += 1
+                    self._done.add(path)
+                    continue
+            except OSError:
+                continue
+            changed.append(path)
+        self._total = len(changed)
+        self._started = time.monotonic()
+        if changed:
+            self.emit(f"Indexing {len(changed)} new or changed files ({self.stats['unchanged']} unchanged)...",
+                      substep="Indexing", percent=0)
+            tasks = self._plan(changed)
+            executor = self._executor(changed)
+            try:
+                for path, pieces in self._parse(tasks, executor):
+                    try:
+                        chunks = list(self.chunker(pieces))
+                    except Exception as e:
+                        self._failed(path, f"Error indexing {path}: {e}")
+                        continue
+                    if self.dedup_similarity > 0:
+                        chunks = self._drop_duplicates(path, chunks)
+                    self.batcher.add(path, chunks)
+                self.batcher.flush()
+            finally:
+                if executor:
+                    executor.shutdown(cancel_futures=True)
+
+    def _drop_duplicates(self, path: str, chunks: list) -> list:
+        """Chunks of ``path`` that do not near-duplicate another file's indexed chunks or earlier chunks of this run."""
+        if self._seen is None or self._seen_epoch != self.index.epoch:  # compaction renumbers the rows
+            self._seen = SimHashIndex(max_distance(self.dedup_similarity))
+            self._seen_epoch = self.index.epoch
+            for row, fingerprint in self.index.fingerprints():
+                self._seen.add(fingerprint, row)
+        rel = self.index.relative(path)
+
+        def accept(key):
+            # Keys are index rows or paths of files kept earlier in this run; a file's own old rows are replaced
+            if isinstance(key, str):
+                return True
+            source = self.index.source(key)
+            return source is not None and source != rel
+
+        kept, fingerprints, duplicate_of = [], [], set()
+        for chunk in chunks:
+            fingerprint = simhash(chunk.text)
+            original = self._seen.find(fingerprint, accept)
+            if original is None:
+                kept.append(chunk)
+                fingerprints.append(fingerprint)
+                self._seen.add(fingerprint, path)
+                continue
+            source = self.index.relative(original) if isinstance(original, str) else self.index.source(original)
+            if source != rel:
+                duplicate_of.add(source)
+        dropped = len(chunks) - len(kept)
+        if dropped:
+            self.stats["duplicate_chunks"] += dropped
+            print(f"[INGEST] {path}: dropped {dropped} of {len(chunks)} chunks as near-duplicates")
+        self._kept[path] = (fingerprints, duplicate_of)
+        return kept
+
+    def _plan(self, paths: List[str]) -> Dict[str, list]:
+        """Parsing tasks per file: (function, args) tuples whose results are joined in order."""
+        tasks = {}
+        for path in paths:
+            if path.lower().endswith(".pdf"):
+                try:
+                    pages = pdf_page_count(path)
+                except Exception as e:
+                    self._failed(path, f"Error reading PDF {path}: {e}")
+                    continue
+                tasks[path] = [(read_pdf_pages, (path, start, start + PDF_PAGES_PER_TASK))
+                               for start in range(0, max(pages, 1), PDF_PAGES_PER_TASK)]
+            else:
+                tasks[path] = [(read_text_file, (path,))]
+        return tasks
+
+    def _executor(self, paths: List[str]):
+        if self.workers <= 1 or (len(paths) < POOL_MIN_FILES and not any(p.lower().endswith(".pdf") for p in paths)):
+            return None
+        try:
+            # spawn: forking a process that runs threads (GUI worker, web server) can deadlock
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError) as e:
+            print(f"[INGEST] Process pool unavailable ({e}), parsing in-process")
+            return None
+
+    def _parse(self, tasks: Dict[str, list], executor):
+        """Yield (path, text pieces) as files finish parsing."""
+        if executor is None:
+            # In-process: text files are streamed in blocks and PDFs one page range at a time
+            for path, parts in tasks.items():
+                if parts[0][0] is read_text_file:
+                    yield path, iter_file(path)
+                else:
+                    yield path, (page for func, args in parts for page in func(*args))
+            return
+        parts_by_path = {path: [None] * len(parts) for path, parts in tasks.items()}
+        remaining = {path: len(parts) for path, parts in tasks.items()}
+        futures = {executor.submit(func, *args): (path, i)
+                   for path, parts in tasks.items() for i, (func, args) in enumerate(parts)}
+        for future in as_completed(futures):
+            path, i = futures[future]
+            if path not in remaining:
+                continue  # an earlier part of this file failed
+            try:
+                result = future.result()
+                parts_by_path[path][i] = [result] if isinstance(result, str) else result
+            except Exception as e:
+                del remaining[path]
+                self._failed(path, f"Error indexing {path}: {e}")
+                continue
+            remaining[path] -= 1
+            if not remaining[path]:
+                del remaining[path]
+                yield path, (piece for part in parts_by_path.pop(path) for piece in part)
+
+    def _file_embedded(self, path: str, chunks: list, vectors: List[list]) -> None:
+        if not all(vectors):
+            # Leave the file unindexed so the next run retries it
+            self._failed(path, f"Could not embed {path}")
+            return
+        fingerprints, duplicate_of = self._kept.pop(path, (None, ()))
+        try:
+            self.index.add_file(path, chunks, vectors, fingerprints=fingerprints, duplicate_of=duplicate_of)
+        except (OSError, ValueError) as e:
+            self._failed(path, f"Error indexing {path}: {e}")
+            return
+        self.stats["files"] += 1
+        self.stats["chunks"] += len(chunks)
+        self._done.add(path)
+        if self.stats["files"] % self.save_every == 0:
+            self.index.save()  # keep progress if indexing is interrupted
+        self._report(f"Indexed {len(chunks)} chunks from {path}")
+
+    def _failed(self, path: str, message: str) -> None:
+        self.stats["failed"] += 1
+        self._report(message)
+
+    def _report(self, log: str) -> None:
+        processed = self.stats["files"] + self.stats["failed"]
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        percent = int(processed * 100 / self._total) if self._total else 100
+        self.emit(f"Indexed {processed}/{self._total} files "
+                  f"({self.stats['files'] / elapsed:.1f} files/s, {self.stats['chunks'] / elapsed:.0f} chunks/s)",
+                  substep="Indexing", percent=percent, log=log)
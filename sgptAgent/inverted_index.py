@@ -0,0 +1,130 @@
+"""
+BM25 inverted index over the chunks of a ``LocalDocumentIndex``.
+
+Embeddings blur exact identifiers (part numbers, statute citations, names), so local
+retrieval also ranks chunks lexically. Postings are kept per term as numpy arrays of
+row numbers and term frequencies, so a query touches only the rows containing its terms
+instead of every chunk. Rows are numbered like the vector matrix (dead rows stay as
+empty documents until compaction) and the index is saved next to it as ``bm25.npz``.
+"""
+
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from sgptAgent.text_ranking import tokenize
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> Dict[int, float]:
+    """Fuse ranked lists of ids: each id scores the sum of 1 / (k + rank) over the lists it appears in."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+class InvertedIndex:
+    """Term -> (rows, term frequencies) postings with BM25 scoring."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.terms: Dict[str, int] = {}
+        self._rows: List[np.ndarray] = []
+        self._freqs: List[np.ndarray] = []
+        self._pending: Dict[int, tuple] = {}  # term id -> (rows, freqs) added since the arrays were built
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self._pending_lengths: List[int] = []
+
+    @property
+    def rows(self) -> int:
+        return len(self.doc_lengths) + len(self._pending_lengths)
+
+    def add(self, texts: Iterable[Optional[str]]) -> None:
+        """Append one document per text (None for a dead row), numbered after the existing ones."""
+        row = self.rows
+        for text in texts:
+            counts = Counter(tokenize(text)) if text else Counter()
+            for term, freq in counts.items():
+                term_id = self.terms.setdefault(term, len(self.terms))
+                if term_id == len(self._rows):
+                    self._rows.append(np.zeros(0, dtype=np.int32))
+                    self._freqs.append(np.zeros(0, dtype=np.float32))
+                rows, freqs = self._pending.setdefault(term_id, ([], []))
+                rows.append(row)
+                freqs.append(freq)
+            self._pending_lengths.append(sum(counts.values()))
+            row += 1
+
+    def _merge(self) -> None:
+        for term_id, (rows, freqs) in self._pending.items():
+            self._rows[term_id] = np.concatenate([self._rows[term_id], np.asarray(rows, dtype=np.int32)])
+            self._freqs[term_id] = np.concatenate([self._freqs[term_id], np.asarray(freqs, dtype=np.float32)])
+        self._pending = {}
+        if self._pending_lengths:
+            self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(self._pending_lengths, dtype=np.float32)])
+            self._pending_lengths = []
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None):
+        """Rows with the ``k`` highest BM25 scores for ``query`` (only rows sharing a term), best first."""
+        self._merge()
+        term_ids = [self.terms[term] for term in set(tokenize(query)) if term in self.terms]
+        if not term_ids or not self.rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        lengths = self.doc_lengths
+        present = lengths > 0
+        avg_length = float(lengths[present].mean()) if present.any() else 1.0
+        n = int(present.sum())
+        scores: Dict[int, np.ndarray] = {}
+        touched = []
+        for term_id in term_ids:
+            rows, freqs = self._rows[term_id], self._freqs[term_id]
+            if mask is not None:
+                keep = mask[rows]
+                rows, freqs = rows[keep], freqs[keep]
+            if not len(rows):
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+            scores[term_id] = idf * freqs * (self.k1 + 1) / (freqs + norm)
+            touched.append(rows)
+        if not touched:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        # Sum the per-term contributions over the union of matching rows
+        candidates, inverse = np.unique(np.concatenate(touched), return_inverse=True)
+        totals = np.zeros(len(candidates), dtype=np.float32)
+        np.add.at(totals, inverse, np.concatenate(list(scores.values())))
+        k = min(k, len(candidates))
+        best = np.argpartition(-totals, k - 1)[:k]
+        best = best[np.argsort(-totals[best])]
+        return candidates[best].astype(np.int64), totals[best]
+
+    def save(self, path: Path, epoch: int) -> None:
+        self._merge()
+        offsets = np.cumsum([0] + [len(rows) for rows in self._rows])
+        with open(path, "wb") as f:
+            np.savez(f, epoch=epoch, terms=np.array(list(self.terms), dtype=str), offsets=offsets,
+                     rows=np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=np.int32),
+                     freqs=np.concatenate(self._freqs) if self._freqs else np.zeros(0, dtype=np.float32),
+                     doc_lengths=self.doc_lengths)
+
+    @classmethod
+    def load(cls, path: Path, epoch: int) -> Optional["InvertedIndex"]:
+        """The saved index, or None if it is missing or belongs to another numbering of the rows."""
+        try:
+            with np.load(path) as data:
+                if int(data["epoch"]) != epoch:
+                    return None
+                index = cls()
+                offsets, rows, freqs = data["offsets"], data["rows"], data["freqs"]
+                index.terms = {str(term): i for i, term in enumerate(data["terms"])}
+                index._rows = [rows[offsets[i]:offsets[i + 1]] for i in range(len(index.terms))]
+                index._freqs = [freqs[offsets[i]:offsets[i + 1]] for i in range(len(index.terms))]
+                index.doc_lengths = data["doc_lengths"]
+                return index
+        except (OSError, ValueError, KeyError):
+            return None
@@ -6,17 +6,26 @@ import asyncio
 from typing import Optional, Dict, Any
 import ollama
 
+from sgptAgent.cancellation import tracked
+from sgptAgent.embedding_cache import cached_embeddings, get_embedding_cache
+from sgptAgent.llm_scheduler import llm_slot
+from sgptAgent.stream_filter import ReasoningFilter
+
 class OllamaClient:
     def __init__(self, base_url: str = "http://localhost:11434"):
         self.base_url = base_url.rstrip("/")
         self.api_url = f"{self.base_url}/api/generate"
         self.model = "qwen3:8b"
 
-    async def generate(self, prompt: str, model: str = None, **kwargs) -> str:
+    async def generate(self, prompt: str, model: str = None, on_token=None, filter_reasoning: bool = False,
+                       **kwargs) -> str:
         """
         Sends a prompt to the Ollama server and returns the completion.
         Handles streaming/multi-line JSON responses.
         Maps system_prompt to 'system' and context_window to 'context_window' for the Ollama API.
+
+        With filter_reasoning, reasoning tags, the monologue preamble and fake citations are removed
+        while the response streams in. on_token, if given, is called with each piece of (filtered) text.
         """
         model = model or self.model
         payload = {
@@ -39,55 +48,69 @@ class OllamaClient:
         
         async def stream_and_concat(resp):
             output = ""
+            # A fresh filter per attempt, so a retried stream starts clean
+            reasoning_filter = ReasoningFilter() if filter_reasoning else None
             async for line in resp.aiter_lines():
                 if not line:
                     continue
                 try:
                     data = json.loads(line)
                     chunk = data.get("response", "")
-                    
+                    if reasoning_filter:
+                        chunk = reasoning_filter.feed(chunk)
                     output += chunk
+                    if on_token and chunk:
+                        on_token(chunk)
                 except Exception as e:
                     print(f"[OLLAMA ERROR] Could not parse line: {line} | {e}")
+            if reasoning_filter:
+                tail = reasoning_filter.flush()
+                output += tail
+                if on_token and tail:
+                    on_token(tail)
             return output
 
-        # Retry logic for timeout errors
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                timeout_duration = 120 + (attempt * 60)  # Increase timeout on retries
-                async with httpx.AsyncClient() as client:
-                    async with client.stream("POST", self.api_url, json=payload, timeout=timeout_duration) as resp:
-                        resp.raise_for_status()
-                        return await stream_and_concat(resp)
-            except httpx.ReadTimeout as e:
-                print(f"[OLLAMA ERROR] Request timed out (attempt {attempt + 1}/{max_retries})")
-                if attempt == max_retries - 1:
-                    return f"[Ollama error: Request timed out after {max_retries} attempts. The model may be overloaded or the request too complex.]"
-                print(f"[OLLAMA ERROR] Retrying with longer timeout...")
-                await asyncio.sleep(2)  # Brief pause before retry
-                continue
-            except httpx.ConnectError as e:
-                print("[OLLAMA ERROR] Ollama server is not running. Attempting to start with 'ollama serve'...")
-                try:
-                    subprocess.Popen(["ollama", "serve"])
-                    time.sleep(2)  # Give it a moment to start
-                    async with httpx.AsyncClient() as client:
-                        async with client.stream("POST", self.api_url, json=payload, timeout=120) as resp:
-                            resp.raise_for_status()
-                            return await stream_and_concat(resp)
-                except Exception as e2:
-                    return f"[Ollama error: Could not start Ollama server: {e2}]"
-            except httpx.HTTPStatusError as e:
-                print(f"[OLLAMA ERROR] HTTP error: {e}")
-                if e.response is not None and e.response.status_code == 404:
-                    return f"[Ollama HTTP 404: Model '{model}' not found at {self.api_url}]"
-                return f"[Ollama HTTP error: {e}]"
-            except Exception as e:
-                import traceback
-                print(f"[OLLAMA ERROR] Unexpected error: {e}")
-                print(f"[OLLAMA ERROR] Traceback: {traceback.format_exc()}")
-                return f"[Ollama error: {e}]"
+        # Hold a global LLM slot for the whole request, including retries. Cancelling the run
+        # closes the stream, which makes the Ollama server stop generating.
+        with tracked("llm_calls"):
+            async with llm_slot():
+                # Retry logic for timeout errors
+                max_retries = 3
+                for attempt in range(max_retries):
+                    try:
+                        timeout_duration = 120 + (attempt * 60)  # Increase timeout on retries
+                        async with httpx.AsyncClient() as client:
+                            async with client.stream("POST", self.api_url, json=payload, timeout=timeout_duration) as resp:
+                                resp.raise_for_status()
+                                return await stream_and_concat(resp)
+                    except httpx.ReadTimeout as e:
+                        print(f"[OLLAMA ERROR] Request timed out (attempt {attempt + 1}/{max_retries})")
+                        if attempt == max_retries - 1:
+                            return f"[Ollama error: Request timed out after {max_retries} attempts. The model may be overloaded or the request too complex.]"
+                        print(f"[OLLAMA ERROR] Retrying with longer timeout...")
+                        await asyncio.sleep(2)  # Brief pause before retry
+                        continue
+                    except httpx.ConnectError as e:
+                        print("[OLLAMA ERROR] Ollama server is not running. Attempting to start with 'ollama serve'...")
+                        try:
+                            subprocess.Popen(["ollama", "serve"])
+                            time.sleep(2)  # Give it a moment to start
+                            async with httpx.AsyncClient() as client:
+                                async with client.stream("POST", self.api_url, json=payload, timeout=120) as resp:
+                                    resp.raise_for_status()
+                                    return await stream_and_concat(resp)
+                        except Exception as e2:
+                            return f"[Ollama error: Could not start Ollama server: {e2}]"
+                    except httpx.HTTPStatusError as e:
+                        print(f"[OLLAMA ERROR] HTTP error: {e}")
+                        if e.response is not None and e.response.status_code == 404:
+                            return f"[Ollama HTTP 404: Model '{model}' not found at {self.api_url}]"
+                        return f"[Ollama HTTP error: {e}]"
+                    except Exception as e:
+                        import traceback
+                        print(f"[OLLAMA ERROR] Unexpected error: {e}")
+                        print(f"[OLLAMA ERROR] Traceback: {traceback.format_exc()}")
+                        return f"[Ollama error: {e}]"
 
     async def chat(self, model: str, prompt: str, **kwargs) -> str:
         """
@@ -98,8 +121,18 @@ class OllamaClient:
 
     def embeddings(self, model: str, prompt: str) -> list:
         """
-        Gets embeddings for a given prompt using the specified model.
+        Gets embeddings for a given prompt using the specified model, served from the embedding cache when possible.
+        """
+        return cached_embeddings(get_embedding_cache(), model, [prompt],
+                                 lambda missing: [self._embed(model, missing[0])])[0]
+
+    def embed_batch(self, model: str, texts: list) -> list:
         """
+        Gets embeddings for several texts, requesting only those not in the embedding cache in one request.
+        """
+        return cached_embeddings(get_embedding_cache(), model, texts, lambda missing: self._embed_batch(model, missing))
+
+    def _embed(self, model: str, prompt: str) -> list:
         try:
             return ollama.embeddings(model=model, prompt=prompt)['embedding']
         except Exception as e:
@@ -111,6 +144,13 @@ class OllamaClient:
                 print(f"[OLLAMA ERROR] Could not get embeddings: {e}")
             return []
 
+    def _embed_batch(self, model: str, texts: list) -> list:
+        try:
+            return [list(vector) for vector in ollama.embed(model=model, input=texts)['embeddings']]
+        except Exception as e:
+            print(f"[OLLAMA ERROR] Batch embedding failed, embedding one by one: {e}")
+            return [self._embed(model, text) for text in texts]
+
     def chat_with_image(self, model: str, prompt: str, image_path: str, **kwargs) -> str:
         """
         Sends a prompt and an image to the Ollama server and returns the completion.
@@ -0,0 +1,30 @@
+"""
+Process-wide limit on concurrent LLM generations.
+
+Every OllamaClient.generate call acquires a slot, so fan-out code (map-reduce
+summaries, per-claim reasoning, concurrent URL processing) can simply gather
+coroutines without overloading the local Ollama server.
+"""
+
+import asyncio
+import weakref
+
+from sgptAgent.config import cfg
+
+# asyncio primitives are bound to one event loop, and the GUI starts a fresh loop per run
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def max_llm_concurrency() -> int:
+    """Configured maximum number of in-flight LLM generations."""
+    return max(1, int(cfg.get("LLM_MAX_CONCURRENCY")))
+
+
+def llm_slot() -> asyncio.Semaphore:
+    """Return the LLM concurrency semaphore for the running event loop (use with ``async with``)."""
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(max_llm_concurrency())
+        _limiters[loop] = limiter
+    return limiter
@@ -0,0 +1,645 @@
+"""
+Persistent vector index of a folder of local documents.
+
+The index lives in ``<folder>/.sgpt_index``. ``embeddings.f32`` is a float32 matrix with one
+row per chunk, opened with ``numpy.memmap`` so it is paged in on demand rather than loaded.
+``metadata.json`` is the table describing it: the embedding model, chunking and storage
+settings and dimension, and every indexed file with its mtime, size, content hash and range
+of rows. The source, chunk id, text, character offsets and SimHash fingerprint of every row
+are appended to a ``chunk_store`` beside it, so the metadata stays small however many chunks
+there are and saving it does not rewrite them.
+
+The matrix can instead be kept as float16 (``embeddings.f16``) or int8 with a float32 scale
+per row (``embeddings.i8`` and ``scales.f32``), halving or quartering what a search reads
+(see ``quantization``). With ``rescore`` a float32 copy is also kept on disk and the best
+candidates of the quantized scan are re-ranked against it; only those rows are read.
+
+Rows are stored L2-normalized, so retrieval is a single matrix product with the normalized
+query vectors followed by an ``argpartition`` top-k, done in blocks of rows so a large
+memory-mapped matrix is streamed rather than loaded whole.
+
+For large folders an approximate nearest-neighbour searcher (``ann_index``) can answer
+instead; it is saved next to the index, takes appended rows without retraining and is
+rebuilt when compaction renumbers the rows or the index has doubled since training. Syncs
+build and update it when they save, so a read-only index only loads it and searches exactly
+while there is none.
+
+Chunks are also indexed lexically (``inverted_index``, saved as ``bm25.npz``) so exact
+identifiers are not lost to embedding similarity. Hybrid retrieval fuses the vector and
+BM25 rankings with reciprocal rank fusion; in "prefilter" mode the BM25 candidates are
+the only rows whose vectors are scored.
+
+Ingestion drops chunks that near-duplicate indexed ones (``near_duplicates``), so a second
+copy of a document costs no embeddings. A file whose chunks were dropped for duplicating
+another file's records that file; removing or changing that file un-indexes it again so
+its content is not lost.
+
+Syncing compares each file's mtime and size first and hashes its content only when those
+changed, so unchanged files are never re-read, re-parsed or re-embedded. A changed file gets
+new rows appended and a deleted file is dropped from the table; the rows they leave behind
+are compacted away once they make up a quarter of the matrix.
+
+A research run can open an index ``read_only`` while the background watcher syncs it: it
+searches the rows the last saved metadata describes and never truncates, resets or writes
+files, so the sync is not disturbed. Its memory maps and chunk records are opened when it
+loads, so rows compacted or deleted by the sync afterwards stay readable as they were.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from sgptAgent.ann_index import make_searcher
+from sgptAgent.chunk_store import ChunkStore
+from sgptAgent.inverted_index import InvertedIndex, reciprocal_rank_fusion
+from sgptAgent.near_duplicates import simhash
+from sgptAgent.quantization import DTYPES, SUFFIXES, QuantizedMatrix, quantize
+
+INDEX_DIRNAME = ".sgpt_index"
+INDEX_VERSION = 4  # 2: rows are stored normalized; 3: chunks carry character offsets; 4: chunks in a chunk store
+COMPACT_DEAD_FRACTION = 0.25
+SEARCH_BLOCK_ROWS = 65536  # rows scored at once; bounds memory for large indexes
+LOAD_ATTEMPTS = 5  # read-only loads retried while a concurrent sync renumbers the rows
+
+
+_index_locks: Dict[str, threading.Lock] = {}
+_index_locks_guard = threading.Lock()
+
+
+def index_lock(folder: str) -> threading.Lock:
+    """Lock held while a folder's index is synced, so the background watcher and a research run never write it at once."""
+    with _index_locks_guard:
+        return _index_locks.setdefault(os.path.abspath(folder), threading.Lock())
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """float32 copy of ``vectors`` (one per row) scaled to unit length; all-zero rows stay zero."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(matrix: np.ndarray, queries, k: int, mask: Optional[np.ndarray] = None,
+          block_rows: int = SEARCH_BLOCK_ROWS):
+    """
+    Best ``k`` rows of ``matrix`` for each query by dot product.
+
+    :param queries: One vector or a batch (one per row), already normalized for cosine similarity.
+    :param mask: Optional boolean array; rows where it is False are never returned.
+    :return: ``(indices, scores)``, each of shape (queries, k), best first.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    k = min(k, matrix.shape[0])
+    if k <= 0:
+        empty = np.zeros((queries.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    best_indices, best_scores = [], []
+    for start in range(0, matrix.shape[0], block_rows):
+        scores = queries @ np.asarray(matrix[start:start + block_rows]).T
+        if mask is not None:
+            scores[:, ~mask[start:start + block_rows]] = -np.inf
+        block_k = min(k, scores.shape[1])
+        # argpartition finds the block's k best in linear time; only those are kept
+        part = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+        best_indices.append(part + start)
+        best_scores.append(np.take_along_axis(scores, part, axis=1))
+    indices = np.concatenate(best_indices, axis=1)
+    scores = np.concatenate(best_scores, axis=1)
+    order = np.argsort(-scores, axis=1)[:, :k]
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+class LocalDocumentIndex:
+    """Chunk embeddings of one document folder, kept on disk and updated file by file."""
+
+    def __init__(self, folder: str, model: str, index_dir: Optional[str] = None, chunking=None, retrieval: str = "hybrid",
+                 candidates: int = 100, precision: str = "float32", rescore: int = 0, ann_backend: str = "exact",
+                 ann_min_rows: int = 50000, read_only: bool = False, **ann_options):
+        """
+        :param folder: Document folder the index belongs to.
+        :param model: Embedding model; an index built with another model is discarded.
+        :param chunking: JSON-like chunker settings; an index chunked differently is discarded too.
+        :param index_dir: Where to store the index, ``<folder>/.sgpt_index`` by default.
+        :param retrieval: "vector", "hybrid" (vector and BM25 rankings fused) or "prefilter"
+                          (only BM25 candidates are scored by vector, falling back to vector search).
+        :param candidates: Rows taken from each ranking before fusion.
+        :param precision: Stored precision of the matrix: "float32", "float16" or "int8".
+        :param rescore: With a quantized matrix, keep float32 rows too and re-rank this many top candidates
+                        with them; 0 ranks with the quantized rows alone.
+        :param ann_backend: "exact", or an ``ann_index`` backend ("auto", "ivf", "faiss", "hnsw").
+        :param ann_min_rows: Below this many live chunks exact search is used anyway.
+        :param read_only: Search the saved index as it is, without repairing, rebuilding or writing anything.
+        :param ann_options: Recall/latency knobs passed to ``make_searcher`` (nlist, nprobe, ef).
+        """
+        self.folder = os.path.abspath(folder)
+        self.model = model
+        self.chunking = chunking
+        self.path = Path(index_dir) if index_dir else Path(self.folder) / INDEX_DIRNAME
+        if precision not in DTYPES:
+            raise ValueError(f"Unknown precision '{precision}'; expected one of {', '.join(DTYPES)}")
+        self.precision = precision
+        self.rescore = rescore if precision != "float32" else 0
+        self.matrix_file = self.path / f"embeddings.{SUFFIXES[precision]}"
+        self.scales_file = self.path / "scales.f32"
+        self.full_file = self.path / "embeddings.f32"
+        self.meta_file = self.path / "metadata.json"
+        self.dim = 0
+        self.rows = 0  # rows in the matrix file, live or dead
+        self.files: Dict[str, dict] = {}  # relative path -> {mtime, size, hash, start, count, duplicate_of}
+        self.store = ChunkStore(self.path)  # row -> [source, chunk_id, content, start, end] and its simhash
+        self._sources = None  # (row starts, files) of the live row ranges, sorted, rebuilt after changes
+        self._matrix = None
+        self._full = None
+        self._live = None  # boolean mask of live rows, rebuilt after changes
+        self._dirty = False
+        self.epoch = 0  # bumped whenever rows are renumbered
+        self.ann_backend = ann_backend
+        self.ann_min_rows = ann_min_rows
+        self.ann_options = ann_options
+        self.ann_file = self.path / "ann.json"
+        self._searcher = None
+        self.retrieval = retrieval
+        self.candidates = candidates
+        self.lexical_file = self.path / "bm25.npz"
+        self._lexical = None
+        self._lexical_saved = 0  # rows of the lexical index already on disk
+        self.read_only = read_only
+        self._load()
+
+    @property
+    def storage(self) -> dict:
+        return {"precision": self.precision, "float32_copy": bool(self.rescore)}
+
+    def _stored_files(self) -> List[tuple]:
+        """(file, bytes per row) of every per-row file: the matrix, int8 scales and float32 copy."""
+        files = [(self.matrix_file, self.dim * np.dtype(DTYPES[self.precision]).itemsize)]
+        if self.precision == "int8":
+            files.append((self.scales_file, 4))
+        if self.rescore:
+            files.append((self.full_file, self.dim * 4))
+        return files
+
+    def _load(self) -> None:
+        if not self.read_only:
+            self._load_meta()
+            return
+        # A sync may compact or reset the index while it is read; the maps opened here keep the files
+        # as they were, so the load is only retried if they were replaced before being opened
+        for attempt in range(LOAD_ATTEMPTS):
+            if self._load_meta() and (not self.rows or self._saved_epoch() == self.epoch):
+                return
+            self.rows, self.files, self._matrix, self._full = 0, {}, None, None
+            self.store.close()
+            time.sleep(0.1 * (attempt + 1))
+        print(f"[LOCAL INDEX] Index at {self.path} kept changing while loading, not using it")
+
+    def _saved_epoch(self) -> Optional[int]:
+        try:
+            return json.loads(self.meta_file.read_text(encoding="utf-8")).get("epoch", 0)
+        except (OSError, ValueError):
+            return None
+
+    def _load_meta(self) -> bool:
+        """Load the saved metadata and open its rows; False if a read-only index should retry."""
+        try:
+            meta = json.loads(self.meta_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return True
+        if (meta.get("version") != INDEX_VERSION or meta.get("model") != self.model
+                or meta.get("chunking") != self.chunking or meta.get("storage") != self.storage):
+            if self.read_only:
+                print(f"[LOCAL INDEX] Index at {self.path} was built differently, not using it")
+                return True
+            print(f"[LOCAL INDEX] Index at {self.path} was built differently, rebuilding")
+            # Discard the old files so new rows are not appended to them; a new epoch invalidates bm25/ANN files
+            self.epoch = meta.get("epoch", 0)
+            self._reset()
+            return True
+        self.dim = meta["dim"]
+        self.rows = meta["rows"]
+        self.files = meta["files"]
+        self.epoch = meta.get("epoch", 0)
+        if not self.store.load(self.rows, repair=not self.read_only):
+            return self._incomplete("Chunk records")
+        for file, row_bytes in self._stored_files():
+            expected = self.rows * row_bytes
+            try:
+                size = file.stat().st_size
+            except OSError:
+                size = -1
+            if size < expected:
+                return self._incomplete(file.name)
+            if size > expected and not self.read_only:
+                # Rows appended by a sync that never saved its metadata (or one still running)
+                os.truncate(file, expected)
+        if self.read_only:
+            try:
+                self.matrix(), self.full_matrix()
+            except (OSError, ValueError):
+                return False  # replaced by a shorter file since the check above
+        return True
+
+    def _incomplete(self, what: str) -> bool:
+        if self.read_only:
+            # Most likely replaced by a compacting sync between reading the metadata and the files
+            return False
+        print(f"[LOCAL INDEX] {what} at {self.path} incomplete, rebuilding")
+        self._reset()
+        return True
+
+    def _reset(self) -> None:
+        self.dim = 0
+        self.rows = 0
+        self.files = {}
+        self.store.reset()
+        self._matrix = None
+        self._full = None
+        self._live = None
+        self._sources = None
+        self._searcher = None
+        self._lexical = None
+        self.epoch += 1
+        self._dirty = True
+        for file in [self.path / f"embeddings.{suffix}" for suffix in SUFFIXES.values()] + [self.scales_file]:
+            try:
+                file.unlink()
+            except OSError:
+                pass
+        if self.meta_file.exists():
+            # Saved at once, so read-only loads never pair the old metadata with the rebuilt rows
+            self._write_meta()
+
+    def __len__(self) -> int:
+        return sum(entry["count"] for entry in self.files.values())
+
+    def relative(self, file_path: str) -> str:
+        return os.path.relpath(os.path.abspath(file_path), self.folder)
+
+    def is_current(self, file_path: str) -> bool:
+        """Whether ``file_path`` is indexed as it is now; a touched but unchanged file only gets its mtime updated."""
+        entry = self.files.get(self.relative(file_path))
+        if not entry:
+            return False
+        stat = os.stat(file_path)
+        if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return True
+        if entry["size"] == stat.st_size and entry["hash"] == file_digest(file_path):
+            entry["mtime"] = stat.st_mtime_ns
+            self._dirty = True
+            return True
+        return False
+
+    def add_file(self, file_path: str, chunks: list, embeddings: List[list], fingerprints: Optional[list] = None,
+                 duplicate_of=()) -> None:
+        """
+        Replace the rows of ``file_path`` with ``chunks`` (strings or chunking.Chunk) and their embeddings.
+
+        :param fingerprints: SimHash of each chunk, computed if not given.
+        :param duplicate_of: Indexed files that chunks of this file were dropped as near-duplicates of.
+        """
+        vectors = normalize_rows(embeddings) if chunks else None
+        if chunks and self.dim and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim})")
+        stat = os.stat(file_path)
+        self.remove_file(file_path)
+        if chunks:
+            self.dim = self.dim or vectors.shape[1]
+            self._matrix = self._full = None  # the memmaps must not be open while the files grow
+            self.path.mkdir(parents=True, exist_ok=True)
+            codes, scales = quantize(vectors, self.precision)
+            data = {self.matrix_file: codes, self.scales_file: scales, self.full_file: vectors}
+            for file, _ in self._stored_files():
+                with open(file, "ab") as f:
+                    f.write(data[file].tobytes())
+        rel = self.relative(file_path)
+        records = []
+        for i, chunk in enumerate(chunks):
+            text, start, end = (chunk, None, None) if isinstance(chunk, str) else chunk
+            records.append([rel, i, text, start, end])
+        if fingerprints is None:
+            fingerprints = [simhash(record[2]) for record in records]
+        self.store.append(records, fingerprints)
+        self.files[rel] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": file_digest(file_path),
+                           "start": self.rows, "count": len(chunks), "duplicate_of": sorted(set(duplicate_of))}
+        self.rows += len(chunks)
+        self._live = None
+        self._sources = None
+        self._dirty = True
+
+    def remove_file(self, file_path: str) -> None:
+        rel = self.relative(file_path)
+        entry = self.files.pop(rel, None)
+        if entry:
+            self._live = None
+            self._sources = None
+            self._dirty = True
+            # Files that relied on this one for their duplicate chunks must be indexed again
+            for other in [other for other, e in self.files.items() if rel in e.get("duplicate_of", ())]:
+                self.remove_file(os.path.join(self.folder, other))
+
+    def fingerprints(self):
+        """(row, simhash) of every live row; the simhash is None for chunks too short to fingerprint."""
+        for row in np.flatnonzero(self.live_mask()):
+            yield int(row), self.store.fingerprint(row)
+
+    def source(self, row: int) -> Optional[str]:
+        """Relative path of the file a row belongs to, or None if the row is dead."""
+        if self._sources is None:
+            ranges = sorted((entry["start"], entry["count"], rel) for rel, entry in self.files.items() if entry["count"])
+            self._sources = ([start for start, _, _ in ranges], ranges)
+        starts, ranges = self._sources
+        i = bisect_right(starts, row) - 1
+        if i < 0:
+            return None
+        start, count, rel = ranges[i]
+        return rel if row < start + count else None
+
+    def prune(self, existing_files) -> int:
+        """Drop files that no longer exist (garbage collection); returns how many were dropped."""
+        keep = {self.relative(path) for path in existing_files}
+        gone = [rel for rel in self.files if rel not in keep]
+        for rel in gone:
+            self.remove_file(os.path.join(self.folder, rel))
+        return len(gone)
+
+    def matrix(self):
+        """All rows, live and dead, as a read-only memory map (wrapped in a ``QuantizedMatrix`` unless float32)."""
+        if self._matrix is None:
+            if not self.rows:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            codes = np.memmap(self.matrix_file, dtype=DTYPES[self.precision], mode="r", shape=(self.rows, self.dim))
+            if self.precision == "float32":
+                self._matrix = codes
+            else:
+                scales = (np.memmap(self.scales_file, dtype=np.float32, mode="r", shape=(self.rows,))
+                          if self.precision == "int8" else None)
+                self._matrix = QuantizedMatrix(codes, scales)
+        return self._matrix
+
+    def full_matrix(self):
+        """Float32 rows for rescoring: the float32 copy if one is kept, otherwise the matrix itself."""
+        if not self.rescore or not self.rows:
+            return self.matrix()
+        if self._full is None:
+            self._full = np.memmap(self.full_file, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return self._full
+
+    def live_mask(self) -> np.ndarray:
+        if self._live is None:
+            live = np.zeros(self.rows, dtype=bool)
+            for entry in self.files.values():
+                live[entry["start"]:entry["start"] + entry["count"]] = True
+            self._live = live
+        return self._live
+
+    def search(self, query_embeddings, k: int = 3, query_texts: Optional[List[str]] = None) -> List[List[dict]]:
+        """
+        Top ``k`` chunks for each query embedding (one vector or a batch). With ``query_texts`` (one per
+        embedding) and hybrid retrieval, BM25 matches are fused in. Returns one list per query of chunk
+        dicts with a ``score`` (cosine similarity, or the fused score) and the cosine ``similarity``, best first.
+        """
+        queries = normalize_rows(query_embeddings)
+        if not self.rows or queries.shape[1] != self.dim:
+            return [[] for _ in range(queries.shape[0])]
+        if query_texts is not None and self.retrieval in ("hybrid", "prefilter"):
+            return [self._hybrid_search(query, text, k) for query, text in zip(queries, query_texts)]
+        indices, scores = self._vector_search(queries, k)
+        return [self._hits(row_indices, row_scores) for row_indices, row_scores in zip(indices, scores)]
+
+    def _vector_search(self, queries: np.ndarray, k: int):
+        fetch = max(k, self.rescore)
+        searcher = self._ann()
+        if searcher:
+            indices, scores = searcher.search(self.matrix(), queries, fetch, mask=self.live_mask())
+        else:
+            indices, scores = top_k(self.matrix(), queries, fetch, mask=self.live_mask())
+        if self.rescore:
+            indices, scores = self._rescore(queries, indices, k)
+        return indices, scores
+
+    def _rescore(self, queries: np.ndarray, indices: np.ndarray, k: int):
+        """Re-rank quantized-scan candidates by their float32 rows."""
+        full = self.full_matrix()
+        out_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, (query, rows) in enumerate(zip(queries, indices)):
+            rows = np.sort(rows[rows >= 0])  # sorted reads from the memory map
+            if not len(rows):
+                continue
+            scores = np.asarray(full[rows], dtype=np.float32) @ query
+            best = np.argsort(-scores)[:k]
+            out_indices[q, :len(best)] = rows[best]
+            out_scores[q, :len(best)] = scores[best]
+        return out_indices, out_scores
+
+    def _hybrid_search(self, query: np.ndarray, text: str, k: int) -> List[dict]:
+        lexical_rows, _ = self.lexical().search(text, self.candidates, mask=self.live_mask())
+        if self.retrieval == "prefilter" and len(lexical_rows) >= k:
+            # BM25 is the candidate generator: only these rows' vectors are read and scored
+            vector_rows = np.zeros(0, dtype=np.int64)
+        else:
+            vector_rows = self._vector_search(query[None, :], self.candidates)[0]
+            vector_rows = vector_rows[vector_rows >= 0]
+        candidates = np.union1d(lexical_rows, vector_rows).astype(np.int64)
+        if not len(candidates):
+            return []
+        similarities = np.asarray(self.full_matrix()[candidates], dtype=np.float32) @ query
+        vector_ranking = candidates[np.argsort(-similarities)].tolist()
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_rows.tolist()])
+        best = sorted(fused, key=lambda row: -fused[row])[:k]
+        similarity = dict(zip(candidates.tolist(), similarities.tolist()))
+        return self._hits(best, [fused[row] for row in best], [similarity[row] for row in best])
+
+    def _hits(self, rows, scores, similarities=None) -> List[dict]:
+        found = []
+        for row, score, similarity in zip(rows, scores, scores if similarities is None else similarities):
+            if row < 0 or not np.isfinite(score):
+                break  # fewer live chunks than k
+            found.append((int(row), float(score), float(similarity)))
+        hits = []
+        for (_, score, similarity), record in zip(found, self.store.get(row for row, _, _ in found)):
+            source, chunk_id, content, start, end = record
+            hits.append({"source": os.path.join(self.folder, source), "chunk_id": chunk_id,
+                         "content": content, "start": start, "end": end, "score": score,
+                         "similarity": similarity})
+        return hits
+
+    def lexical(self) -> InvertedIndex:
+        """The BM25 index, loaded from disk and brought up to date with the rows added since."""
+        if self._lexical is None:
+            self._lexical = InvertedIndex.load(self.lexical_file, self.epoch)
+            if self._lexical is None or self._lexical.rows > self.rows:
+                self._lexical = InvertedIndex()
+            self._lexical_saved = self._lexical.rows
+        if self._lexical.rows < self.rows:
+            live = self.live_mask()
+            self._lexical.add(record[2] if live[row] else None
+                              for row, record in enumerate(self.store.iter_records(self._lexical.rows), self._lexical.rows))
+        return self._lexical
+
+    def _ann(self):
+        """
+        The ANN searcher for a search; None means exact search. A read-only index only uses the searcher
+        its syncs saved (taking rows appended since in memory) and searches exactly while there is none.
+        """
+        if self.ann_backend == "exact" or len(self) < self.ann_min_rows:
+            return None
+        if not self.read_only:
+            return self.update_ann()
+        try:
+            searcher = self._searcher or self._load_ann()
+            if searcher is None or self._needs_build(searcher):
+                return None
+            if searcher.rows < self.rows:
+                searcher.add(self.matrix())
+        except ImportError:
+            return None
+        self._searcher = searcher
+        return searcher
+
+    def update_ann(self):
+        """Load, update or build the ANN searcher and save it for later searches; returns it (None: exact search)."""
+        if self.read_only or self.ann_backend == "exact" or len(self) < self.ann_min_rows:
+            return None
+        try:
+            searcher = self._searcher or self._load_ann()
+            if searcher is None or self._needs_build(searcher):
+                started = time.monotonic()
+                searcher = make_searcher(self.ann_backend, **self.ann_options)
+                searcher.build(self.matrix())
+                print(f"[LOCAL INDEX] Built {searcher.kind} index over {self.rows} rows "
+                      f"in {time.monotonic() - started:.1f}s")
+                self._save_ann(searcher)
+            elif searcher.rows < self.rows:
+                searcher.add(self.matrix())
+                self._save_ann(searcher)
+        except ImportError as e:
+            print(f"[LOCAL INDEX] ANN backend '{self.ann_backend}' is not available ({e}), using exact search")
+            self.ann_backend = "exact"
+            return None
+        self._searcher = searcher
+        return searcher
+
+    def _needs_build(self, searcher) -> bool:
+        # Rows it does not know about (an older save), or trained on too few of the rows to bucket them well
+        return searcher.rows > self.rows or self.rows > 2 * searcher.trained_rows
+
+    def _load_ann(self):
+        try:
+            state = json.loads(self.ann_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # A searcher over renumbered rows, another backend or other settings is rebuilt
+        if (state.get("epoch") != self.epoch or state.get("rows", 0) > self.rows or state.get("dim") != self.dim
+                or state.get("backend") != self.ann_backend or state.get("options") != self.ann_options):
+            return None
+        searcher = make_searcher(state["kind"], **self.ann_options)
+        try:
+            searcher.load(self.path / state.get("file", f"ann.{searcher.kind}"), self.dim)
+        except Exception as e:
+            print(f"[LOCAL INDEX] Could not load the {searcher.kind} index: {e}")
+            return None
+        searcher.trained_rows = state["trained_rows"]
+        return searcher
+
+    def _save_ann(self, searcher) -> None:
+        # Named by epoch: a reader holding the state of one epoch never loads rows numbered for another
+        name = f"ann-{self.epoch}.{searcher.kind}"
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path / f"{name}.{os.getpid()}.tmp"
+            searcher.save(tmp_file)
+            os.replace(tmp_file, self.path / name)
+            state = {"kind": searcher.kind, "file": name, "backend": self.ann_backend, "options": self.ann_options,
+                     "epoch": self.epoch, "rows": searcher.rows, "trained_rows": searcher.trained_rows, "dim": self.dim}
+            tmp_file = self.ann_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp_file, self.ann_file)
+        except OSError as e:
+            print(f"[LOCAL INDEX] Could not save the {searcher.kind} index: {e}")
+            return
+        for old in self.path.glob("ann*"):
+            if old.name not in (name, self.ann_file.name):
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def save(self) -> None:
+        """
+        Write the metadata (compacting dead rows first if there are many) and bring the saved ANN searcher
+        up to date, so searches never train one; no-op when nothing changed.
+        """
+        if self.read_only:
+            return
+        if self._dirty:
+            live = len(self)
+            if self.rows and self.rows - live > self.rows * COMPACT_DEAD_FRACTION:
+                self._compact()
+            self.path.mkdir(parents=True, exist_ok=True)
+            lexical = self.lexical()
+            if lexical.rows != self._lexical_saved:
+                lexical.save(self.lexical_file, self.epoch)
+                self._lexical_saved = lexical.rows
+            self._write_meta()
+            self._dirty = False
+        if self._searcher is None and self._ann_saved():
+            return
+        self.update_ann()
+
+    def _ann_saved(self) -> bool:
+        """Whether the saved ANN searcher covers every row as it is (checked without loading it)."""
+        try:
+            state = json.loads(self.ann_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        return (state.get("epoch") == self.epoch and state.get("rows") == self.rows
+                and state.get("backend") == self.ann_backend and state.get("options") == self.ann_options)
+
+    def _write_meta(self) -> None:
+        meta = {"version": INDEX_VERSION, "model": self.model, "chunking": self.chunking, "storage": self.storage,
+                "dim": self.dim, "rows": self.rows, "epoch": self.epoch, "files": self.files}
+        tmp_file = self.meta_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_file, self.meta_file)
+
+    def _compact(self) -> None:
+        self._matrix = self._full = None
+        ranges = [(entry["start"], entry["count"]) for entry in self.files.values()]
+        for file, row_bytes in self._stored_files():
+            stored = np.memmap(file, dtype=np.uint8, mode="r", shape=(self.rows, row_bytes))
+            tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "wb") as f:
+                for start, count in ranges:
+                    f.write(np.ascontiguousarray(stored[start:start + count]).tobytes())
+            del stored
+            os.replace(tmp_file, file)
+        self.store.compact(ranges)
+        rows = 0
+        for entry in self.files.values():
+            entry["start"] = rows
+            rows += entry["count"]
+        print(f"[LOCAL INDEX] Compacted {self.rows - rows} stale rows")
+        self.rows = rows
+        self._live = None
+        self._sources = None
+        self._searcher = None
+        self._lexical = None
+        self.epoch += 1
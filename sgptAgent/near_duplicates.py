@@ -0,0 +1,89 @@
+"""
+Near-duplicate detection with SimHash.
+
+A text's SimHash is a 64-bit fingerprint: every word 3-gram of its content tokens hashes
+to 64 bits and votes for each bit, weighted by how often it occurs; the fingerprint keeps
+the winning value of each bit. Texts sharing most of their shingles (syndicated articles,
+mirrored pages, two versions of a report) get fingerprints a few bits apart, so their
+similarity is 1 - hamming distance / 64.
+
+``SimHashIndex`` finds a stored fingerprint within ``max_distance`` bits without comparing
+against all of them: fingerprints are cut into ``max_distance + 1`` bands, and by the
+pigeonhole principle a near-duplicate matches at least one band exactly, so only
+fingerprints sharing a band are compared.
+"""
+
+from collections import Counter
+from hashlib import blake2b
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from sgptAgent.text_ranking import tokenize
+
+FINGERPRINT_BITS = 64
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 8  # shorter texts are never treated as duplicates
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of ``text``, or None when it is too short to compare reliably."""
+    tokens = tokenize(text)
+    shingles = Counter(" ".join(tokens[i:i + SHINGLE_WORDS]) for i in range(len(tokens) - SHINGLE_WORDS + 1))
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    hashes = np.array([int.from_bytes(blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+                       for shingle in shingles], dtype=">u8")
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)  # most significant bit first
+    weights = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+    votes = weights @ (2 * bits.astype(np.int64) - 1)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def max_distance(similarity: float) -> int:
+    """Hamming distance equivalent to a minimum similarity (0.0-1.0)."""
+    return max(0, int((1.0 - similarity) * FINGERPRINT_BITS))
+
+
+class SimHashIndex:
+    """Fingerprints with keys, searchable for near-duplicates."""
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        bands = min(max_distance + 1, FINGERPRINT_BITS)
+        width = FINGERPRINT_BITS // bands
+        self._bands = [(i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width) for i in range(bands)]
+        self._tables: List[Dict[int, list]] = [{} for _ in self._bands]
+        self._entries: List[tuple] = []  # (fingerprint, key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_values(self, fingerprint: int):
+        for start, stop in self._bands:
+            yield (fingerprint >> (FINGERPRINT_BITS - stop)) & ((1 << (stop - start)) - 1)
+
+    def add(self, fingerprint: Optional[int], key) -> None:
+        if fingerprint is None:
+            return
+        entry = len(self._entries)
+        self._entries.append((fingerprint, key))
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            table.setdefault(value, []).append(entry)
+
+    def find(self, fingerprint: Optional[int], accept: Optional[Callable] = None):
+        """Key of a stored near-duplicate of ``fingerprint`` (the closest one), or None."""
+        if fingerprint is None:
+            return None
+        best, best_distance = None, self.max_distance + 1
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            for entry in table.get(value, ()):
+                stored, key = self._entries[entry]
+                distance = hamming(fingerprint, stored)
+                if distance < best_distance and (accept is None or accept(key)):
+                    best, best_distance = key, distance
+        return best
@@ -0,0 +1,60 @@
+"""
+Saturation detection for data collection.
+
+Each processed source is reduced to a set of word n-grams (stopwords removed,
+so rephrasings of the same facts still overlap). Its novelty is the share of
+those n-grams not seen in any earlier source. Once the recent average novelty
+drops below a threshold, further sources are unlikely to add information.
+"""
+
+from typing import List, Set
+
+from sgptAgent.text_ranking import tokenize
+
+
+def ngram_shingles(text: str, n: int = 2) -> Set[tuple]:
+    """Word n-grams of the content tokens of ``text``."""
+    tokens = tokenize(text)
+    if len(tokens) < n:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+
+class NoveltyTracker:
+    """Tracks marginal novelty per collected source and decides when collection is saturated."""
+
+    def __init__(self, threshold: float = 0.2, min_sources: int = 6, window: int = 5, n: int = 2):
+        """
+        :param threshold: Average novelty (0.0-1.0) over the window below which collection stops; 0 disables.
+        :param min_sources: Never report saturation before this many sources were processed.
+        :param window: Number of most recent sources averaged.
+        :param n: Shingle size in words.
+        """
+        self.threshold = threshold
+        self.min_sources = max(min_sources, 1)
+        self.window = max(window, 1)
+        self.n = n
+        self.seen: Set[tuple] = set()
+        self.history: List[float] = []
+
+    def add(self, text: str) -> float:
+        """Register a source and return its novelty against everything collected so far."""
+        shingles = ngram_shingles(text, self.n)
+        if not shingles:
+            novelty = 0.0
+        else:
+            novelty = len(shingles - self.seen) / len(shingles)
+            self.seen |= shingles
+        self.history.append(novelty)
+        return novelty
+
+    def recent_novelty(self) -> float:
+        """Average novelty of the last ``window`` sources (1.0 before any source is seen)."""
+        recent = self.history[-self.window:]
+        return sum(recent) / len(recent) if recent else 1.0
+
+    @property
+    def saturated(self) -> bool:
+        if self.threshold <= 0 or len(self.history) < max(self.min_sources, self.window):
+            return False
+        return self.recent_novelty() < self.threshold
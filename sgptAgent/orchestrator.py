@@ -1,19 +1,48 @@
 import asyncio
 import os
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
-from sgptAgent.agent import ResearchAgent
+from sgptAgent.agent import DEFAULT_MAX_TOKENS, ResearchAgent, SynthesisFailed
 from sgptAgent.config import cfg
 from sgptAgent.domain_agents import get_domain_agent
+from sgptAgent.embedding_cache import get_embedding_cache
+from sgptAgent.cancellation import CancellationToken, ResearchCancelled
+from sgptAgent.checkpoint import RunCheckpoint, checkpoint_root, prune_checkpoints
+from sgptAgent.novelty import NoveltyTracker
+from sgptAgent.run_metrics import RunMetrics
+from sgptAgent.stage_dag import StageGraph, Uncached, fingerprint
+from sgptAgent.stream_filter import clean_reasoning
+from sgptAgent.text_ranking import PassageIndex, estimate_tokens
+from sgptAgent.time_budget import TimeBudget
+from sgptAgent.llm_scheduler import max_llm_concurrency
+from sgptAgent.near_duplicates import SimHashIndex, max_distance, simhash
+import math
+import time
 import os
 
+# Plan lines containing any of these are internal reasoning, not plan steps
+PLAN_META_PHRASES = (
+    'let me', 'i need to', 'i will', 'i should', 'the user wants',
+    'based on this', 'given that', 'it seems like', 'i think',
+    'my approach', 'first i', 'then i', 'finally i',
+)
+
+# Seconds a query batch waits for a running local-index sync before searching the saved index
+LOCAL_INDEX_WAIT = 2.0
+
 class PlannerAgent(ResearchAgent):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
     async def run(self, goal: str, **kwargs) -> list:
         # Generate fewer, more focused queries for faster processing
-        plan = await self.plan(goal, **kwargs)
+        if self.time_budget:
+            try:
+                plan = await asyncio.wait_for(self.plan(goal, **kwargs), timeout=self.time_budget.cap(120, "planning"))
+            except asyncio.TimeoutError:
+                print("⏱ Planning exceeded its time budget, using fallback queries")
+                plan = ""
+        else:
+            plan = await self.plan(goal, **kwargs)
         
         # Limit to maximum 5 queries for performance
         if len(plan) > 5:
@@ -25,10 +54,10 @@ class PlannerAgent(ResearchAgent):
 class DataCollectorAgent(ResearchAgent):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.page_fingerprints = None  # SimHashIndex of the pages fetched in the current run
 
     async def run(self, queries: list, multimodal_agent, vision_agent, **kwargs) -> tuple:
         import asyncio
-        from concurrent.futures import ThreadPoolExecutor
         
         results = []
         total_results_found = 0
@@ -49,7 +78,7 @@ class DataCollectorAgent(ResearchAgent):
             max_concurrent_queries = min(2, len(queries))
             max_concurrent_urls = 3
             max_results_per_query = 5
-            url_timeout = 60.0
+            url_timeout = 120.0  # Long pages are summarized map-reduce style in deep mode
             print("🔍 Deep mode: Prioritizing comprehensive content extraction")
         else:  # balanced
             max_concurrent_queries = min(3, len(queries))
@@ -60,53 +89,124 @@ class DataCollectorAgent(ResearchAgent):
         
         print(f"Processing {len(queries)} queries with {max_concurrent_queries} concurrent searches...")
         
+        # Stop scheduling fetches once recent sources stop adding new information
+        novelty_threshold = kwargs.get('novelty_threshold')
+        if novelty_threshold is None:
+            novelty_threshold = cfg.get("NOVELTY_THRESHOLD")
+        novelty = NoveltyTracker(
+            threshold=float(novelty_threshold),
+            min_sources=int(kwargs.get('min_sources') or cfg.get("NOVELTY_MIN_SOURCES")),
+            window=int(cfg.get("NOVELTY_WINDOW")),
+        )
+        # Syndicated and mirrored copies of a page are dropped before they are summarized
+        dedup_similarity = float(cfg.get("NEAR_DUPLICATE_SIMILARITY"))
+        self.page_fingerprints = SimHashIndex(max_distance(dedup_similarity)) if dedup_similarity > 0 else None
+        # Local documents are a second source: their saved index is searched while it is synced in the background
+        local_folder = self._local_docs_folder(kwargs.get('local_docs_path'), kwargs.get('documents_base_dir'))
+        local_index_task = asyncio.create_task(asyncio.to_thread(self.open_local_documents, local_folder)) if local_folder else None
+        local_top_k = int(cfg.get("LOCAL_DOCS_TOP_K"))
+        skip_web_similarity = float(cfg.get("LOCAL_DOCS_SKIP_WEB_SIMILARITY"))
+        local_chunks_seen = set()
+        stop_reason = None
+        budget = self.time_budget
+        if budget:
+            print(f"⏱ Time budget: {budget.remaining_in('collection'):.0f}s for data collection, {budget.remaining():.0f}s in total")
+        
         # Process queries in parallel batches
         query_batches = [queries[i:i + max_concurrent_queries] for i in range(0, len(queries), max_concurrent_queries)]
         
-        for batch in query_batches:
+        for batch_index, batch in enumerate(query_batches):
+            # Queued work is reported as abandoned if the run is cancelled
+            self.cancel_token.set_pending("queries", sum(len(remaining) for remaining in query_batches[batch_index + 1:]))
+            
             # Search all queries in this batch concurrently
             search_tasks = []
             for query in batch:
                 task = asyncio.create_task(self._search_query_async(query, max_results_per_query))
                 search_tasks.append(task)
             
+            # Local retrieval runs while the web searches are in flight
+            local_hits = [[] for _ in batch]
+            web_skipped = set()
+            if local_index_task:
+                local_hits = await self._local_hits(batch, local_index_task, local_top_k)
+                if skip_web_similarity > 0:
+                    for i, hits in enumerate(local_hits):
+                        if hits and max(hit["similarity"] for hit in hits) >= skip_web_similarity:
+                            # The local corpus answers this query; its pages would not be fetched or summarized
+                            search_tasks[i].cancel()
+                            web_skipped.add(i)
+                            self.metrics.incr("local_docs.web_queries_skipped")
+                            print(f"[LOCAL DOCS] Skipping web search for '{batch[i]}': local match above {skip_web_similarity:.2f}")
+            
             # Wait for all searches in this batch to complete
             batch_search_results = await asyncio.gather(*search_tasks, return_exceptions=True)
             
-            # Collect all URLs from this batch
-            all_urls = []
+            # Collect all URLs from this batch, local chunks first; both go through the same fetch and summary batches.
+            # Web results keep their rank within their query so the URLs/query limit can still trim them later.
+            all_urls = []  # (rank, result)
             for i, search_result in enumerate(batch_search_results):
-                if isinstance(search_result, Exception):
+                if i in web_skipped or isinstance(search_result, asyncio.CancelledError):
+                    search_result = []
+                elif isinstance(search_result, Exception):
                     print(f"Search error for query '{batch[i]}': {search_result}")
-                    continue
+                    search_result = []
+                local_results = self._local_results(local_hits[i], local_chunks_seen)
+                search_result = search_result or []
                     
-                if search_result:
+                if local_results or search_result:
                     successful_queries += 1
-                    total_results_found += len(search_result)
-                    all_urls.extend(search_result)
+                    total_results_found += len(local_results) + len(search_result)
+                    all_urls.extend((0, result) for result in local_results)
+                    all_urls.extend(enumerate(search_result))
             
-            # Process URLs in parallel batches
+            # Process URLs in parallel batches, sliced as they go so schedule adjustments apply to the rest
             if all_urls:
-                url_batches = [all_urls[i:i + max_concurrent_urls] for i in range(0, len(all_urls), max_concurrent_urls)]
-                
-                for url_batch in url_batches:
-                    # Process URLs in this batch concurrently
-                    url_tasks = []
-                    for result in url_batch:
-                        task = asyncio.create_task(self._process_url_async(result, url_timeout))
-                        url_tasks.append(task)
-                    
-                    # Wait for all URL processing in this batch to complete
-                    batch_results = await asyncio.gather(*url_tasks, return_exceptions=True)
+                pending_urls = all_urls
+                while pending_urls:
+                    url_batch = [result for _, result in pending_urls[:max_concurrent_urls]]
+                    pending_urls = pending_urls[max_concurrent_urls:]
+                    self.cancel_token.set_pending("sources", len(url_batch) + len(pending_urls))
+                    # Hand over to the report stage if a typical batch no longer fits the collection window
+                    if budget and budget.remaining_in("collection") < max(5.0, 0.5 * budget.average("url_batch", 0.0)):
+                        stop_reason = f"time budget reached after {budget.elapsed():.0f}s"
+                    else:
+                        batch_started = time.monotonic()
+                        batch_results = await self._process_url_batch(url_batch, url_timeout, goal=kwargs.get('goal', ''), research_depth=research_depth)
+                        results.extend(batch_results)
+                        
+                        for processed_result in batch_results:
+                            novelty.add(processed_result.get("summary") or "")
+                        if novelty.saturated:
+                            stop_reason = f"recent novelty {novelty.recent_novelty():.2f} < {novelty.threshold:.2f}"
+                        elif budget:
+                            budget.record("url_batch", time.monotonic() - batch_started)
+                            remaining_queries = sum(len(remaining) for remaining in query_batches[batch_index + 1:])
+                            remaining_batches = math.ceil((len(pending_urls) + remaining_queries * max_results_per_query) / max_concurrent_urls)
+                            if budget.pressure("collection", remaining_batches * budget.average("url_batch")) > 1.0:
+                                # Behind schedule: fewer URLs per query, wider batches and shorter summaries.
+                                # Summaries are gated by the LLM slots, so batches wider than that gain nothing.
+                                max_results_per_query = max(1, max_results_per_query - 1)
+                                max_concurrent_urls = max(max_concurrent_urls, min(max_concurrent_urls + 2, max_llm_concurrency()))
+                                self.max_tokens = max(1024, (self.max_tokens or DEFAULT_MAX_TOKENS) * 3 // 4)
+                                pending_urls = [(rank, result) for rank, result in pending_urls if rank < max_results_per_query]
+                                print(f"⏱ Behind schedule: {max_results_per_query} URLs/query, {max_concurrent_urls} concurrent URLs, "
+                                      f"{self.max_tokens} summary tokens")
                     
-                    # Add successful results
-                    for processed_result in batch_results:
-                        if isinstance(processed_result, Exception):
-                            print(f"URL processing error: {processed_result}")
-                            continue
-                        if processed_result:
-                            results.append(processed_result)
+                    if stop_reason:
+                        skipped_urls = len(pending_urls)
+                        skipped_queries = sum(len(remaining) for remaining in query_batches[batch_index + 1:])
+                        self.metrics.incr("collector.sources_skipped", skipped_urls)
+                        self.metrics.incr("collector.queries_skipped", skipped_queries)
+                        print(f"🛑 Stopping collection ({stop_reason}) after {len(results)} sources; "
+                              f"skipping {skipped_urls} URLs and {skipped_queries} queries")
+                        break
+            
+            if stop_reason:
+                break
         
+        self.cancel_token.set_pending("queries", 0)
+        self.cancel_token.set_pending("sources", 0)
         print(f"Data collection complete: {len(results)} results from {successful_queries}/{total_queries} successful queries")
         return results, total_results_found, successful_queries, total_queries
     
@@ -115,38 +215,181 @@ class DataCollectorAgent(ResearchAgent):
         import asyncio
         loop = asyncio.get_event_loop()
         
-        # Run the synchronous web_search in a thread pool
-        with ThreadPoolExecutor(max_workers=1) as executor:
+        if self.checkpoint and query in self.checkpoint.searches:
+            return self.checkpoint.searches[query][:max_results]
+        
+        # Run the synchronous web_search in the loop's thread pool; unlike a per-call executor,
+        # a cancelled run does not block on shutting it down while the search finishes
+        with self.cancel_token.track("searches"):
             try:
-                search_results = await loop.run_in_executor(executor, self.web_search, query)
+                search_results = await loop.run_in_executor(None, self.web_search, query)
+                if self.checkpoint and search_results:
+                    self.checkpoint.record_search(query, search_results)
                 return search_results[:max_results]  # Limit results per query
             except Exception as e:
                 print(f"Search error for '{query}': {e}")
                 return []
     
-    async def _process_url_async(self, result: dict, timeout: float = 45.0) -> dict:
-        """Process a single URL result asynchronously with smart content strategy"""
+    async def _process_url_batch(self, url_batch: list, timeout: float, goal: str = "", research_depth: str = "balanced") -> list:
+        """
+        Fetch a batch of URLs concurrently, then summarize them: short pages are packed into
+        shared LLM calls, everything else is summarized individually. Sources completed by an
+        earlier attempt of a resumed run are reused from the checkpoint and come first.
+        """
+        resumed = []
+        if self.checkpoint:
+            resumed = [self.checkpoint.get_result(result.get('href', '')) for result in url_batch]
+            resumed = [result for result in resumed if result]
+            if resumed:
+                self.metrics.incr("checkpoint.sources_resumed", len(resumed))
+                print(f"↺ Reusing {len(resumed)} checkpointed sources")
+                done_urls = {result['href'] for result in resumed}
+                url_batch = [result for result in url_batch if result.get('href', '') not in done_urls]
+        if not url_batch:
+            return resumed
+
+        short_doc_tokens = int(cfg.get("SHORT_DOC_TOKENS"))
+        fetch_timeout = self._collection_timeout(timeout)
+
+        async def fetch(result):
+            url = result.get('href', '')
+            if 'content' in result:
+                return result['content']  # a local document chunk
+            if self.checkpoint and url in self.checkpoint.pages:
+                return self.checkpoint.pages[url]
+            print(f"Fetching full content from: {url[:60]}...")
+            try:
+                content = await asyncio.wait_for(self.fetch_page_text(url), timeout=fetch_timeout)
+            except (asyncio.TimeoutError, Exception) as e:
+                print(f"⚠ Fetch failed for {url[:40]}...: {e}")
+                return ""
+            if content and self.checkpoint:
+                self.checkpoint.record_page(url, content)
+            return content
+
+        contents = await asyncio.gather(*(fetch(result) for result in url_batch))
+        if self.page_fingerprints is not None:
+            # Fingerprinting long pages is CPU work; keep it off the event loop
+            fingerprints = await asyncio.gather(*(asyncio.to_thread(simhash, content) for content in contents))
+            kept = [i for i, (result, fingerprint) in enumerate(zip(url_batch, fingerprints))
+                    if not self._is_duplicate_page(result.get('href', ''), fingerprint)]
+            url_batch, contents = [url_batch[i] for i in kept], [contents[i] for i in kept]
+            if not url_batch:
+                return resumed
+
+        short_docs = [
+            {"id": i, "url": result.get('href', ''), "title": result.get('title', ''), "content": content}
+            for i, (result, content) in enumerate(zip(url_batch, contents))
+            if len(content.strip()) >= 100 and estimate_tokens(content) <= short_doc_tokens
+        ]
+        # Summaries must also finish inside the collection window
+        timeout = self._collection_timeout(timeout)
+        packed_summaries = {}
+        if len(short_docs) > 1:
+            print(f"Packing {len(short_docs)} short pages into batched summarization...")
+            try:
+                packed_summaries = await asyncio.wait_for(self.summarize_short_documents(short_docs, goal=goal), timeout=timeout)
+            except (asyncio.TimeoutError, Exception) as e:
+                print(f"⚠ Batched summarization failed, summarizing pages individually: {e}")
+
+        tasks = [
+            asyncio.create_task(self._process_url_async(result, timeout, content=contents[i], summary=packed_summaries.get(i), goal=goal, research_depth=research_depth))
+            for i, result in enumerate(url_batch)
+        ]
+        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        processed = list(resumed)
+        for processed_result in batch_results:
+            if isinstance(processed_result, Exception):
+                print(f"URL processing error: {processed_result}")
+                continue
+            if processed_result:
+                processed.append(processed_result)
+        return processed
+
+    @staticmethod
+    def _local_docs_folder(local_docs_path, documents_base_dir=None):
+        """Folder of ``local_docs_path``; a bare project name (as the GUI passes) is looked up in the documents directory."""
+        if not local_docs_path:
+            return None
+        candidates = [local_docs_path]
+        if documents_base_dir and not os.path.isabs(local_docs_path):
+            candidates.insert(0, os.path.join(documents_base_dir, local_docs_path))
+        for folder in candidates:
+            if os.path.isdir(folder):
+                return os.path.abspath(folder)
+        print(f"[LOCAL DOCS] Local documents path not found: {local_docs_path}")
+        return None
+
+    async def _local_hits(self, queries: list, index_task, top_k: int) -> list:
+        """
+        Local chunk hits for each query. A sync still running is waited on for ``LOCAL_INDEX_WAIT`` seconds at
+        most, then the saved index is searched as it is; empty lists if the sync or the search failed.
+        """
+        if not index_task.done():
+            await asyncio.wait({index_task}, timeout=LOCAL_INDEX_WAIT)
+        try:
+            if index_task.done():
+                index_task.result()
+            return await asyncio.to_thread(self.search_local_documents, queries, top_k)
+        except Exception as e:
+            print(f"[LOCAL DOCS] Local retrieval failed: {e}")
+            return [[] for _ in queries]
+
+    def _local_results(self, hits: list, seen: set) -> list:
+        """Search-result dicts for local chunk hits not already collected in this run; the chunk text is the page content."""
+        results = []
+        for hit in hits:
+            key = (hit["source"], hit["chunk_id"])
+            if key in seen:
+                continue
+            seen.add(key)
+            content = hit["content"]
+            results.append({
+                "title": f"{os.path.basename(hit['source'])} (part {hit['chunk_id'] + 1})",
+                "href": f"{Path(hit['source']).as_uri()}#chunk-{hit['chunk_id']}",
+                "snippet": content[:300],
+                "content": content,
+            })
+        if results:
+            self.metrics.incr("local_docs.chunks", len(results))
+        return results
+
+    def _is_duplicate_page(self, url: str, fingerprint) -> bool:
+        """Whether a page's SimHash matches a page fetched earlier in the run; new pages are remembered."""
+        original = self.page_fingerprints.find(fingerprint)
+        if original is not None:
+            self.metrics.incr("dedup.pages_dropped")
+            print(f"[DEDUP] Skipping {url[:60]}: near-duplicate of {original[:60]}")
+            return True
+        self.page_fingerprints.add(fingerprint, url)
+        return False
+
+    def _collection_timeout(self, timeout: float) -> float:
+        """Cap a per-URL timeout to what is left of the collection stage's time budget."""
+        return self.time_budget.cap(timeout, "collection") if self.time_budget else timeout
+
+    async def _process_url_async(self, result: dict, timeout: float = 45.0, content: str = "", summary: str = None, goal: str = "", research_depth: str = "balanced") -> dict:
+        """Summarize a single fetched URL result (unless a packed summary is given) with snippet fallbacks"""
         try:
             snippet = result.get('snippet', '')
             url = result.get('href', '')
             title = result.get('title', '')
             
-            # Smart content strategy: Always try to fetch full content for quality
-            # but with optimizations for speed
-            summary = None
-            
-            # Priority 1: Try to fetch full content with timeout
+            # Priority 1: Summarize the full content with timeout
+            succeeded = False
             try:
-                print(f"Fetching full content from: {url[:60]}...")
-                summary = await asyncio.wait_for(
-                    self.fetch_and_summarize_url(url, snippet),
-                    timeout=timeout  # Use configurable timeout
-                )
+                if summary is None:
+                    summary = await asyncio.wait_for(
+                        self.summarize_page_content(url, content, snippet, goal=goal, research_depth=research_depth),
+                        timeout=timeout  # Use configurable timeout
+                    )
                 
                 # Validate that we got meaningful content
                 if summary and len(summary.strip()) > 50 and not any(error in summary.lower() for error in 
                     ['error', 'unable to fetch', 'timeout', 'failed']):
                     print(f"✓ Successfully extracted content from {url[:40]}...")
+                    succeeded = True
                 else:
                     raise Exception("Content extraction failed or returned minimal content")
                     
@@ -165,13 +408,17 @@ Note: This summary is based on search result snippet due to content fetching lim
                     # Last resort: minimal information
                     summary = f"Limited information available from {url}. Title: {title}. Additional details could not be retrieved."
             
-            return {
+            processed_result = {
                 "title": title,
                 "href": url,
                 "snippet": snippet,
                 "summary": summary,
                 "images": []  # Skip image processing for speed
             }
+            # Only real summaries are checkpointed, so a resumed run retries snippet fallbacks
+            if succeeded and self.checkpoint:
+                self.checkpoint.record_result(processed_result)
+            return processed_result
         except Exception as e:
             print(f"Error processing URL {result.get('href', 'unknown')}: {e}")
             return {
@@ -197,17 +444,14 @@ class ReportGeneratorAgent(ResearchAgent):
                     web_results_md.append(f"- Image: {image['image_path']}")
                     web_results_md.append(f"  - Analysis: {image['analysis']}")
 
-        synthesis = await self.synthesize(summaries, goal, **kwargs)
-        reasoning = await self.generate_reasoning(synthesis, summaries, goal, **kwargs)
         self.sources = results # Set the sources for the report
-
-        structured_data = None
-        if kwargs.get("structured_data_prompt"):
-            # Copy kwargs to avoid modifying the original dict, which might be used elsewhere.
-            llm_kwargs = kwargs.copy()
-            prompt_text = llm_kwargs.pop("structured_data_prompt", None)
-            llm_kwargs.pop("progress_callback", None)  # Avoid passing non-serializable functions
-            structured_data = await self.extract_structured_data(summaries, structured_data_prompt=prompt_text, goal=goal, **llm_kwargs)
+        graph = self.build_report_stages(goal, summaries, **kwargs)
+        stages = await graph.run()
+        if graph.reused:
+            print(f"↺ Reused report stages with unchanged inputs: {', '.join(graph.reused)}")
+        synthesis = stages["synthesis"]
+        reasoning = stages["reasoning"]
+        structured_data = stages.get("structured_data")
 
         # Explicitly pass arguments to avoid TypeError
         return self.write_report(
@@ -225,6 +469,58 @@ class ReportGeneratorAgent(ResearchAgent):
             documents_base_dir=kwargs.get("documents_base_dir")
         )
 
+    def build_report_stages(self, goal: str, summaries: list, **kwargs) -> StageGraph:
+        """
+        Report stages and their dependencies. Only claim reasoning needs the synthesis; the
+        evidence index and structured-data extraction depend on the summaries alone and overlap with it.
+        Stage keys list the inputs besides other stages, so outputs checkpointed by an earlier run with
+        the same inputs are reused (see ``Orchestrator.run(..., rerender=run_id)``).
+        """
+        def stage_timeout(seconds):
+            # Evaluated when the stage starts, so it reflects the time budget left at that point
+            return lambda: self.time_budget.cap(seconds, "report", floor=15.0) if self.time_budget else seconds
+
+        graph = StageGraph(metrics=self.metrics, prefix="report", cache=self.checkpoint)
+        sources = fingerprint(summaries)
+        llm_options = {"model": self.model, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+        async def run_synthesis():
+            try:
+                return await self.synthesize(summaries, goal, **kwargs)
+            except SynthesisFailed as e:
+                # Shown in this report, but a re-render tries the synthesis again
+                return Uncached(str(e))
+
+        async def build_evidence_index():
+            return await asyncio.to_thread(PassageIndex, summaries)
+
+        async def run_reasoning(synthesis, evidence_index):
+            return await self.generate_reasoning(synthesis, summaries, goal, index=evidence_index, **kwargs)
+
+        graph.add("synthesis", run_synthesis, timeout=stage_timeout(900),
+                  fallback="Analysis timed out. Please try again with a simpler query or a different research depth setting.",
+                  key={"sources": sources, "goal": goal, "llm": llm_options,
+                       **{option: kwargs.get(option) for option in
+                          ("audience", "tone", "improvement", "research_depth", "hierarchical_synthesis")}})
+        graph.add("evidence_index", build_evidence_index, timeout=60, fallback=None,
+                  key={"sources": sources}, persist=False)
+        graph.add("reasoning", run_reasoning, deps=("synthesis", "evidence_index"), timeout=stage_timeout(600),
+                  fallback="Detailed claim-by-claim reasoning could not be completed in time.",
+                  key={"goal": goal, "llm": llm_options, "max_claims": kwargs.get("max_claims")})
+
+        if kwargs.get("structured_data_prompt"):
+            # Copy kwargs to avoid modifying the original dict, which might be used elsewhere.
+            llm_kwargs = kwargs.copy()
+            prompt_text = llm_kwargs.pop("structured_data_prompt", None)
+            llm_kwargs.pop("progress_callback", None)  # Avoid passing non-serializable functions
+
+            async def run_structured_data():
+                return await self.extract_structured_data(summaries, structured_data_prompt=prompt_text, goal=goal, **llm_kwargs)
+
+            graph.add("structured_data", run_structured_data, timeout=stage_timeout(300), fallback=None,
+                      key={"sources": sources, "goal": goal, "llm": llm_options, "prompt": prompt_text})
+        return graph
+
     async def extract_claims(self, synthesis: str, **kwargs) -> list:
         """Extracts key claims from the synthesis."""
         llm_kwargs = kwargs.copy()
@@ -232,12 +528,13 @@ class ReportGeneratorAgent(ResearchAgent):
         
         prompt = f"""**Your Task:**\nFrom the text below, extract the key claims being made. Each claim should be a single, complete sentence.\nPresent them as a simple bulleted list.\n\n**Text to Analyze:**\n---\n{synthesis}\n---\n\n**Key Claims (bulleted list):**\n"""
         
-        print("[REASONING DEBUG] About to extract claims with timeout=120s")
+        claims_timeout = self.time_budget.cap(120, "report", floor=10.0) if self.time_budget else 120  # 2 minute timeout for claims extraction
+        print(f"[REASONING DEBUG] About to extract claims with timeout={claims_timeout:.0f}s")
         import asyncio
         try:
             response = await asyncio.wait_for(
                 self.llm.chat(self.model, prompt, **llm_kwargs),
-                timeout=120  # 2 minute timeout for claims extraction
+                timeout=claims_timeout
             )
             print(f"[REASONING DEBUG] Claims extraction completed, response length: {len(response)}")
         except asyncio.TimeoutError:
@@ -247,56 +544,13 @@ class ReportGeneratorAgent(ResearchAgent):
         claims = [line.strip('*-• ') for line in response.split('\n') if line.strip('*-• ')]
         return claims
 
-    async def filter_summaries_for_claim(self, claim: str, summaries: list, **kwargs) -> list:
-        llm_kwargs = kwargs.copy()
-        llm_kwargs.pop("progress_callback", None)
-        
-        numbered_summaries = "\n".join([f"{i+1}. {summary}" for i, summary in enumerate(summaries)])
-
-        prompt = f'''**Your Task:** You are a keyword-based data filter. Your only job is to identify which of the following summaries contain the **exact names or subjects** from the claim.
+    def retrieve_evidence_for_claim(self, claim: str, index: PassageIndex, token_budget: int) -> list:
+        """Evidence passages for a claim from the BM25 index over summary passages (no LLM call)."""
+        return [f"(Source {doc_id + 1}) {passage}" for doc_id, passage, _ in index.select(claim, token_budget)]
 
-**Claim:**
----
-"{claim}"
----
-
-**Summaries to Evaluate:**
----
-{numbered_summaries}
----
-
-**Instructions:**
-1.  Identify the key nouns (people, teams, leagues) in the "Claim".
-2.  Read each summary and check if it **explicitly mentions** those exact key nouns.
-3.  Only select summaries that contain a direct mention of the subjects in the claim. Do not select summaries based on general topic similarity.
-4.  Respond with a comma-separated list of the numbers for the summaries that are a direct match.
-5.  If no summaries contain the exact key nouns, you **MUST** respond with the word "None".
-
-**Relevant Summary Numbers:**
-'''
-        print(f"[REASONING DEBUG] About to filter summaries for claim with timeout=90s")
-        try:
-            response = await asyncio.wait_for(
-                self.llm.chat(self.model, prompt, **llm_kwargs),
-                timeout=90  # 90 second timeout for summary filtering
-            )
-            print(f"[REASONING DEBUG] Summary filtering completed, response: {response[:100]}...")
-        except asyncio.TimeoutError:
-            print("[REASONING DEBUG] Summary filtering timed out")
-            return []
-        
-        if "none" in response.lower():
-            return []
-            
-        try:
-            relevant_indices = [int(i.strip()) - 1 for i in response.split(',') if i.strip().isdigit()]
-            relevant_summaries = [summaries[i] for i in relevant_indices if 0 <= i < len(summaries)]
-            return relevant_summaries
-        except (ValueError, IndexError):
-            return []
-
-    async def generate_reasoning_for_claim(self, claim: str, summaries: list, **kwargs) -> str:
+    async def generate_reasoning_for_claim(self, claim: str, summaries: list, timeout: float = 90, **kwargs) -> str:
         if not summaries:
+            self.metrics.incr("reasoning.claims_without_evidence")
             return "No direct evidence was found in the provided summaries to support this claim."
 
         llm_kwargs = kwargs.copy()
@@ -305,11 +559,11 @@ class ReportGeneratorAgent(ResearchAgent):
 
         prompt = f'''**Your Task:** Justify the following claim using ONLY the provided evidence.\n\n**Claim:**\n---\n{claim}\n---\n\n**Supporting Evidence:**\n---\n{combined_summaries}\n---\n\n**Instructions:**\n1.  Write a brief explanation of how the "Supporting Evidence" proves the "Claim".\n2.  If the evidence is not sufficient, state that clearly.\n3.  Do not invent information or discuss topics not present in the evidence.\n\n**Justification:**\n'''
         
-        print(f"[REASONING DEBUG] About to generate reasoning for claim with timeout=90s")
+        print(f"[REASONING DEBUG] About to generate reasoning for claim with timeout={timeout:.0f}s")
         try:
             result = await asyncio.wait_for(
                 self.llm.chat(self.model, prompt, **llm_kwargs),
-                timeout=90  # 90 second timeout for reasoning generation
+                timeout=timeout
             )
             print(f"[REASONING DEBUG] Reasoning generation completed, length: {len(result)}")
             return result
@@ -317,19 +571,52 @@ class ReportGeneratorAgent(ResearchAgent):
             print("[REASONING DEBUG] Reasoning generation timed out")
             return "Reasoning generation timed out for this claim. The evidence supports the claim but detailed justification could not be completed."
 
-    async def generate_reasoning(self, synthesis: str, summaries: list, goal: str, **kwargs) -> str:
+    async def generate_reasoning(self, synthesis: str, summaries: list, goal: str, index: PassageIndex = None, **kwargs) -> str:
+        budget = self.time_budget
+        if budget and budget.remaining() < 20:
+            print(f"⏱ Skipping claim reasoning: {budget.remaining():.0f}s left in the time budget")
+            return "Detailed claim-by-claim reasoning was skipped to finish within the requested time budget."
+
         claims = await self.extract_claims(synthesis, **kwargs)
         
         if not claims:
             return "Could not extract key claims from the synthesis to generate reasoning."
 
-        reasoning_parts = []
-        for i, claim in enumerate(claims):
-            relevant_summaries = await self.filter_summaries_for_claim(claim, summaries, **kwargs)
-            reasoning_for_claim = await self.generate_reasoning_for_claim(claim, relevant_summaries, **kwargs)
-            reasoning_parts.append(f"**Point {i+1}:** {claim}\n{reasoning_for_claim}")
-
-        return "\n\n".join(reasoning_parts)
+        # Claims are justified concurrently, so they complete in waves of the LLM concurrency limit
+        concurrency = max_llm_concurrency()
+        max_claims = int(kwargs.get('max_claims') or cfg.get("MAX_REASONING_CLAIMS"))
+        if budget:
+            # Keep as many waves as the remaining time allows, based on measured wave durations
+            affordable_waves = int((budget.remaining() - 5) // budget.average("claim_wave", 30.0))
+            max_claims = min(max_claims, max(1, affordable_waves) * concurrency)
+        if len(claims) > max_claims:
+            print(f"Reasoning about the first {max_claims} of {len(claims)} claims")
+            self.metrics.incr("reasoning.claims_skipped", len(claims) - max_claims)
+            claims = claims[:max_claims]
+
+        if index is None:
+            index = PassageIndex(summaries)
+        evidence_tokens = int(cfg.get("CLAIM_EVIDENCE_TOKENS"))
+        waves = math.ceil(len(claims) / concurrency)
+        # Later claims wait for an LLM slot, so the timeout covers every wave
+        timeout = 90 * waves
+        if budget:
+            timeout = budget.cap(timeout, "report", floor=15.0)
+
+        self.cancel_token.set_pending("claims", len(claims))
+        started = time.monotonic()
+        with self.metrics.timer("reasoning"):
+            justifications = await asyncio.gather(*(
+                self.generate_reasoning_for_claim(
+                    claim, self.retrieve_evidence_for_claim(claim, index, evidence_tokens), timeout=timeout, **kwargs)
+                for claim in claims
+            ))
+        self.cancel_token.set_pending("claims", 0)
+        self.metrics.incr("reasoning.claims", len(claims))
+        if budget:
+            budget.record("claim_wave", (time.monotonic() - started) / waves)
+
+        return "\n\n".join(f"**Point {i+1}:** {claim}\n{reasoning}" for i, (claim, reasoning) in enumerate(zip(claims, justifications)))
 
     async def extract_structured_data(self, summaries: list, structured_data_prompt: str, goal: str, **kwargs) -> str:
         llm_kwargs = kwargs.copy()
@@ -482,19 +769,120 @@ class Orchestrator:
         if mode == "vision":
             return self.vision_agent.run(goal, **kwargs)
 
+        # One metrics collector, cancellation token (and optional wall-clock budget) per run, shared by every agent
+        self.metrics = RunMetrics()
+        # The embedding cache is process-wide, so a run reports the change in its counters
+        self._embedding_cache_start = get_embedding_cache().stats()
+        # Popped so the token is never forwarded into LLM request payloads with the rest of kwargs
+        cancel_token = kwargs.pop('cancel_token', None) or CancellationToken()
+        time_budget = kwargs.get('time_budget')
+        self.time_budget = TimeBudget(float(time_budget)) if time_budget else None
+        for agent in (self.planner, self.data_collector, self.report_generator, self.vision_agent, self.multimodal_agent):
+            agent.metrics = self.metrics
+            agent.time_budget = self.time_budget
+            agent.cancel_token = cancel_token
+
         progress_callback = kwargs.get('progress_callback')
 
         def emit(desc, substep=None, percent=None, log=None):
             if progress_callback:
                 progress_callback(desc, '', substep, percent, log)
 
+        # The stages run in their own task so cancelling it never cancels the caller's task
+        handle = cancel_token.bind()
+        try:
+            stages = asyncio.ensure_future(self._run_stages(goal, emit, cancel_token, **kwargs))
+            cancel_token.register(stages)
+            try:
+                return await stages
+            except asyncio.CancelledError:
+                if not (cancel_token.cancelled and stages.cancelled()):
+                    raise
+            cancelled = ResearchCancelled(cancel_token.stage, cancel_token.abandoned)
+            self.metrics.incr("cancelled")
+            emit("🛑 Research cancelled", substep="Cancelled", percent=0, log=str(cancelled))
+            raise cancelled
+        finally:
+            cancel_token.unbind(handle)
+
+    def _record_embedding_cache(self) -> None:
+        stats = get_embedding_cache().stats()
+        for name in ("hits", "misses"):
+            delta = stats[name] - self._embedding_cache_start[name]
+            if delta:
+                self.metrics.incr(f"embedding_cache.{name}", delta)
+        self._embedding_cache_start = stats
+
+    async def _run_stages(self, goal: str, emit, cancel_token, **kwargs):
+        # Stage checkpoints let an interrupted run resume without refetching or resummarizing, and a
+        # finished run be re-rendered with new presentation options from its collected sources
+        rerender = kwargs.get('rerender')
+        resume = rerender or kwargs.get('resume')
+        root = checkpoint_root(kwargs.get('documents_base_dir'), kwargs.get('project_name'))
+        if resume and not RunCheckpoint.exists(root, resume):
+            raise ValueError(f"No checkpoint found for run id '{resume}' in {root}")
+        self.checkpoint = RunCheckpoint(root, resume or kwargs.get('run_id'))
+        prune_checkpoints(root, keep=int(cfg.get("CHECKPOINT_KEEP_RUNS")), max_age_days=float(cfg.get("CHECKPOINT_MAX_AGE_DAYS")),
+                          exclude=self.checkpoint.run_id)
+        if rerender and not self.checkpoint.collected:
+            raise ValueError(f"Run '{rerender}' did not finish collecting sources and cannot be re-rendered; resume it instead")
+        goal = goal or self.checkpoint.meta.get("goal", "")
+        self.checkpoint.save_meta(goal, kwargs)
+        for agent in (self.planner, self.data_collector, self.report_generator):
+            agent.checkpoint = self.checkpoint
+        emit(f"Run id: {self.checkpoint.run_id}", log=f"Checkpoints are written to {self.checkpoint.path}")
+
+        if self.checkpoint.collected:
+            # Planning and collection already finished in an earlier attempt
+            collected = self.checkpoint.collected
+            results = collected["results"]
+            total_results_found, successful_queries, total_queries = (
+                collected["total_results_found"], collected["successful_queries"], collected["total_queries"])
+            emit(f"{'Re-rendering' if rerender else 'Resuming'} run {self.checkpoint.run_id}", substep="Data Collection", percent=30,
+                 log=f"Reusing {len(results)} collected sources")
+        else:
+            results, total_results_found, successful_queries, total_queries = await self._collect(goal, emit, cancel_token, **kwargs)
+
+        cancel_token.stage = "report generation"
+        self._record_embedding_cache()
+        emit("Generating report...", substep="Report Generation", percent=80)
+        report_path = await self.report_generator.run(goal, results, **kwargs)
+        
+        summary_hit_rate = self.metrics.hit_rate("summary_cache")
+        if summary_hit_rate is not None:
+            emit(f"Summary cache hit rate: {summary_hit_rate * 100:.0f}%", log=f"Run statistics:\n{self.metrics.as_markdown()}")
+
+        if self.time_budget:
+            emit(f"Finished in {self.time_budget.elapsed():.0f}s of a {self.time_budget.total:.0f}s time budget")
+
+        emit("Research complete!", substep="Complete", percent=100)
+        return report_path, total_results_found, successful_queries, total_queries
+
+    async def _collect(self, goal: str, emit, cancel_token, **kwargs) -> tuple:
+        """Plan (unless the checkpoint has a plan) and collect sources; the result is checkpointed as a whole."""
+        cancel_token.stage = "planning"
+        if self.checkpoint.queries:
+            queries = self.checkpoint.queries
+            emit(f"Resuming run {self.checkpoint.run_id}", substep="Planning", percent=10,
+                 log=f"Reusing {len(queries)} planned queries, {len(self.checkpoint.results)} summarized sources")
+        else:
+            plan, queries = await self._plan_queries(goal, emit, **kwargs)
+            self.checkpoint.save_plan(plan, queries)
+        
+        cancel_token.stage = "data collection"
+        emit("Collecting data...", substep="Data Collection", percent=30)
+        collected = await self.data_collector.run(queries, multimodal_agent=self.multimodal_agent, vision_agent=self.vision_agent, goal=goal, **kwargs)
+        self.checkpoint.save_collected(*collected)
+        return collected
+    
+    async def _plan_queries(self, goal: str, emit, **kwargs) -> tuple:
+        """Run the planner and turn its bullet list into search queries; returns (plan, queries)."""
         emit("Planning...", substep="Planning", percent=10)
         plan = await self.planner.run(goal, **kwargs)
         
         # Debug: Show first 500 chars of plan to identify issues
         emit("Plan generated", log=f"Plan content (first 500 chars): {plan[:500]}...")
         
-        emit("Collecting data...", substep="Data Collection", percent=30)
         # The plan is a string of bullet points, so we need to parse it into a list of strings
         # Filter out explanatory text and only keep actual bullet points
         queries = []
@@ -531,59 +919,32 @@ class Orchestrator:
             queries = self.domain_agent.enhance_queries(queries, goal)
             emit(f"Enhanced {len(queries)} queries for {self.domain_agent.domain_name} domain", log=f"Enhanced queries: {queries[:3]}...")
         
-        results, total_results_found, successful_queries, total_queries = await self.data_collector.run(queries, multimodal_agent=self.multimodal_agent, vision_agent=self.vision_agent, **kwargs)
-
-        emit("Generating report...", substep="Report Generation", percent=80)
-        report_path = await self.report_generator.run(goal, results, **kwargs)
-        
-        emit("Research complete!", substep="Complete", percent=100)
-        return report_path, total_results_found, successful_queries, total_queries
+        return plan, queries
     
     def _clean_plan_from_reasoning_artifacts(self, plan: str) -> str:
         """Clean reasoning model artifacts like <think> tags and internal monologue from plan output."""
-        import re
-        
-        # Remove <think>...</think> blocks (including multiline)
-        plan = re.sub(r'<think>.*?</think>', '', plan, flags=re.DOTALL | re.IGNORECASE)
-        
-        # Remove other common reasoning artifacts
-        reasoning_patterns = [
-            r'<thinking>.*?</thinking>',  # <thinking> tags
-            r'<analysis>.*?</analysis>',  # <analysis> tags
-            r'<reasoning>.*?</reasoning>',  # <reasoning> tags
-            r'Let me think.*?(?=\n|$)',  # "Let me think..." lines
-            r'I need to.*?(?=\n|$)',  # "I need to..." lines
-            r'The user wants.*?(?=\n|$)',  # "The user wants..." lines
-            r'Okay,.*?(?=\n|$)',  # "Okay,..." lines
-            r'Based on.*?I will.*?(?=\n|$)',  # "Based on... I will..." lines
-        ]
-        
-        for pattern in reasoning_patterns:
-            plan = re.sub(pattern, '', plan, flags=re.DOTALL | re.IGNORECASE)
-        
-        # Clean up extra whitespace and empty lines
-        lines = [line.strip() for line in plan.split('\n')]
-        lines = [line for line in lines if line]  # Remove empty lines
+        original_length = len(plan)
+        # One pass drops <think>/<thinking>/<analysis>/<reasoning> blocks and monologue lines
+        plan = clean_reasoning(plan, strip_monologue="all", strip_citations=False)
         
         # Remove lines that are clearly reasoning/meta-commentary
         filtered_lines = []
-        for line in lines:
+        for line in plan.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
             line_lower = line.lower()
             # Skip lines that are clearly internal reasoning
-            if any(phrase in line_lower for phrase in [
-                'let me', 'i need to', 'i will', 'i should', 'the user wants',
-                'based on this', 'given that', 'it seems like', 'i think',
-                'my approach', 'first i', 'then i', 'finally i'
-            ]):
+            if any(phrase in line_lower for phrase in PLAN_META_PHRASES):
                 continue
             filtered_lines.append(line)
         
         cleaned_plan = '\n'.join(filtered_lines)
         
         # Debug output to show what was cleaned
-        if len(cleaned_plan) < len(plan) * 0.8:  # If we removed more than 20% of content
+        if len(cleaned_plan) < original_length * 0.8:  # If we removed more than 20% of content
             print(f"[PLAN CLEANING] Removed significant reasoning artifacts:")
-            print(f"[PLAN CLEANING] Original length: {len(plan)} chars")
+            print(f"[PLAN CLEANING] Original length: {original_length} chars")
             print(f"[PLAN CLEANING] Cleaned length: {len(cleaned_plan)} chars")
             print(f"[PLAN CLEANING] Cleaned plan preview: {cleaned_plan[:200]}...")
         
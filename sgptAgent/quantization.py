@@ -0,0 +1,63 @@
+"""
+Scalar-quantized storage for normalized embedding rows.
+
+A local index can keep its matrix in one of three precisions:
+
+- ``float32``: 4 bytes per dimension, exact.
+- ``float16``: 2 bytes per dimension; the rounding error is far below the gaps
+  between relevant and irrelevant cosine scores.
+- ``int8``: 1 byte per dimension plus one float32 scale per row. Each row is divided by
+  its own largest magnitude and rounded to [-127, 127], so rows with small components
+  keep their resolution.
+
+``QuantizedMatrix`` gives read access to the stored codes (usually memory-mapped) and
+returns float32 rows, so ``local_index.top_k`` and the ANN searchers scan it as they
+would a float32 matrix while only the compact codes are paged in. Ranking errors near
+the cut-off can be repaired by rescoring the top candidates against float32 copies of
+their rows.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+SUFFIXES = {"float32": "f32", "float16": "f16", "int8": "i8"}
+
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Codes for float32 ``vectors`` in ``precision``, with per-row scales for int8 (None otherwise)."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'; expected one of {', '.join(PRECISIONS)}")
+    if precision != "int8":
+        return vectors.astype(DTYPES[precision]), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """Read-only rows of stored codes, returned as float32."""
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, rows) -> np.ndarray:
+        values = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            values *= np.asarray(self.scales[rows], dtype=np.float32)[..., None]
+        return values
@@ -0,0 +1,76 @@
+"""
+Lightweight per-run metrics (counters and stage timings) that are shared by the
+orchestrator's agents and rendered into the research report.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class RunMetrics:
+    """Collects counters and timings for a single research run."""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.monotonic()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Increment a named counter."""
+        self.counters[name] += amount
+
+    def record_time(self, name: str, seconds: float) -> None:
+        """Record one duration sample (in seconds) for a named stage."""
+        self.timings[name].append(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Context manager that records the wall time of the enclosed block."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_time(name, time.monotonic() - start)
+
+    def hit_rate(self, prefix: str) -> Optional[float]:
+        """Return the hit rate of a cache tracked as '<prefix>.hits' / '<prefix>.misses'."""
+        hits = self.counters.get(f"{prefix}.hits", 0)
+        misses = self.counters.get(f"{prefix}.misses", 0)
+        if hits + misses == 0:
+            return None
+        return hits / (hits + misses)
+
+    def elapsed(self) -> float:
+        """Seconds since the run started."""
+        return time.monotonic() - self.started
+
+    def as_markdown(self) -> str:
+        """Render the collected metrics as a Markdown bullet list for the report."""
+        lines = [f"- Total Run Time: {self.elapsed():.1f}s"]
+
+        cache_prefixes = sorted({name.rsplit('.', 1)[0] for name in self.counters
+                                 if name.endswith('.hits') or name.endswith('.misses')})
+        for prefix in cache_prefixes:
+            hits = self.counters.get(f"{prefix}.hits", 0)
+            lookups = hits + self.counters.get(f"{prefix}.misses", 0)
+            label = prefix.replace('_', ' ').title()
+            lines.append(f"- {label}: {hits}/{lookups} hits ({self.hit_rate(prefix) * 100:.0f}%)")
+
+        for name in sorted(self.counters):
+            if name.rsplit('.', 1)[0] in cache_prefixes:
+                continue
+            label = name.replace('_', ' ').replace('.', ' ').title()
+            lines.append(f"- {label}: {self.counters[name]}")
+
+        for name in sorted(self.timings):
+            samples = self.timings[name]
+            label = name.replace('_', ' ').replace('.', ' ').title()
+            if len(samples) == 1:
+                lines.append(f"- {label}: {samples[0]:.1f}s")
+            else:
+                lines.append(f"- {label}: {sum(samples):.1f}s total over {len(samples)} calls "
+                             f"(avg {sum(samples) / len(samples):.2f}s)")
+
+        return "\n".join(lines)
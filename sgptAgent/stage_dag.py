@@ -0,0 +1,181 @@
+"""
+Minimal DAG executor for pipeline stages.
+
+Each stage is an async callable that receives the results of the stages it depends
+on as keyword arguments. All stages start at once and wait only for their own
+dependencies, so independent stages overlap. Every stage can have a timeout and a
+fallback result used when it times out or fails; wall time per stage is recorded.
+
+A stage may declare the inputs it depends on besides other stages (``key``). Its
+fingerprint hashes that key together with the fingerprints of its dependencies, so
+a change anywhere upstream changes it. With a cache attached, a stage whose
+fingerprint matches a stored output is not run again. A stage that produced only a
+degraded result (an error message, say) returns it wrapped in ``Uncached``: the result
+is used by this run but not stored, so the next run retries the stage. Results of stages
+that depend on an uncached result or on a fallback are not stored either.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sgptAgent.run_metrics import RunMetrics
+
+_NO_FALLBACK = object()
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of JSON-like values."""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+class StageFailed(Exception):
+    """A stage without a fallback raised or timed out."""
+
+
+class Uncached:
+    """Wraps a stage result that this run uses but that must not be reused from the cache."""
+
+    def __init__(self, output):
+        self.output = output
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable, deps: Iterable[str] = (), timeout=None, fallback=_NO_FALLBACK,
+                 key=None, persist: bool = True, dep_fingerprints: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+        # Without a key the stage's inputs are unknown, so its output is never reused
+        self.cacheable = key is not None and persist
+        self.fingerprint = fingerprint(name, key, *dep_fingerprints)
+
+
+class StageGraph:
+    """Runs stages with maximum overlap subject to their declared dependencies."""
+
+    def __init__(self, metrics: Optional[RunMetrics] = None, prefix: str = "stage", cache=None):
+        """
+        :param cache: Optional store with ``get_stage(name, fingerprint) -> (hit, output)`` and
+                      ``record_stage(name, fingerprint, output)``, e.g. a RunCheckpoint.
+        """
+        self.stages: Dict[str, Stage] = {}
+        self.metrics = metrics
+        self.prefix = prefix
+        self.cache = cache
+        self.timings: Dict[str, float] = {}
+        self.reused: List[str] = []
+        self._uncached: set = set()  # stages whose result must not be stored, nor those built on it
+
+    def add(self, name: str, func: Callable, deps: Iterable[str] = (), timeout=None, fallback=_NO_FALLBACK,
+            key=None, persist: bool = True) -> None:
+        """
+        Register a stage. Dependencies must already be registered, which keeps the graph acyclic.
+
+        :param func: Async callable invoked as ``func(**{dep: result})``.
+        :param timeout: Seconds, or a callable returning seconds evaluated when the stage starts
+                        (so it can depend on a time budget); None means no limit.
+        :param fallback: Result used if the stage times out or raises; without one the run fails.
+        :param key: JSON-like description of the stage's other inputs (options, data hashes).
+        :param persist: Whether the output may be cached (it must then be JSON-serializable).
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered")
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {', '.join(missing)}")
+        dep_fingerprints = [self.stages[dep].fingerprint for dep in deps]
+        self.stages[name] = Stage(name, func, deps, timeout, fallback, key, persist, dep_fingerprints)
+
+    def stale(self) -> List[str]:
+        """Names of the stages that would run, i.e. that have no cached output for their current inputs."""
+        if not self.cache:
+            return list(self.stages)
+        return [name for name, stage in self.stages.items()
+                if not (stage.cacheable and self.cache.get_stage(name, stage.fingerprint)[0])]
+
+    async def _run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Task]) -> Any:
+        if self.cache and stage.cacheable:
+            hit, output = self.cache.get_stage(stage.name, stage.fingerprint)
+            if hit:
+                # Cached outputs do not need their dependencies' results
+                self.reused.append(stage.name)
+                self._count(stage, "reused")
+                return output
+        inputs = {dep: await tasks[dep] for dep in stage.deps}
+        timeout = stage.timeout() if callable(stage.timeout) else stage.timeout
+        started = time.monotonic()
+        try:
+            output = await asyncio.wait_for(stage.func(**inputs), timeout=timeout)
+            if isinstance(output, Uncached) or self._uncached.intersection(stage.deps):
+                self._uncached.add(stage.name)
+                self._count(stage, "uncached")
+                return output.output if isinstance(output, Uncached) else output
+            if self.cache and stage.cacheable:
+                self.cache.record_stage(stage.name, stage.fingerprint, output)
+            return output
+        except asyncio.TimeoutError:
+            print(f"[STAGE] {stage.name} timed out after {timeout:.0f}s")
+            self._count(stage, "timeouts")
+            if stage.fallback is _NO_FALLBACK:
+                raise StageFailed(f"Stage '{stage.name}' timed out after {timeout:.0f}s") from None
+            self._uncached.add(stage.name)
+            return stage.fallback
+        except Exception as e:
+            print(f"[STAGE] {stage.name} failed: {e}")
+            self._count(stage, "failures")
+            if stage.fallback is _NO_FALLBACK:
+                raise StageFailed(f"Stage '{stage.name}' failed: {e}") from e
+            self._uncached.add(stage.name)
+            return stage.fallback
+        finally:
+            elapsed = time.monotonic() - started
+            self.timings[stage.name] = elapsed
+            if self.metrics:
+                self.metrics.record_time(f"{self.prefix}.{stage.name}", elapsed)
+
+    def _count(self, stage: Stage, what: str) -> None:
+        if self.metrics:
+            self.metrics.incr(f"{self.prefix}.{stage.name}.{what}")
+
+    def _needed(self) -> List[str]:
+        """
+        Stages worth running: every stage whose output is kept (cached or final), plus the inputs of
+        stages that actually run. Intermediate results that are not cached are skipped when nothing needs them.
+        """
+        stale = set(self.stale())
+        dependents = {dep for stage in self.stages.values() for dep in stage.deps}
+        needed = set()
+
+        def need(name):
+            if name in needed:
+                return
+            needed.add(name)
+            if name in stale:
+                for dep in self.stages[name].deps:
+                    need(dep)
+
+        for name, stage in self.stages.items():
+            if stage.cacheable or name not in dependents:
+                need(name)
+        return [name for name in self.stages if name in needed]
+
+    async def run(self) -> Dict[str, Any]:
+        """Run the stages and return {stage name: result}; stages nothing needs are skipped and map to None."""
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self._needed():
+            tasks[name] = asyncio.ensure_future(self._run_stage(self.stages[name], tasks))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        finally:
+            # A failed stage must not leave its siblings running
+            for task in tasks.values():
+                task.cancel()
+        outputs = dict.fromkeys(self.stages)
+        outputs.update(zip(tasks.keys(), results))
+        return outputs
@@ -0,0 +1,173 @@
+"""
+Incremental cleanup of LLM output.
+
+``ReasoningFilter`` consumes a response chunk by chunk (as streamed by Ollama) and
+returns the text that is safe to show so far. It drops ``<think>``-style reasoning
+spans as they arrive, suppresses the monologue lines reasoning models open with
+("Okay, the user wants..."), and strips fabricated citations such as
+``[Source 3]``. Every character is examined a bounded number of times, so cleaning a
+finished response with ``clean_reasoning`` is a single linear pass.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+REASONING_TAGS = ("think", "thinking", "analysis", "reasoning")
+
+# Lines reasoning models open with before the actual answer
+_MONOLOGUE_RE = re.compile(
+    r"\s*(?:okay\b|ok,|alright\b|hmm\b|wait,|let me\b|let's see\b|i need to\b|i will\b|i'll\b|i should\b"
+    r"|i think\b|the user\b|so,? the user\b|first,? i\b|to answer\b|here (?:are|is)\b.*:\s*$|based on .*\bi will\b)",
+    re.IGNORECASE)
+
+# Citation formats LLMs invent when the prompt has no numbered sources
+_CITATION_RE = re.compile(
+    r"\(Source: \[[^\]\n]*\]\)"        # (Source: [Something])
+    r"|\[[^\[\]\n]*? Source\]"          # [Print Shop Source]
+    r"|\([^()\n]*? Source\)"            # (Print Shop Source)
+    r"|Source: [^.\n]*"                 # Source: Something
+    r"|According to \[[^\]\n]*\]"       # According to [Source]
+    r"|\[Source \d+\]"                  # [Source 1]
+    r"|\(Ref: [^)\n]*\)"                # (Ref: Something)
+    r"|\[Ref \d+\]",                    # [Ref 1]
+    re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"[ \t]+([.,])")
+_DOUBLE_PERIOD_RE = re.compile(r"\.[ \t]*\.")
+_SENTENCE_END_RE = re.compile(r"[.!?][ \t]")
+
+
+class ReasoningFilter:
+    """Streaming filter for reasoning tags, monologue preambles and fake citations."""
+
+    def __init__(self, strip_monologue: Optional[str] = "preamble", strip_citations: bool = True,
+                 tags=REASONING_TAGS):
+        """
+        :param strip_monologue: "preamble" drops monologue lines before the first real line,
+                                "all" drops them anywhere (for plans and lists), None keeps them.
+        :param strip_citations: Remove fabricated citation markers.
+        :param tags: Names of the tags whose content is dropped.
+        """
+        self.strip_monologue = strip_monologue
+        self.strip_citations = strip_citations
+        self._closers = {f"<{tag}>": f"</{tag}>" for tag in tags}
+        self._tags = list(self._closers) + list(self._closers.values())
+        self._max_tag = max((len(tag) for tag in self._tags), default=0)
+        self._pending = ""   # raw text that may still be the start of a tag
+        self._inside = None  # closing tag of the reasoning span being dropped
+        self._line = ""      # tag-free text of the current, unfinished line
+        self._preamble = strip_monologue is not None
+        self.removed_citations: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of model output and return the cleaned text that can be emitted now."""
+        self._pending += chunk
+        return self._emit_lines(self._strip_tags(final=False), final=False)
+
+    def flush(self) -> str:
+        """Return whatever is left once the stream has ended."""
+        return self._emit_lines(self._strip_tags(final=True), final=True)
+
+    def _strip_tags(self, final: bool) -> str:
+        out = []
+        pending = self._pending
+        while pending:
+            if self._inside:
+                end = pending.lower().find(self._inside)
+                if end == -1:
+                    # Keep only what could be the start of the closing tag
+                    pending = "" if final else pending[-(len(self._inside) - 1):]
+                    break
+                pending = pending[end + len(self._inside):]
+                self._inside = None
+                continue
+            start = pending.find("<")
+            if start == -1:
+                out.append(pending)
+                pending = ""
+                break
+            out.append(pending[:start])
+            rest = pending[start:start + self._max_tag].lower()
+            tag = next((tag for tag in self._tags if rest.startswith(tag)), None)
+            if tag:
+                # An opening tag starts a dropped span; a stray closing tag is just removed
+                self._inside = self._closers.get(tag)
+                pending = pending[start + len(tag):]
+            elif not final and len(pending) - start < self._max_tag and any(t.startswith(rest) for t in self._tags):
+                pending = pending[start:]  # incomplete tag, wait for more text
+                break
+            else:
+                out.append("<")
+                pending = pending[start + 1:]
+        self._pending = pending
+        return "".join(out)
+
+    def _emit_lines(self, text: str, final: bool) -> str:
+        self._line += text
+        out = []
+        *lines, self._line = self._line.split("\n")
+        for line in lines:
+            cleaned = self._clean_line(line)
+            if cleaned is not None:
+                out.append(cleaned + "\n")
+        if final:
+            if self._line:
+                cleaned = self._clean_line(self._line)
+                if cleaned is not None:
+                    out.append(cleaned)
+            self._line = ""
+        elif not self._preamble and self.strip_monologue != "all":
+            # Inside a long paragraph, emit complete sentences without waiting for the newline
+            ends = list(_SENTENCE_END_RE.finditer(self._line))
+            if ends:
+                cut = ends[-1].end()
+                out.append(self._clean_sentences(self._line[:cut]))
+                self._line = self._line[cut:]
+        return "".join(out)
+
+    def _clean_line(self, line: str) -> Optional[str]:
+        if self._preamble or self.strip_monologue == "all":
+            if not line.strip() and self._preamble:
+                return None
+            if _MONOLOGUE_RE.match(line):
+                return None
+            self._preamble = False
+        return self._clean_sentences(line)
+
+    def _clean_sentences(self, text: str) -> str:
+        # Sentences are cleaned one at a time, so the result does not depend on how the stream was chunked
+        if not self.strip_citations:
+            return text
+        out = []
+        start = 0
+        for end in _SENTENCE_END_RE.finditer(text):
+            out.append(self._clean_sentence(text[start:end.end()]))
+            start = end.end()
+        out.append(self._clean_sentence(text[start:]))
+        return "".join(out)
+
+    def _clean_sentence(self, text: str) -> str:
+        removed = _CITATION_RE.findall(text)
+        if not removed:
+            return text
+        self.removed_citations.extend(removed)
+        cleaned = _CITATION_RE.sub("", text)
+        if not cleaned.strip(" \t.,"):
+            return ""  # the sentence was nothing but a citation
+        # Tidy the spacing and punctuation the removed markers leave behind
+        cleaned = _SPACES_RE.sub(" ", cleaned)
+        cleaned = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", cleaned)
+        return _DOUBLE_PERIOD_RE.sub(".", cleaned)
+
+
+def clean_reasoning(text: str, **options) -> str:
+    """Clean a complete response in one pass; ``options`` are those of ``ReasoningFilter``."""
+    reasoning_filter = ReasoningFilter(**options)
+    return reasoning_filter.feed(text or "") + reasoning_filter.flush()
+
+
+def strip_fake_citations(text: str) -> Tuple[str, List[str]]:
+    """Remove fabricated citation markers; returns the cleaned text and the markers removed."""
+    reasoning_filter = ReasoningFilter(strip_monologue=None, tags=())
+    cleaned = reasoning_filter.feed(text or "") + reasoning_filter.flush()
+    return cleaned, reasoning_filter.removed_citations
@@ -0,0 +1,84 @@
+"""
+On-disk store for LLM page summaries.
+
+Entries are keyed by a hash of the extracted page text, the summarization prompt
+version, the audience/tone/improvement context and the model, so a changed page
+or prompt misses the cache naturally while an unchanged page is served from disk.
+"""
+
+import json
+import os
+from hashlib import sha256
+from pathlib import Path
+from typing import Optional
+
+from sgptAgent.config import cfg
+
+
+class SummaryCache:
+    """File-backed key/value store for page summaries."""
+
+    def __init__(self, cache_path: Path, length: int) -> None:
+        """
+        :param cache_path: Directory where summaries are stored, one file per entry.
+        :param length: Maximum number of summaries to keep on disk.
+        """
+        self.cache_path = Path(cache_path)
+        self.length = length
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self._writes = 0
+
+    @staticmethod
+    def make_key(text: str, prompt_version: str, context: str, model: str) -> str:
+        """Build the cache key for a summary of ``text``."""
+        text_hash = sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+        payload = json.dumps([text_hash, prompt_version, context, model])
+        return sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached summary for ``key`` or None on a miss."""
+        file = self.cache_path / key
+        try:
+            return json.loads(file.read_text(encoding="utf-8"))["summary"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, summary: str) -> None:
+        """Store ``summary`` under ``key``; writes are atomic so concurrent runs never see partial files."""
+        file = self.cache_path / key
+        tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_file.write_text(json.dumps({"summary": summary}), encoding="utf-8")
+            os.replace(tmp_file, file)
+        except OSError as e:
+            print(f"[SUMMARY CACHE] Could not write cache entry: {e}")
+            return
+        self._writes += 1
+        # Pruning scans the directory, so only do it every few writes.
+        if self._writes % 50 == 0:
+            self._delete_oldest_files()
+
+    def _delete_oldest_files(self) -> None:
+        files = []
+        for file in self.cache_path.glob("*"):
+            try:
+                files.append((file.stat().st_mtime, file))
+            except OSError:
+                continue  # Removed by a concurrent writer.
+        files.sort()
+        for _, file in files[:max(0, len(files) - self.length)]:
+            try:
+                file.unlink()
+            except OSError:
+                pass
+
+
+_summary_cache = None
+
+
+def get_summary_cache() -> SummaryCache:
+    """Return the process-wide summary cache configured from ``cfg``."""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SummaryCache(Path(cfg.get("SUMMARY_CACHE_PATH")), int(cfg.get("SUMMARY_CACHE_LENGTH")))
+    return _summary_cache
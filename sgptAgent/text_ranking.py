@@ -0,0 +1,181 @@
+"""
+Cheap lexical ranking helpers (tokenization, token estimates, passage splitting
+and BM25) used to decide which parts of a document are worth sending to the LLM.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can did do does doing down during each few for from further had has have having he her here hers him his
+how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out
+over own same she should so some such than that the their theirs them then there these they this those through
+to too under until up very was we were what when where which while who whom why will with you your yours
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences on terminal punctuation."""
+    return [sentence.strip() for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+
+
+def split_passages(text: str, target_chars: int = 600) -> List[str]:
+    """
+    Split text into passages of roughly ``target_chars`` characters.
+    Paragraph breaks are respected where present; extracted web text usually has none,
+    so sentences are grouped until the target size is reached.
+    """
+    passages = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= target_chars:
+            passages.append(paragraph)
+            continue
+        current = ""
+        for sentence in split_sentences(paragraph):
+            if current and len(current) + len(sentence) + 1 > target_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+            # A single run-on "sentence" (tables, lists) is hard-wrapped
+            while len(current) > target_chars * 2:
+                passages.append(current[:target_chars])
+                current = current[target_chars:]
+        if current:
+            passages.append(current)
+    return passages
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory collection of tokenized documents."""
+
+    def __init__(self, documents: Iterable[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokens) for tokens in documents]
+        self.doc_lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(self.term_freqs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def scores(self, query_tokens: List[str]) -> List[float]:
+        """Return one BM25 score per document for the given query tokens."""
+        query_terms = [term for term in set(query_tokens) if term in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.doc_lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+
+def rank_passages(passages: List[str], query: str) -> List[int]:
+    """
+    Return passage indices ordered from most to least relevant to ``query``.
+    Ties (including all-zero scores) fall back to document order, i.e. the lead of the page.
+    """
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return list(range(len(passages)))
+    scores = BM25(tokenize(passage) for passage in passages).scores(query_tokens)
+    return sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+
+
+def select_passages(text: str, query: str, token_budget: int, passage_chars: int = 600) -> str:
+    """
+    Keep only the passages of ``text`` that best match ``query`` within ``token_budget``.
+    Selected passages are returned in document order so the LLM sees a coherent excerpt;
+    text that already fits the budget is returned unchanged.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    passages = split_passages(text, passage_chars)
+    if not passages or not tokenize(query):
+        return text[:token_budget * 4]
+
+    ranked = rank_passages(passages, query)
+
+    selected, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(passages[i])
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+    if not selected:
+        return passages[ranked[0]][:token_budget * 4]
+    return "\n\n".join(passages[i] for i in sorted(selected))
+
+
+def select_sentences(text: str, query: str, token_budget: int) -> str:
+    """
+    Keep the sentences of ``text`` that best match ``query`` within ``token_budget``, in document order.
+    Unlike ``select_passages`` this never cuts inside a sentence; returns "" if no sentence fits.
+    """
+    sentences = split_sentences(text)
+    selected, used = [], 0
+    for i in rank_passages(sentences, query):
+        cost = estimate_tokens(sentences[i])
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+    return " ".join(sentences[i] for i in sorted(selected))
+
+
+class PassageIndex:
+    """BM25 index over the passages of several documents, remembering which document each passage came from."""
+
+    def __init__(self, documents: List[str], passage_chars: int = 600):
+        self.passages: List[str] = []
+        self.doc_ids: List[int] = []
+        for doc_id, document in enumerate(documents):
+            for passage in split_passages(document or "", passage_chars):
+                self.passages.append(passage)
+                self.doc_ids.append(doc_id)
+        self.bm25 = BM25(tokenize(passage) for passage in self.passages)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, str, float]]:
+        """Top ``k`` passages matching ``query`` as (document id, passage, score); unmatched passages are left out."""
+        query_tokens = tokenize(query)
+        if not query_tokens or not self.passages:
+            return []
+        scores = self.bm25.scores(query_tokens)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: (-scores[i], i))
+        return [(self.doc_ids[i], self.passages[i], scores[i]) for i in ranked[:k]]
+
+    def select(self, query: str, token_budget: int, k: int = 8) -> List[Tuple[int, str, float]]:
+        """Like ``search``, but stops adding passages once ``token_budget`` is used up."""
+        selected, used = [], 0
+        for hit in self.search(query, k):
+            cost = estimate_tokens(hit[1])
+            if used + cost > token_budget:
+                continue
+            selected.append(hit)
+            used += cost
+        return selected
@@ -0,0 +1,61 @@
+"""
+Wall-clock budget for a research run.
+
+The total budget is split into consecutive stage windows (planning, collection,
+report). Agents ask how much of their window is left to cap timeouts and scale
+down work, and record measured durations so the remaining work can be projected.
+"""
+
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Share of the total budget available to each stage, in execution order
+STAGE_SHARES = (("planning", 0.10), ("collection", 0.55), ("report", 0.35))
+
+
+class TimeBudget:
+    """Tracks a run's deadline and per-stage time windows."""
+
+    def __init__(self, total_seconds: float, clock=time.monotonic):
+        self.total = float(total_seconds)
+        self.clock = clock
+        self.started = clock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.stage_deadlines = {}
+        cumulative = 0.0
+        for stage, share in STAGE_SHARES:
+            cumulative += share
+            self.stage_deadlines[stage] = self.started + cumulative * self.total
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started
+
+    def remaining(self) -> float:
+        """Seconds left in the whole run (never negative)."""
+        return max(0.0, self.total - self.elapsed())
+
+    def remaining_in(self, stage: str) -> float:
+        """Seconds left before ``stage`` must hand over to the next stage."""
+        return max(0.0, self.stage_deadlines[stage] - self.clock())
+
+    def cap(self, timeout: float, stage: str, floor: float = 5.0) -> float:
+        """Limit a timeout to what is left of ``stage``, but never below ``floor`` seconds."""
+        return max(floor, min(timeout, self.remaining_in(stage)))
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a measured duration for a unit of work (e.g. one URL batch or one claim)."""
+        self.samples[name].append(seconds)
+
+    def average(self, name: str, default: Optional[float] = None) -> Optional[float]:
+        samples = self.samples.get(name)
+        if not samples:
+            return default
+        return sum(samples) / len(samples)
+
+    def pressure(self, stage: str, projected_seconds: float) -> float:
+        """Ratio of projected work to time left in ``stage``; above 1.0 means the stage is behind schedule."""
+        left = self.remaining_in(stage)
+        if left <= 0:
+            return float("inf")
+        return projected_seconds / left
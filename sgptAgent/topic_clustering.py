@@ -0,0 +1,104 @@
+"""
+Lexical topic clustering for synthesis.
+
+Texts are turned into sparse TF-IDF vectors and grouped with a few rounds of
+capacity-constrained spherical k-means: every group stays within a token
+budget, so each group can be sent to the LLM in one call.
+"""
+
+import math
+from collections import Counter
+from typing import Dict, List
+
+from sgptAgent.text_ranking import estimate_tokens, tokenize
+
+Vector = Dict[str, float]
+
+
+def tfidf_vectors(texts: List[str]) -> List[Vector]:
+    """Unit-length TF-IDF vectors (sublinear term frequency) for ``texts``."""
+    term_counts = [Counter(tokenize(text)) for text in texts]
+    doc_freqs = Counter()
+    for counts in term_counts:
+        doc_freqs.update(counts.keys())
+    n = len(texts)
+    vectors = []
+    for counts in term_counts:
+        vector = {term: (1 + math.log(freq)) * math.log(1 + n / doc_freqs[term]) for term, freq in counts.items()}
+        vectors.append(_normalize(vector))
+    return vectors
+
+
+def _normalize(vector: Vector) -> Vector:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two unit-length sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(term, 0.0) for term, weight in a.items())
+
+
+def _centroid(vectors: List[Vector]) -> Vector:
+    total = Counter()
+    for vector in vectors:
+        total.update(vector)
+    return _normalize(dict(total))
+
+
+def _farthest_first(vectors: List[Vector], k: int) -> List[Vector]:
+    """Deterministic seeding: start from the first text, then repeatedly add the text least similar to all seeds."""
+    seeds = [0]
+    closest = [cosine(vector, vectors[0]) for vector in vectors]
+    while len(seeds) < min(k, len(vectors)):
+        candidate = min((i for i in range(len(vectors)) if i not in seeds), key=lambda i: (closest[i], i))
+        seeds.append(candidate)
+        closest = [max(closest[i], cosine(vectors[i], vectors[candidate])) for i in range(len(vectors))]
+    return [vectors[i] for i in seeds]
+
+
+def _assign(vectors: List[Vector], costs: List[int], centroids: List[Vector], token_budget: int) -> List[List[int]]:
+    centroids = list(centroids)
+    groups: List[List[int]] = [[] for _ in centroids]
+    loads = [0] * len(centroids)
+    similarities = [[cosine(vector, centroid) for centroid in centroids] for vector in vectors]
+    # Texts that clearly belong to a topic are placed first, so they get their preferred group
+    order = sorted(range(len(vectors)), key=lambda i: (-max(similarities[i], default=0.0), i))
+    for i in order:
+        ranked = sorted(range(len(centroids)), key=lambda c: -(similarities[i][c] if c < len(similarities[i]) else 0.0))
+        target = next((c for c in ranked if loads[c] + costs[i] <= token_budget), None)
+        if target is None:
+            # Every topic is full: open a new group around this text
+            centroids.append(vectors[i])
+            groups.append([])
+            loads.append(0)
+            target = len(centroids) - 1
+        groups[target].append(i)
+        loads[target] += costs[i]
+    return [sorted(group) for group in groups if group]
+
+
+def cluster_by_topic(texts: List[str], token_budget: int, iterations: int = 5) -> List[List[int]]:
+    """
+    Group text indices by topic so that every group's estimated tokens fit ``token_budget``.
+    A single text larger than the budget ends up alone in its group; callers trim it.
+    """
+    if not texts:
+        return []
+    costs = [estimate_tokens(text) for text in texts]
+    if sum(costs) <= token_budget:
+        return [list(range(len(texts)))]
+    vectors = tfidf_vectors(texts)
+    # Aim for groups filled to about 80% so similar texts have room to join the same group
+    k = max(2, math.ceil(sum(costs) / (token_budget * 0.8)))
+    centroids = _farthest_first(vectors, k)
+    groups: List[List[int]] = []
+    for _ in range(iterations):
+        new_groups = _assign(vectors, costs, centroids, token_budget)
+        if new_groups == groups:
+            break
+        groups = new_groups
+        centroids = [_centroid([vectors[i] for i in group]) for group in groups]
+    return sorted(groups, key=lambda group: group[0])
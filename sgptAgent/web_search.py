@@ -144,18 +144,20 @@ def search_web_with_fallback(query: str, max_results: int = 10) -> List[Dict[str
     return results
 
 
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urldefrag, urljoin, urlparse
 try:
     from bs4 import BeautifulSoup
 except ImportError:
     BeautifulSoup = None
     print('[ERROR] BeautifulSoup (bs4) is not installed. Install with `pip install beautifulsoup4`.')
 
-async def fetch_url_text(url: str, snippet: str = "") -> str:
+async def fetch_url_text(url: str, snippet: str = "", max_chars: int = 8000, _depth: int = 0) -> str:
     """
     Extract article text using newspaper3k, fallback to Playwright, then BeautifulSoup, then snippet.
-    If extracted text is <500 chars, try to follow the first likely article/content link and extract from there.
+    If extracted text is <500 chars, try to follow the first likely article/content link and extract from there
+    (one hop only, so pages linking to themselves or to each other cannot recurse).
     Print a preview and length of extracted text for debugging.
+    Text is truncated to max_chars; callers that rank or chunk the page themselves can raise it.
     """
     # Validate URL before processing
     if not url or not url.strip():
@@ -179,7 +181,7 @@ async def fetch_url_text(url: str, snippet: str = "") -> str:
         if text:
             debug_preview(text, "newspaper3k", url)
             if len(text) >= 500:
-                return text[:8000]
+                return text[:max_chars]
     except Exception as e:
         print(f"[newspaper3k failed for {url}: {e}]")
 
@@ -191,11 +193,13 @@ async def fetch_url_text(url: str, snippet: str = "") -> str:
         async def run_playwright():
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                await page.goto(url, timeout=15000)
-                content = await page.content()
-                await browser.close()
-                return content
+                try:
+                    page = await browser.new_page()
+                    await page.goto(url, timeout=15000)
+                    return await page.content()
+                finally:
+                    # Also runs when the research run is cancelled mid-navigation
+                    await browser.close()
 
         html = await run_playwright()
 
@@ -209,7 +213,7 @@ async def fetch_url_text(url: str, snippet: str = "") -> str:
             if text:
                 debug_preview(text, "Playwright", url)
                 if len(text) >= 500:
-                    return text[:8000]
+                    return text[:max_chars]
     except Exception as e:
         print(f"[Playwright fetch failed for {url}: {e}]")
 
@@ -227,13 +231,13 @@ async def fetch_url_text(url: str, snippet: str = "") -> str:
             if text:
                 debug_preview(text, "Requests+BS4", url)
                 if len(text) >= 500:
-                    return text[:8000]
+                    return text[:max_chars]
     except Exception as e:
         print(f"[Requests+BS4 fetch failed for {url}: {e}")
 
-    # 4. If text is short, try to follow first likely article/content link
-    candidate_html = html
-    if not candidate_html:
+    # 4. If text is short, try to follow first likely article/content link (not from a followed link)
+    candidate_html = html if _depth < 1 else None
+    if not candidate_html and _depth < 1:
         try:
             resp = requests.get(url, timeout=10)
             resp.raise_for_status()
@@ -249,11 +253,13 @@ async def fetch_url_text(url: str, snippet: str = "") -> str:
             for a in soup.find_all("a", href=True):
                 href = a["href"]
                 abs_url = urljoin(url, href)
+                if urldefrag(abs_url)[0] == urldefrag(url)[0]:
+                    continue
                 # Only follow links to same domain, and likely articles
                 if urlparse(abs_url).netloc == domain and any(x in href.lower() for x in ["article", "news", "story", "202", "item", "detail"]):
                     print(f"[Following likely article link: {abs_url} from {url}]")
                     # Try to extract from this linked page (newspaper3k, Playwright, BS4, snippet fallback)
-                    return fetch_url_text(abs_url, snippet)
+                    return await fetch_url_text(abs_url, snippet, max_chars, _depth=_depth + 1)
 
     # 5. Final fallback: use the snippet if provided
     if snippet:
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+from sgptAgent.cancellation import CancellationToken, ResearchCancelled, tracked
+from sgptAgent.orchestrator import Orchestrator
+from sgptAgent.stage_dag import StageGraph
+
+
+def cancel_when(token, *started):
+    """Cancel ``token`` from another thread once every ``started`` event is set."""
+
+    def wait_and_cancel():
+        assert all(event.wait(10) for event in started)
+        token.cancel()
+
+    thread = threading.Thread(target=wait_and_cancel)
+    thread.start()
+    return thread
+
+
+async def hang(name, started, cancelled):
+    with tracked("llm_calls"):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+
+def test_cancelling_a_run_abandons_its_pending_work(tmp_path):
+    orc = Orchestrator()
+    token, started, cancelled = CancellationToken(), threading.Event(), []
+
+    async def plan(goal, emit, **kwargs):
+        return "", ["solar", "wind", "hydro"]
+
+    def search(query):
+        return [{"title": query, "href": f"https://{query}.com/{i}"} for i in range(5)]
+
+    async def process(batch, *args, **kwargs):
+        await hang("summaries", started, cancelled)
+
+    async def report(*args, **kwargs):
+        raise AssertionError("the report was generated")
+
+    orc._plan_queries = plan
+    orc.data_collector.web_search = search
+    orc.data_collector._process_url_batch = process
+    orc.report_generator.run = report
+    thread = cancel_when(token, started)
+    with pytest.raises(ResearchCancelled) as raised:
+        asyncio.run(
+            orc.run(
+                "renewables",
+                documents_base_dir=str(tmp_path),
+                research_depth="deep",
+                cancel_token=token,
+            )
+        )
+    thread.join()
+    assert cancelled == ["summaries"]
+    assert raised.value.stage == "data collection"
+    # The last query waited for the second batch, the first batch's sources were being summarized
+    assert raised.value.abandoned == {"queries": 1, "sources": 10, "llm_calls": 1}
+    assert "1 LLM calls" in str(raised.value)
+    assert orc.metrics.counters["cancelled"] == 1
+
+
+def test_cancelling_a_stage_graph_cancels_its_stages():
+    token, cancelled = CancellationToken(), []
+    started = {"collect": threading.Event(), "translate": threading.Event()}
+
+    async def collect():
+        await hang("collect", started["collect"], cancelled)
+
+    async def translate():
+        await hang("translate", started["translate"], cancelled)
+
+    async def report(collect):
+        raise AssertionError("a stage ran after its input was cancelled")
+
+    graph = StageGraph()
+    graph.add("collect", collect, key="v1")
+    graph.add("translate", translate, key="v1")
+    graph.add("report", report, deps=["collect"], key="v1")
+
+    async def main():
+        handle = token.bind()
+        try:
+            task = asyncio.ensure_future(graph.run())
+            token.register(task)
+            await task
+        finally:
+            token.unbind(handle)
+
+    thread = cancel_when(token, *started.values())
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+    thread.join()
+    assert sorted(cancelled) == ["collect", "translate"]
+    assert token.abandoned == {"llm_calls": 2}
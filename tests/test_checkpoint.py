@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from sgptAgent.checkpoint import (
+    RunCheckpoint,
+    checkpoint_root,
+    is_valid_run_id,
+    new_run_id,
+)
+from sgptAgent.orchestrator import Orchestrator
+
+SOURCES = [
+    {"title": "Solar", "href": "https://example.com/solar", "snippet": "s"},
+    {"title": "Wind", "href": "https://example.com/wind", "snippet": "w"},
+]
+
+
+def orchestrator(calls):
+    orc = Orchestrator()
+
+    async def plan(goal, **kwargs):
+        calls.append("plan")
+        return "- What is solar power?\n- How do panels work?"
+
+    async def collect(queries, multimodal_agent, vision_agent, **kwargs):
+        calls.append(("collect", tuple(queries)))
+        results = [
+            dict(source, summary=f"about {source['title']}") for source in SOURCES
+        ]
+        return results, len(results), len(queries), len(queries)
+
+    async def synthesize(summaries, goal, **kwargs):
+        calls.append("synthesize")
+        return f"synthesis in a {kwargs.get('tone')} tone"
+
+    async def generate_reasoning(synthesis, summaries, goal, **kwargs):
+        calls.append("reason")
+        return f"reasoning on {synthesis}"
+
+    def write_report(synthesis, reasoning, **kwargs):
+        return f"{synthesis} | {reasoning}"
+
+    orc.planner.run = plan
+    orc.data_collector.run = collect
+    orc.report_generator.synthesize = synthesize
+    orc.report_generator.generate_reasoning = generate_reasoning
+    orc.report_generator.write_report = write_report
+    return orc
+
+
+def run(orc, tmp_path, **kwargs):
+    options = {"documents_base_dir": str(tmp_path), "project_name": "solar"}
+    return asyncio.run(orc.run("solar power", **options, **kwargs))
+
+
+def test_rerender_reuses_collection_and_unchanged_stages(tmp_path):
+    calls = []
+    orc = orchestrator(calls)
+    report, found, successful, total = run(orc, tmp_path, tone="plain")
+    run_id = orc.checkpoint.run_id
+    assert (
+        report == "synthesis in a plain tone | reasoning on synthesis in a plain tone"
+    )
+    assert (found, successful, total) == (2, 2, 2)
+    assert calls[0] == "plan" and calls[1][0] == "collect"
+
+    calls.clear()
+    report, *_ = run(orchestrator(calls), tmp_path, rerender=run_id, tone="formal")
+    assert (
+        report == "synthesis in a formal tone | reasoning on synthesis in a formal tone"
+    )
+    assert calls == ["synthesize", "reason"]
+
+    calls.clear()
+    report, *_ = run(orchestrator(calls), tmp_path, rerender=run_id, tone="formal")
+    assert report.startswith("synthesis in a formal tone")
+    assert calls == []
+
+
+def test_resume_reuses_the_plan(tmp_path):
+    root = checkpoint_root(str(tmp_path), "solar")
+    interrupted = RunCheckpoint(root)
+    interrupted.save_plan("- What is solar power?", ["What is solar power?"])
+    calls = []
+    run(orchestrator(calls), tmp_path, resume=interrupted.run_id)
+    assert calls[0] == ("collect", ("What is solar power?",))
+    assert "plan" not in calls
+    assert RunCheckpoint(root, interrupted.run_id).collected["total_queries"] == 1
+
+
+def test_rerender_of_unfinished_run_fails(tmp_path):
+    root = checkpoint_root(str(tmp_path), "solar")
+    run_id = RunCheckpoint(root).run_id
+    with pytest.raises(ValueError, match="cannot be re-rendered"):
+        run(orchestrator([]), tmp_path, rerender=run_id)
+
+
+@pytest.mark.parametrize(
+    "run_id", ["../..", "..", "/home", "20240101_120000_abc", "x/y"]
+)
+def test_run_ids_must_not_be_paths(tmp_path, run_id):
+    root = checkpoint_root(str(tmp_path), "solar")
+    (root / "20240101_120000_abcdef").mkdir(parents=True)
+    assert not is_valid_run_id(run_id)
+    assert not RunCheckpoint.exists(root, run_id)
+    with pytest.raises(ValueError):
+        RunCheckpoint(root, run_id)
+    with pytest.raises(ValueError, match="No checkpoint found"):
+        run(orchestrator([]), tmp_path, resume=run_id)
+    assert RunCheckpoint.exists(root, "20240101_120000_abcdef")
+    assert is_valid_run_id(new_run_id())
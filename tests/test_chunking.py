@@ -0,0 +1,67 @@
+import random
+
+from sgptAgent.chunking import chunk_stream, chunk_text, is_heading, iter_segments
+
+rng = random.Random(7)
+WORDS = ["solar", "panel", "grid", "storage", "battery", "inverter", "cost", "roof"]
+SENTENCES = [
+    " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 15))).capitalize() + "."
+    for _ in range(60)
+]
+SOURCE = (
+    "# Introduction\n\n" + " ".join(SENTENCES[:20]) + "\n\n"
+    "2. Methods\n" + "\n".join(SENTENCES[20:40]) + "\n\n"
+    "RESULTS\n" + "  ".join(SENTENCES[40:]) + "\n"
+)
+
+
+def split(text, sizes):
+    pieces, position = [], 0
+    for size in sizes:
+        pieces.append(text[position : position + size])
+        position += size
+    pieces.append(text[position:])
+    return pieces
+
+
+def test_chunk_offsets_point_at_their_text():
+    chunks = chunk_text(SOURCE, max_tokens=60, overlap_tokens=15)
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert " ".join(SOURCE[chunk.start : chunk.end].split()) == chunk.text
+    starts = [chunk.start for chunk in chunks]
+    assert starts == sorted(starts)
+    assert chunks[-1].end == len(SOURCE.rstrip())
+
+
+def test_chunks_do_not_depend_on_piece_boundaries():
+    expected = chunk_text(SOURCE, max_tokens=60, overlap_tokens=15)
+    for size in (1, 7, 64, 1000):
+        pieces = split(SOURCE, [size] * (len(SOURCE) // size))
+        assert list(chunk_stream(pieces, 60, 15)) == expected
+    sizes = [rng.randint(0, 40) for _ in range(len(SOURCE) // 10)]
+    assert list(chunk_stream(split(SOURCE, sizes), 60, 15)) == expected
+
+
+def test_headings_start_new_chunks():
+    chunks = chunk_text(SOURCE, max_tokens=60, overlap_tokens=15)
+    for heading in ("# Introduction", "2. Methods", "RESULTS"):
+        assert any(chunk.text.startswith(heading) for chunk in chunks)
+    assert is_heading("2. Methods") and not is_heading("2. the methods were simple.")
+
+
+def test_long_segments_are_wrapped():
+    text = " ".join(["word"] * 500)
+    chunks = chunk_text(text, max_tokens=50, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(len(chunk.text) <= 200 for chunk in chunks)
+    for chunk in chunks:
+        assert text[chunk.start : chunk.end] == chunk.text
+
+
+def test_segment_offsets():
+    segments = list(iter_segments(["First one.  Second", " one!\nThird"]))
+    source = "First one.  Second one!\nThird"
+    assert [text for text, _, _ in segments] == ["First one.", "Second one!", "Third"]
+    for text, start, end in segments:
+        assert source[start:end] == text
@@ -0,0 +1,49 @@
+import asyncio
+
+from sgptAgent.agent import DEFAULT_MAX_TOKENS
+from sgptAgent.orchestrator import DataCollectorAgent
+from sgptAgent.time_budget import TimeBudget
+
+
+class BehindSchedule(TimeBudget):
+    def pressure(self, stage, projected_seconds):
+        return 2.0
+
+
+def search(query):
+    return [
+        {"title": query, "href": f"https://{query}.example.com/{i}", "snippet": "s"}
+        for i in range(5)
+    ]
+
+
+def test_behind_schedule_scales_down_the_remaining_work():
+    agent = DataCollectorAgent(max_tokens=None)
+    assert agent.max_tokens == DEFAULT_MAX_TOKENS
+    agent.max_tokens = None  # also set directly by callers
+    agent.time_budget = BehindSchedule(1000)
+    agent.web_search = search
+    batches = []
+
+    async def process(batch, *args, **kwargs):
+        batches.append([result["href"] for result in batch])
+        return [
+            {"summary": f"{result['href']} batch {len(batches)}"} for result in batch
+        ]
+
+    agent._process_url_batch = process
+    results, found, successful, total = asyncio.run(
+        agent.run(["solar", "wind"], None, None, research_depth="deep")
+    )
+    assert (found, successful, total) == (10, 2, 2)
+    # Deep mode starts with three URLs per batch and five per query
+    assert batches[0] == [f"https://solar.example.com/{i}" for i in range(3)]
+    # Then four per batch and per query, then three per query: the last ranks are dropped
+    assert batches[1] == [
+        "https://solar.example.com/3",
+        "https://wind.example.com/0",
+        "https://wind.example.com/1",
+        "https://wind.example.com/2",
+    ]
+    assert len(batches) == 2 and len(results) == 7
+    assert agent.max_tokens == DEFAULT_MAX_TOKENS * 3 // 4 * 3 // 4
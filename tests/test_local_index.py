@@ -0,0 +1,258 @@
+import json
+
+import numpy as np
+import pytest
+
+from sgptAgent.ann_index import IVFSearcher
+from sgptAgent.chunk_store import ChunkStore
+from sgptAgent.local_index import LocalDocumentIndex, top_k
+
+WORDS = ["apple", "banana", "cherry", "date", "elder", "fig", "grape", "honey"]
+
+
+def embed(text):
+    return [float(text.count(word)) for word in WORDS] + [0.5]
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for word in WORDS:
+        (tmp_path / f"{word}.txt").write_text(f"{word} one. {word} two.")
+    return tmp_path
+
+
+def add(index, folder, word):
+    chunks = [f"{word} one.", f"{word} two."]
+    embeddings = [embed(chunk) for chunk in chunks]
+    index.add_file(str(folder / f"{word}.txt"), chunks, embeddings)
+
+
+def build(folder, words=WORDS, **options):
+    index = LocalDocumentIndex(str(folder), "test-model", **options)
+    for word in words:
+        add(index, folder, word)
+    index.save()
+    return index
+
+
+def top_source(index, word):
+    return index.search(embed(word), 1)[0][0]["source"]
+
+
+@pytest.mark.parametrize(
+    "options", [{}, {"precision": "float16"}, {"precision": "int8", "rescore": 4}]
+)
+def test_add_save_and_reload(folder, options):
+    build(folder, **options)
+    index = LocalDocumentIndex(str(folder), "test-model", **options)
+    assert index.rows == 16
+    assert len(index) == 16
+    hits = index.search(embed("grape"), 2)[0]
+    assert [hit["source"] for hit in hits] == [str(folder / "grape.txt")] * 2
+    assert {hit["content"] for hit in hits} == {"grape one.", "grape two."}
+    assert hits[0]["similarity"] == pytest.approx(1.0, abs=0.02)
+
+
+def test_metadata_does_not_hold_chunks(folder):
+    index = build(folder)
+    meta = json.loads(index.meta_file.read_text())
+    assert "chunks" not in meta
+    records = list(index.store.iter_records())
+    assert [record[2] for record in records[:2]] == ["apple one.", "apple two."]
+
+
+def test_changed_file_replaces_its_rows(folder):
+    index = build(folder)
+    index.add_file(str(folder / "fig.txt"), ["fig three."], [embed("fig three.")])
+    index.save()
+    assert len(index) == 15
+    assert index.rows == 17  # the old rows stay until compaction
+    reloaded = LocalDocumentIndex(str(folder), "test-model")
+    hits = reloaded.search(embed("fig"), 3)[0]
+    fig = [hit["content"] for hit in hits if hit["source"] == str(folder / "fig.txt")]
+    assert fig == ["fig three."]
+
+
+def test_prune_and_compact(folder):
+    index = build(folder)
+    (folder / "apple.txt").unlink()
+    (folder / "banana.txt").unlink()
+    (folder / "cherry.txt").unlink()
+    remaining = [str(folder / f"{word}.txt") for word in WORDS[3:]]
+    assert index.prune(remaining) == 3
+    index.save()  # more than a quarter of the rows are dead: compacted
+    assert index.rows == len(index) == 10
+    assert index.matrix_file.stat().st_size == 10 * index.dim * 4
+    reloaded = LocalDocumentIndex(str(folder), "test-model")
+    assert reloaded.rows == 10
+    assert top_source(reloaded, "honey") == str(folder / "honey.txt")
+    assert top_source(reloaded, "date") == str(folder / "date.txt")
+    sources = [record[0] for record in reloaded.store.iter_records()]
+    assert sources[::2] == [f"{word}.txt" for word in WORDS[3:]]
+
+
+def test_unsaved_rows_are_truncated(folder):
+    index = build(folder, WORDS[:4])
+    add(index, folder, "elder")  # appended but never saved
+    reloaded = LocalDocumentIndex(str(folder), "test-model")
+    assert reloaded.rows == 8
+    assert index.matrix_file.stat().st_size == 8 * reloaded.dim * 4
+    assert len(list(reloaded.store.iter_records())) == 8
+
+
+def test_different_model_rebuilds(folder):
+    build(folder)
+    index = LocalDocumentIndex(str(folder), "other-model")
+    assert index.rows == 0
+    assert json.loads(index.meta_file.read_text())["rows"] == 0
+
+
+def test_read_only_index_survives_compaction(folder):
+    writer = build(folder)
+    reader = LocalDocumentIndex(str(folder), "test-model", read_only=True)
+    for word in WORDS[:5]:
+        writer.remove_file(str(folder / f"{word}.txt"))
+    writer.save()
+    assert writer.rows == 6
+    assert reader.rows == 16
+    assert top_source(reader, "banana") == str(folder / "banana.txt")
+    assert top_source(reader, "grape") == str(folder / "grape.txt")
+
+
+def test_read_only_index_never_writes(folder):
+    index = build(folder, WORDS[:2])
+    add(index, folder, "cherry")  # unsaved rows
+    size = index.matrix_file.stat().st_size
+    reader = LocalDocumentIndex(str(folder), "test-model", read_only=True)
+    reader.save()
+    assert reader.rows == 4
+    assert index.matrix_file.stat().st_size == size
+    assert LocalDocumentIndex(str(folder), "other-model", read_only=True).rows == 0
+    assert json.loads(index.meta_file.read_text())["model"] == "test-model"
+
+
+def test_chunk_store_compact(tmp_path):
+    store = ChunkStore(tmp_path)
+    records = [["a.txt", i, f"text {i}", None, None] for i in range(10)]
+    store.append(records, [i or None for i in range(10)])
+    assert store.get([3, 0]) == [records[3], records[0]]
+    store.compact([(2, 3), (8, 2)])
+    texts = [record[2] for record in store.iter_records()]
+    assert texts == ["text 2", "text 3", "text 4", "text 8", "text 9"]
+    assert store.fingerprint(0) == 2 and store.fingerprint(4) == 9
+    reloaded = ChunkStore(tmp_path)
+    assert reloaded.load(5)
+    assert reloaded.get([3]) == [["a.txt", 8, "text 8", None, None]]
+    assert not ChunkStore(tmp_path).load(6)
+    assert np.fromfile(tmp_path / "chunks.idx", dtype=np.uint64).size == 5
+
+
+ANN = {"ann_backend": "ivf", "ann_min_rows": 50, "nlist": 8, "nprobe": 3}
+
+
+@pytest.fixture
+def clustered(tmp_path):
+    """Eight files of 40 chunks each, every file's vectors around its own direction."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((8, 16))
+    vectors = {}
+    for i, center in enumerate(centers):
+        path = tmp_path / f"file{i}.txt"
+        path.write_text(f"file {i}")
+        vectors[str(path)] = center + 0.3 * rng.standard_normal((40, 16))
+    return tmp_path, vectors
+
+
+def sync(folder, vectors, paths, **options):
+    index = LocalDocumentIndex(str(folder), "test-model", retrieval="vector", **options)
+    for path in paths:
+        if not index.is_current(path):
+            chunks = [f"{path} chunk {j}" for j in range(40)]
+            index.add_file(path, chunks, vectors[path].tolist())
+    index.save()
+    return index
+
+
+def no_build(monkeypatch):
+    def build(self, matrix):
+        raise AssertionError("the ANN searcher was trained again")
+
+    monkeypatch.setattr(IVFSearcher, "build", build)
+
+
+def test_ann_recall_matches_exact_search(clustered):
+    folder, vectors = clustered
+    index = sync(folder, vectors, list(vectors), **ANN)
+    queries = np.concatenate([rows[:5] for rows in vectors.values()])
+    queries += 0.05 * np.random.default_rng(1).standard_normal(queries.shape)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    approximate, _ = index._vector_search(queries, 10)
+    exact, _ = top_k(index.matrix(), queries, 10, mask=index.live_mask())
+    recall = np.mean(
+        [len(set(a) & set(e)) / 10 for a, e in zip(approximate, exact, strict=True)]
+    )
+    assert isinstance(index._searcher, IVFSearcher)
+    assert recall >= 0.9
+
+
+def test_sync_saves_ann_for_read_only_search(clustered, monkeypatch):
+    folder, vectors = clustered
+    sync(folder, vectors, list(vectors), **ANN)
+    state = json.loads((folder / ".sgpt_index" / "ann.json").read_text())
+    assert state["rows"] == state["trained_rows"] == 320
+    no_build(monkeypatch)
+    reader = LocalDocumentIndex(
+        str(folder), "test-model", retrieval="vector", read_only=True, **ANN
+    )
+    path = next(iter(vectors))
+    assert reader.search(vectors[path][3], 1)[0][0]["content"] == f"{path} chunk 3"
+    assert reader._searcher.rows == 320
+    # an unchanged sync neither retrains nor rewrites it
+    sync(folder, vectors, list(vectors), **ANN)
+
+
+def test_read_only_index_without_ann_searches_exactly(clustered, monkeypatch):
+    folder, vectors = clustered
+    sync(folder, vectors, list(vectors), **ANN)
+    (folder / ".sgpt_index" / "ann.json").unlink()
+    no_build(monkeypatch)
+    reader = LocalDocumentIndex(
+        str(folder), "test-model", retrieval="vector", read_only=True, **ANN
+    )
+    path = list(vectors)[5]
+    assert reader.search(vectors[path][7], 1)[0][0]["content"] == f"{path} chunk 7"
+    assert reader._searcher is None
+
+
+def test_appended_rows_are_added_without_training(clustered, monkeypatch):
+    folder, vectors = clustered
+    paths = list(vectors)
+    sync(folder, vectors, paths[:5], **ANN)
+    no_build(monkeypatch)
+    sync(folder, vectors, paths[:8], **ANN)  # 320 rows, under twice the 200 trained
+    state = json.loads((folder / ".sgpt_index" / "ann.json").read_text())
+    assert (state["rows"], state["trained_rows"]) == (320, 200)
+    reader = LocalDocumentIndex(
+        str(folder), "test-model", retrieval="vector", read_only=True, **ANN
+    )
+    assert reader.search(vectors[paths[7]][0], 1)[0][0]["source"] == paths[7]
+
+
+def test_ann_is_retrained_when_doubled_or_compacted(clustered):
+    folder, vectors = clustered
+    paths = list(vectors)
+    sync(folder, vectors, paths[:2], **ANN)
+    sync(folder, vectors, paths[:5], **ANN)  # 200 rows, over twice the 80 trained
+    ann_file = folder / ".sgpt_index" / "ann.json"
+    assert json.loads(ann_file.read_text())["trained_rows"] == 200
+    index = sync(folder, vectors, paths[:5], **ANN)
+    epoch = index.epoch
+    for path in paths[:2]:
+        index.remove_file(path)
+    index.save()  # compaction renumbers the rows
+    state = json.loads(ann_file.read_text())
+    assert state["epoch"] == epoch + 1
+    assert state["rows"] == state["trained_rows"] == 120
+    assert sorted(p.name for p in ann_file.parent.glob("ann-*")) == [
+        f"ann-{epoch + 1}.ivf"
+    ]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from sgptAgent.near_duplicates import SimHashIndex, hamming, max_distance, simhash
+from sgptAgent.stage_dag import StageFailed, StageGraph, Uncached
+
+
+class DictCache:
+    def __init__(self):
+        self.stages = {}
+
+    def get_stage(self, name, fingerprint):
+        key = (name, fingerprint)
+        return (key in self.stages), self.stages.get(key)
+
+    def record_stage(self, name, fingerprint, output):
+        self.stages[(name, fingerprint)] = output
+
+
+def pipeline(cache, calls, synthesis="report", query="solar"):
+    async def collect():
+        calls.append("collect")
+        return ["page"]
+
+    async def synthesize(collect):
+        calls.append("synthesize")
+        return synthesis
+
+    async def reason(synthesize):
+        calls.append("reason")
+        return f"reasoning on {synthesize}"
+
+    graph = StageGraph(cache=cache)
+    graph.add("collect", collect, key=query)
+    graph.add("synthesize", synthesize, deps=["collect"], key="v1")
+    graph.add("reason", reason, deps=["synthesize"], key="v1")
+    return graph
+
+
+def test_cached_stages_are_reused():
+    cache, calls = DictCache(), []
+    outputs = asyncio.run(pipeline(cache, calls).run())
+    assert outputs["reason"] == "reasoning on report"
+    assert calls == ["collect", "synthesize", "reason"]
+    calls.clear()
+    graph = pipeline(cache, calls)
+    assert graph.stale() == []
+    assert asyncio.run(graph.run())["reason"] == "reasoning on report"
+    assert calls == []
+    assert "reason" in graph.reused
+
+
+def test_changed_key_invalidates_downstream():
+    cache, calls = DictCache(), []
+    asyncio.run(pipeline(cache, calls).run())
+    calls.clear()
+    asyncio.run(pipeline(cache, calls, query="wind").run())
+    assert calls == ["collect", "synthesize", "reason"]
+
+
+def test_uncached_results_are_not_stored():
+    cache, calls = DictCache(), []
+    outputs = asyncio.run(pipeline(cache, calls, synthesis=Uncached("failed")).run())
+    assert outputs["synthesize"] == "failed"
+    assert outputs["reason"] == "reasoning on failed"
+    calls.clear()
+    asyncio.run(pipeline(cache, calls).run())
+    # collect was stored; synthesis and the reasoning built on it run again
+    assert calls == ["synthesize", "reason"]
+
+
+def test_fallback_and_failure():
+    async def broken():
+        raise RuntimeError("boom")
+
+    graph = StageGraph()
+    graph.add("broken", broken, fallback="default")
+    assert asyncio.run(graph.run())["broken"] == "default"
+    graph = StageGraph()
+    graph.add("broken", broken)
+    with pytest.raises(StageFailed):
+        asyncio.run(graph.run())
+
+
+def test_simhash_index_finds_near_duplicates():
+    text = " ".join(f"word{i}" for i in range(200))
+    edited = text.replace("word57", "changed")
+    other = " ".join(f"other{i}" for i in range(200))
+    assert hamming(simhash(text), simhash(edited)) <= max_distance(0.9)
+    index = SimHashIndex(max_distance(0.9))
+    index.add(simhash(text), "original")
+    assert index.find(simhash(edited)) == "original"
+    assert index.find(simhash(other)) is None
+    assert index.find(simhash(edited), accept=lambda key: key != "original") is None
+    assert simhash("too short") is None
@@ -0,0 +1,68 @@
+import random
+
+from sgptAgent.stream_filter import (
+    ReasoningFilter,
+    clean_reasoning,
+    strip_fake_citations,
+)
+
+RESPONSE = (
+    "<think>The user wants a summary.\nLet me look at the sources.</think>"
+    "Okay, the user wants to know about solar power.\n"
+    "Solar panels convert sunlight into electricity [Source 3]. Costs fell sharply.\n"
+    "<Thinking>hidden</Thinking>Efficiency is around 20% (Ref: NREL).\n"
+    "Installations grew every year.\n"
+)
+
+
+def feed_in_chunks(text, sizes, **options):
+    reasoning_filter = ReasoningFilter(**options)
+    out, position = [], 0
+    for size in sizes:
+        out.append(reasoning_filter.feed(text[position : position + size]))
+        position += size
+    out.append(reasoning_filter.feed(text[position:]))
+    return "".join(out) + reasoning_filter.flush()
+
+
+def test_clean_reasoning():
+    cleaned = clean_reasoning(RESPONSE)
+    assert "user wants" not in cleaned
+    assert "hidden" not in cleaned
+    assert "[Source 3]" not in cleaned
+    assert "(Ref: NREL)" not in cleaned
+    assert "Solar panels convert sunlight into electricity" in cleaned
+    assert "Installations grew every year." in cleaned
+
+
+def test_chunk_split_invariance():
+    expected = clean_reasoning(RESPONSE)
+    for size in range(1, 12):
+        assert feed_in_chunks(RESPONSE, [size] * (len(RESPONSE) // size)) == expected
+    rng = random.Random(0)
+    for _ in range(50):
+        sizes = [rng.randint(0, 9) for _ in range(len(RESPONSE) // 3)]
+        assert feed_in_chunks(RESPONSE, sizes) == expected
+
+
+def test_chunk_split_invariance_all_monologue():
+    text = (
+        "Plan:\nI think we should search.\n1. solar cost trends\n"
+        "Let me add one more.\n2. panel efficiency\n"
+    )
+    expected = clean_reasoning(text, strip_monologue="all")
+    assert "I think" not in expected and "Let me" not in expected
+    for size in range(1, 8):
+        sizes = [size] * len(text)
+        assert feed_in_chunks(text, sizes, strip_monologue="all") == expected
+
+
+def test_unclosed_reasoning_is_dropped():
+    assert clean_reasoning("Answer first.\n<think>never closed") == "Answer first.\n"
+
+
+def test_strip_fake_citations():
+    text = "Prices fell [Source 1]. Output rose (Ref: IEA)."
+    cleaned, removed = strip_fake_citations(text)
+    assert removed == ["[Source 1]", "(Ref: IEA)"]
+    assert "Source" not in cleaned and "Ref" not in cleaned
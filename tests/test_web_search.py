@@ -0,0 +1,41 @@
+import asyncio
+import sys
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from sgptAgent import web_search  # noqa: E402
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+def test_article_links_are_followed_one_hop(monkeypatch):
+    # Every page is short and links to itself and to the next news page
+    fetched = []
+
+    def get(url, timeout=None):
+        fetched.append(url)
+        page = int(url.rsplit("/", 1)[-1] or 0)
+        return Response(
+            f'<html><body>Short page {page}. <a href="{url}#top">here</a>'
+            f'<a href="/news/{page + 1}">next</a></body></html>'
+        )
+
+    monkeypatch.setattr(web_search.requests, "get", get)
+    monkeypatch.setitem(sys.modules, "newspaper", None)
+    monkeypatch.setitem(sys.modules, "playwright.async_api", None)
+    text = asyncio.run(
+        web_search.fetch_url_text("https://example.com/news/0", snippet="snippet")
+    )
+    assert text == "snippet"
+    assert sorted(set(fetched)) == [
+        "https://example.com/news/0",
+        "https://example.com/news/1",
+    ]